@@ -0,0 +1,17 @@
+from django.contrib import admin
+from .models import LaneDailyRollup, LaneTransitStats
+# Register your models here.
+
+
+class LaneDailyRollupAdmin(admin.ModelAdmin):
+    list_display = ('day', 'organization', 'source_branch', 'destination_branch', 'booked', 'revenue', 'arrived')
+    list_filter = ('day',)
+
+admin.site.register(LaneDailyRollup, LaneDailyRollupAdmin)
+
+
+class LaneTransitStatsAdmin(admin.ModelAdmin):
+    list_display = ('source_branch', 'destination_branch', 'samples', 'p50_seconds', 'p90_seconds', 'updated_at')
+    readonly_fields = ('sketch',)
+
+admin.site.register(LaneTransitStats, LaneTransitStatsAdmin)
@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class AnalyticsConfig(AppConfig):
+    name = 'analytics'
+
+    def ready(self):
+        from . import consumers  # noqa: F401 - registers the lane rollup consumer
@@ -0,0 +1,12 @@
+from shipment.events import register_consumer
+from . import rollups, transit
+
+
+@register_consumer(rollups.CONSUMER)
+def update_lane_rollups(events):
+    rollups.apply_events(events)
+
+
+@register_consumer(transit.CONSUMER)
+def update_lane_transit_stats(events):
+    transit.apply_events(events)
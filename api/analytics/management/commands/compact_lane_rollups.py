@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from organization.models import Organization
+from analytics.rollups import reconcile
+
+
+class Command(BaseCommand):
+    help = "Recompute lane rollups of recent days from the shipment tables and drop empty lane-days (run nightly)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=2, help="Days to reconcile, ending yesterday.")
+        parser.add_argument('--organization', default=None, help="Only reconcile this organization (slug).")
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError("--days must be at least 1")
+
+        organization = None
+        if options['organization']:
+            try:
+                organization = Organization.objects.get(slug=options['organization'])
+            except Organization.DoesNotExist:
+                raise CommandError(f"Organization '{options['organization']}' not found")
+
+        # Today is still being written by the outbox consumer
+        end = timezone.localdate() - timedelta(days=1)
+        start = end - timedelta(days=options['days'] - 1)
+        written, deleted = reconcile(start, end, organization=organization)
+        self.stdout.write(f"Reconciled {start}..{end}: wrote {written} lane-days, replaced {deleted}")
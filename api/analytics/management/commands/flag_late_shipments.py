@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from analytics.transit import flag_late_shipments
+
+
+class Command(BaseCommand):
+    help = "Flag open shipments that exceeded their lane's p90 transit time as late."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help="Keep sweeping instead of exiting.")
+        parser.add_argument('--interval', type=float, default=300.0, help="Seconds between sweeps with --loop.")
+
+    def handle(self, *args, **options):
+        while True:
+            flagged = flag_late_shipments()
+            if flagged:
+                self.stdout.write(f"Flagged {flagged} late shipments")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from organization.models import Organization
+from analytics.transit import rebuild
+
+
+class Command(BaseCommand):
+    help = "Backfill lane transit-time sketches from ShipmentHistory in a single pass."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--organization', default=None, help="Only rebuild this organization (slug).")
+
+    def handle(self, *args, **options):
+        organization = None
+        if options['organization']:
+            try:
+                organization = Organization.objects.get(slug=options['organization'])
+            except Organization.DoesNotExist:
+                raise CommandError(f"Organization '{options['organization']}' not found")
+
+        lanes = rebuild(organization=organization)
+        self.stdout.write(f"Rebuilt transit stats for {lanes} lanes")
@@ -0,0 +1,36 @@
+# Generated by Django 6.0.1 on 2026-10-19 13:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('organization', '0003_branchdevice'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LaneDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('booked', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('arrived', models.PositiveIntegerField(default=0)),
+                ('transit_seconds', models.BigIntegerField(default=0)),
+                ('delivered', models.PositiveIntegerField(default=0)),
+                ('cancelled', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('destination_branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='organization.branch')),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lane_rollups', to='organization.organization')),
+                ('source_branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='organization.branch')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('organization', 'day', 'source_branch', 'destination_branch'), name='unique_lane_day')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.0.1 on 2026-10-19 13:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+        ('organization', '0003_branchdevice'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LaneTransitStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sketch', models.JSONField(default=dict)),
+                ('samples', models.PositiveIntegerField(default=0)),
+                ('p50_seconds', models.FloatField(blank=True, null=True)),
+                ('p90_seconds', models.FloatField(blank=True, null=True)),
+                ('p99_seconds', models.FloatField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('destination_branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='organization.branch')),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lane_transit_stats', to='organization.organization')),
+                ('source_branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='organization.branch')),
+            ],
+            options={
+                'verbose_name_plural': 'Lane transit stats',
+                'constraints': [models.UniqueConstraint(fields=('source_branch', 'destination_branch'), name='unique_lane_transit')],
+            },
+        ),
+    ]
@@ -0,0 +1,65 @@
+from django.db import models
+from organization.models import Organization, Branch
+
+
+class LaneDailyRollup(models.Model):
+    """
+    Per day totals for one lane (source branch -> destination branch).
+    Maintained from the shipment outbox and reconciled nightly, so reports
+    never aggregate over Shipment or ShipmentHistory.
+    """
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='lane_rollups')
+    source_branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name='+')
+    destination_branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name='+')
+    day = models.DateField()
+
+    booked = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    arrived = models.PositiveIntegerField(default=0)
+    # Sum of booking -> arrival durations of the shipments counted in `arrived`
+    transit_seconds = models.BigIntegerField(default=0)
+    delivered = models.PositiveIntegerField(default=0)
+    cancelled = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['organization', 'day', 'source_branch', 'destination_branch'], name='unique_lane_day'
+            ),
+        ]
+
+    @property
+    def avg_transit_seconds(self):
+        return self.transit_seconds / self.arrived if self.arrived else None
+
+    def __str__(self):
+        return f"{self.day} {self.source_branch_id}->{self.destination_branch_id}"
+
+
+class LaneTransitStats(models.Model):
+    """
+    Booking -> arrival transit times of a lane, kept as a streaming quantile
+    sketch so percentiles update without re-reading ShipmentHistory.
+    """
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='lane_transit_stats')
+    source_branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name='+')
+    destination_branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name='+')
+
+    sketch = models.JSONField(default=dict)
+    samples = models.PositiveIntegerField(default=0)
+    p50_seconds = models.FloatField(null=True, blank=True)
+    p90_seconds = models.FloatField(null=True, blank=True)
+    p99_seconds = models.FloatField(null=True, blank=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Lane transit stats"
+        constraints = [
+            models.UniqueConstraint(fields=['source_branch', 'destination_branch'], name='unique_lane_transit'),
+        ]
+
+    def __str__(self):
+        return f"{self.source_branch_id}->{self.destination_branch_id} ({self.samples} samples)"
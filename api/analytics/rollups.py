@@ -0,0 +1,141 @@
+"""
+Incremental maintenance and nightly reconciliation of LaneDailyRollup.
+
+The outbox consumer adds each batch of shipment events to the rollups of
+the lanes and days they belong to. The consumer's writes commit in the same
+transaction as its offset (see shipment.events.dispatch_consumer), so a
+redelivered batch is never counted twice. reconcile() recomputes whole days
+from the shipment tables to repair drift, e.g. from bulk writes that bypass
+the outbox.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from shipment.models import Shipment, ShipmentHistory, ShipmentStatus, ConsumerOffset
+from .models import LaneDailyRollup
+
+CONSUMER = 'lane_rollups'
+COUNTERS = ('booked', 'revenue', 'arrived', 'transit_seconds', 'delivered', 'cancelled')
+STATUS_COUNTERS = {
+    ShipmentStatus.ARRIVED: 'arrived',
+    ShipmentStatus.DELIVERED: 'delivered',
+    ShipmentStatus.CANCELLED: 'cancelled',
+}
+
+
+def lane_key(shipment, day):
+    return (shipment.organization_id, shipment.source_branch_id, shipment.destination_branch_id, day)
+
+
+def apply_events(events):
+    """Adds a batch of ShipmentEvents to the rollups. Returns the number of lane-days touched."""
+    deltas = defaultdict(lambda: defaultdict(int))
+    for event in events:
+        shipment = event.shipment
+        if shipment is None:
+            continue
+        if event.event_type == ShipmentStatus.BOOKED:
+            delta = deltas[lane_key(shipment, timezone.localdate(shipment.created_at))]
+            delta['booked'] += 1
+            delta['revenue'] += shipment.price
+        elif event.event_type in STATUS_COUNTERS:
+            delta = deltas[lane_key(shipment, timezone.localdate(event.created_at))]
+            delta[STATUS_COUNTERS[event.event_type]] += 1
+            if event.event_type == ShipmentStatus.ARRIVED:
+                delta['transit_seconds'] += int((event.created_at - shipment.created_at).total_seconds())
+
+    for (organization_id, source_id, destination_id, day), delta in deltas.items():
+        rollup, _ = LaneDailyRollup.objects.get_or_create(
+            organization_id=organization_id, source_branch_id=source_id,
+            destination_branch_id=destination_id, day=day,
+        )
+        LaneDailyRollup.objects.filter(pk=rollup.pk).update(
+            **{counter: F(counter) + value for counter, value in delta.items()}
+        )
+    return len(deltas)
+
+
+def day_range(start, end):
+    """Aware datetimes bounding the local days start..end (inclusive)."""
+    tz = timezone.get_current_timezone()
+    return (
+        datetime.combine(start, time.min, tzinfo=tz),
+        datetime.combine(end + timedelta(days=1), time.min, tzinfo=tz),
+    )
+
+
+def compute_rollups(start, end, organization=None):
+    """Recomputes {lane key: {counter: value}} for the days start..end from the shipment tables."""
+    since, until = day_range(start, end)
+    rows = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+
+    shipments = Shipment.objects.filter(created_at__gte=since, created_at__lt=until)
+    history = ShipmentHistory.objects.filter(
+        created_at__gte=since, created_at__lt=until, status__in=list(STATUS_COUNTERS)
+    )
+    if organization is not None:
+        shipments = shipments.filter(organization=organization)
+        history = history.filter(organization=organization)
+
+    bookings = (
+        shipments.annotate(day=TruncDate('created_at'))
+        .values('organization_id', 'source_branch_id', 'destination_branch_id', 'day')
+        .annotate(booked=Count('id'), revenue=Sum('price'))
+        .order_by()
+    )
+    for row in bookings:
+        key = (row['organization_id'], row['source_branch_id'], row['destination_branch_id'], row['day'])
+        rows[key].update(booked=row['booked'], revenue=row['revenue'] or Decimal('0'))
+
+    changes = (
+        history.annotate(day=TruncDate('created_at'))
+        .values(
+            'shipment__organization_id', 'shipment__source_branch_id', 'shipment__destination_branch_id',
+            'day', 'status',
+        )
+        .annotate(count=Count('id'), transit=Sum(F('created_at') - F('shipment__created_at')))
+        .order_by()
+    )
+    for row in changes:
+        key = (
+            row['shipment__organization_id'], row['shipment__source_branch_id'],
+            row['shipment__destination_branch_id'], row['day'],
+        )
+        rows[key][STATUS_COUNTERS[row['status']]] += row['count']
+        if row['status'] == ShipmentStatus.ARRIVED and row['transit']:
+            rows[key]['transit_seconds'] += int(row['transit'].total_seconds())
+    return rows
+
+
+def reconcile(start, end, organization=None):
+    """
+    Rewrites the rollups of the days start..end from the shipment tables,
+    dropping lane-days with no activity. Holds the consumer's offset lock so
+    no batch is applied on top of a half-rewritten day. Only reconcile days
+    whose events have all been dispatched (normally: days before today).
+    Returns (rows written, rows deleted).
+    """
+    with transaction.atomic():
+        ConsumerOffset.objects.select_for_update().get_or_create(consumer=CONSUMER)
+        rows = compute_rollups(start, end, organization=organization)
+
+        existing = LaneDailyRollup.objects.filter(day__gte=start, day__lte=end)
+        if organization is not None:
+            existing = existing.filter(organization=organization)
+        deleted, _ = existing.delete()
+
+        rollups = LaneDailyRollup.objects.bulk_create([
+            LaneDailyRollup(
+                organization_id=organization_id, source_branch_id=source_id,
+                destination_branch_id=destination_id, day=day, **counters,
+            )
+            for (organization_id, source_id, destination_id, day), counters in rows.items()
+            if any(counters.values())
+        ], batch_size=500)
+    return len(rollups), deleted
@@ -0,0 +1,28 @@
+from rest_framework import serializers
+
+
+class LaneStatsQuerySerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    source = serializers.CharField(required=False, help_text="Source branch slug")
+    destination = serializers.CharField(required=False, help_text="Destination branch slug")
+    group = serializers.ChoiceField(choices=['day', 'lane'], default='day')
+
+    def validate(self, attrs):
+        if attrs.get('start') and attrs.get('end') and attrs['start'] > attrs['end']:
+            raise serializers.ValidationError("start must not be after end")
+        return attrs
+
+
+class LaneStatsSerializer(serializers.Serializer):
+    day = serializers.DateField(required=False)
+    source_branch = serializers.CharField()
+    source_branch_title = serializers.CharField()
+    destination_branch = serializers.CharField()
+    destination_branch_title = serializers.CharField()
+    booked = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+    arrived = serializers.IntegerField()
+    delivered = serializers.IntegerField()
+    cancelled = serializers.IntegerField()
+    avg_transit_hours = serializers.FloatField(allow_null=True)
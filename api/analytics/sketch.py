@@ -0,0 +1,64 @@
+"""
+Mergeable streaming quantile sketch with relative-error guarantees.
+
+Values are counted in logarithmically sized buckets (as in DDSketch): any
+quantile is returned within `relative_accuracy` of the true value, memory
+grows with the log of the value range rather than with the number of
+samples, and two sketches merge by adding bucket counts. Serialized to a
+small dict so it can live in a JSONField.
+"""
+import math
+
+DEFAULT_RELATIVE_ACCURACY = 0.02
+
+
+class QuantileSketch:
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY, bins=None):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins = dict(bins or {})
+        self.count = sum(self.bins.values())
+
+    def _index(self, value):
+        # Durations under a second all share the first bucket
+        return math.ceil(math.log(max(value, 1.0)) / self._log_gamma)
+
+    def add(self, value, count=1):
+        index = self._index(value)
+        self.bins[index] = self.bins.get(index, 0) + count
+        self.count += count
+
+    def merge(self, other):
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.count += other.count
+
+    def quantile(self, q):
+        """Approximate value at quantile q (0..1), or None for an empty sketch."""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        cumulative = 0
+        for index in sorted(self.bins):
+            cumulative += self.bins[index]
+            if cumulative > rank:
+                break
+        if index == 0:
+            return 1.0
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def to_dict(self):
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'bins': {str(index): count for index, count in self.bins.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if not data:
+            return cls()
+        return cls(
+            relative_accuracy=data.get('relative_accuracy', DEFAULT_RELATIVE_ACCURACY),
+            bins={int(index): count for index, count in data.get('bins', {}).items()},
+        )
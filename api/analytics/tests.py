@@ -0,0 +1,195 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.testing import seed_organization, seed_shipments, access_token_for
+from shipment.events import record_event, dispatch_consumer
+from shipment.models import Shipment, ShipmentHistory, ShipmentStatus
+from .models import LaneDailyRollup, LaneTransitStats
+from .rollups import CONSUMER, compute_rollups
+from .sketch import QuantileSketch
+from . import transit
+
+
+@override_settings(SHIPMENT_EVENTS_SETTLE_SECONDS=0)
+class LaneRollupTests(TestCase):
+    """Test incremental lane rollups, nightly reconciliation and the lane report."""
+
+    def setUp(self):
+        self.org, self.branches = seed_organization("lanes", branches=3)
+        self.shipments = seed_shipments(self.org, self.branches, 4, history_per_shipment=0)
+
+    def move(self, shipment, new_status):
+        shipment.current_status = new_status
+        shipment.save()
+        ShipmentHistory.objects.create(shipment=shipment, status=new_status, location="Hub")
+        record_event(shipment, new_status)
+
+    def dispatch(self):
+        while dispatch_consumer(CONSUMER):
+            pass
+
+    def stored(self):
+        return {
+            (r.organization_id, r.source_branch_id, r.destination_branch_id, r.day): {
+                'booked': r.booked, 'revenue': r.revenue, 'arrived': r.arrived,
+                'transit_seconds': r.transit_seconds, 'delivered': r.delivered, 'cancelled': r.cancelled,
+            }
+            for r in LaneDailyRollup.objects.all()
+        }
+
+    def test_consumer_matches_recomputed_rollups(self):
+        Shipment.objects.update(created_at=timezone.now() - timedelta(hours=5))
+        for shipment in Shipment.objects.all():
+            record_event(shipment, ShipmentStatus.BOOKED)
+        first, second, third, _ = Shipment.objects.order_by('id')
+        self.move(first, ShipmentStatus.ARRIVED)
+        self.move(first, ShipmentStatus.DELIVERED)
+        self.move(second, ShipmentStatus.ARRIVED)
+        self.move(third, ShipmentStatus.CANCELLED)
+        self.dispatch()
+
+        today = timezone.localdate()
+        expected = {key: dict(counters) for key, counters in compute_rollups(today, today).items()}
+        self.assertEqual(self.stored(), expected)
+        self.assertEqual(sum(r.booked for r in LaneDailyRollup.objects.all()), 4)
+        arrived = LaneDailyRollup.objects.get(source_branch=first.source_branch, destination_branch=first.destination_branch)
+        self.assertAlmostEqual(arrived.avg_transit_seconds, 5 * 3600, delta=60)
+
+    def test_nightly_reconcile_rewrites_past_days(self):
+        yesterday = timezone.now() - timedelta(days=1)
+        Shipment.objects.update(created_at=yesterday)
+        stale = Shipment.objects.first()
+        LaneDailyRollup.objects.create(
+            organization=self.org, source_branch=stale.source_branch, destination_branch=stale.destination_branch,
+            day=timezone.localdate(yesterday), booked=99,
+        )
+        call_command('compact_lane_rollups', stdout=StringIO())
+
+        self.assertEqual(sum(r.booked for r in LaneDailyRollup.objects.all()), 4)
+        self.assertEqual(
+            sum((r.revenue for r in LaneDailyRollup.objects.all()), Decimal('0')),
+            sum((s.price for s in self.shipments), Decimal('0')),
+        )
+
+    def test_report_reads_only_rollups(self):
+        source, destination, _ = self.branches
+        today = timezone.localdate()
+        for days_ago, booked in ((0, 2), (1, 3)):
+            LaneDailyRollup.objects.create(
+                organization=self.org, source_branch=source, destination_branch=destination,
+                day=today - timedelta(days=days_ago), booked=booked, revenue=Decimal('100.00') * booked,
+                arrived=1, transit_seconds=7200,
+            )
+
+        auth = {'HTTP_AUTHORIZATION': f"Bearer {access_token_for(self.org)}"}
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get('/api/analytics/lanes/', {'source': source.slug}, **auth)
+        self.assertEqual(resp.status_code, 200, resp.content)
+        self.assertFalse([q for q in ctx.captured_queries if 'shipment_' in q['sql']])
+        self.assertEqual([row['booked'] for row in resp.json()['data']], [3, 2])
+        self.assertEqual(resp.json()['data'][0]['avg_transit_hours'], 2.0)
+
+        resp = self.client.get('/api/analytics/lanes/', {'group': 'lane'}, **auth)
+        [lane] = resp.json()['data']
+        self.assertEqual((lane['booked'], lane['revenue'], lane['avg_transit_hours']), (5, '500.00', 2.0))
+
+        # A deactivated branch keeps its lanes in the report
+        source.deactivate()
+        resp = self.client.get('/api/analytics/lanes/', {'source': source.slug, 'group': 'lane'}, **auth)
+        self.assertEqual(resp.status_code, 200, resp.content)
+        self.assertEqual([(row['source_branch'], row['booked']) for row in resp.json()['data']], [(source.slug, 5)])
+
+
+class QuantileSketchTests(TestCase):
+
+    def test_quantiles_within_relative_accuracy(self):
+        sketch = QuantileSketch(relative_accuracy=0.02)
+        values = list(range(60, 60 * 60 * 48, 7))
+        for value in values:
+            sketch.add(value)
+        for q in (0.5, 0.9, 0.99):
+            exact = values[int(q * (len(values) - 1))]
+            self.assertAlmostEqual(sketch.quantile(q), exact, delta=exact * 0.02)
+        self.assertLess(len(sketch.bins), 500)
+
+    def test_merge_and_round_trip(self):
+        left, right = QuantileSketch(), QuantileSketch()
+        for value in range(1, 1000):
+            (left if value % 2 else right).add(value)
+        left.merge(right)
+        restored = QuantileSketch.from_dict(left.to_dict())
+        self.assertEqual(restored.count, 999)
+        self.assertEqual(restored.quantile(0.5), left.quantile(0.5))
+
+
+@override_settings(SHIPMENT_EVENTS_SETTLE_SECONDS=0)
+class LaneTransitTests(TestCase):
+    """Test lane transit stats, ETAs on tracking responses and the late shipment sweep."""
+
+    def setUp(self):
+        transit.lane_etas.clear()
+        self.org, self.branches = seed_organization("transit", branches=2)
+        self.source, self.destination = self.branches
+        self.shipments = seed_shipments(self.org, self.branches, 7, history_per_shipment=0)
+        Shipment.objects.update(source_branch=self.source, destination_branch=self.destination)
+        self.arrived, self.open = self.shipments[:6], self.shipments[6]
+        for hours, shipment in enumerate(self.arrived, start=1):
+            Shipment.objects.filter(pk=shipment.pk).update(created_at=timezone.now() - timedelta(hours=hours))
+
+    def tearDown(self):
+        transit.lane_etas.clear()
+
+    def arrive_all(self):
+        for shipment in Shipment.objects.filter(pk__in=[s.pk for s in self.arrived]):
+            shipment.current_status = ShipmentStatus.ARRIVED
+            shipment.save()
+            ShipmentHistory.objects.create(shipment=shipment, status=ShipmentStatus.ARRIVED, location="Hub")
+            record_event(shipment, ShipmentStatus.ARRIVED)
+
+    def test_consumer_and_rebuild_agree(self):
+        self.arrive_all()
+        while dispatch_consumer(transit.CONSUMER):
+            pass
+        streamed = LaneTransitStats.objects.get()
+        self.assertEqual(streamed.samples, 6)
+        self.assertAlmostEqual(streamed.p50_seconds, 3 * 3600, delta=3 * 3600 * 0.05)
+
+        call_command('rebuild_lane_transit_stats', stdout=StringIO())
+        rebuilt = LaneTransitStats.objects.get()
+        self.assertEqual(rebuilt.sketch['bins'], streamed.sketch['bins'])
+
+    def test_rebuild_leaves_undispatched_arrivals_to_the_consumer(self):
+        self.arrive_all()
+        dispatch_consumer(transit.CONSUMER, batch_size=2)
+        transit.rebuild()
+        self.assertEqual(LaneTransitStats.objects.get().samples, 2)
+        while dispatch_consumer(transit.CONSUMER):
+            pass
+        self.assertEqual(LaneTransitStats.objects.get().samples, 6)
+
+    def test_eta_attached_to_tracking_and_late_sweep(self):
+        self.arrive_all()
+        while dispatch_consumer(transit.CONSUMER):
+            pass
+        transit.rebuild()
+        p90 = LaneTransitStats.objects.get().p90_seconds
+
+        resp = self.client.get(f'/api/shipment/track/{self.open.tracking_id}/', HTTP_HOST="transit.vyahan.local")
+        eta = resp.json()['data']['eta']
+        self.assertIsNotNone(eta)
+        self.assertFalse(resp.json()['data']['is_late'])
+        arrived = self.client.get(f'/api/shipment/track/{self.arrived[0].tracking_id}/', HTTP_HOST="transit.vyahan.local")
+        self.assertIsNone(arrived.json()['data']['eta'])
+
+        call_command('flag_late_shipments', stdout=StringIO())
+        self.assertFalse(Shipment.objects.filter(is_late=True).exists())
+        Shipment.objects.filter(pk=self.open.pk).update(created_at=timezone.now() - timedelta(seconds=p90 + 60))
+        self.assertEqual(transit.flag_late_shipments(), 1)
+        self.assertTrue(Shipment.objects.get(pk=self.open.pk).is_late)
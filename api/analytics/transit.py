@@ -0,0 +1,172 @@
+"""
+Per-lane transit time statistics, ETAs and late shipment flagging.
+
+Transit samples (booking -> arrival) are added to each lane's quantile
+sketch as ARRIVED events come through the outbox; rebuild() replays
+ShipmentHistory to backfill, leaving arrivals whose event the consumer
+hasn't processed yet to the consumer. Each process keeps an in-memory table of
+lane percentiles per organization, reloaded every LANE_ETA_REFRESH_SECONDS,
+so attaching an ETA to a response costs no query per shipment.
+"""
+import threading
+import time
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from shipment.models import Shipment, ShipmentHistory, ShipmentEvent, ShipmentStatus, ConsumerOffset
+from .models import LaneTransitStats
+from .sketch import QuantileSketch
+
+CONSUMER = 'lane_transit'
+OPEN_STATUSES = (ShipmentStatus.BOOKED, ShipmentStatus.IN_TRANSIT)
+
+
+def update_percentiles(stats, sketch):
+    stats.sketch = sketch.to_dict()
+    stats.samples = sketch.count
+    stats.p50_seconds = sketch.quantile(0.5)
+    stats.p90_seconds = sketch.quantile(0.9)
+    stats.p99_seconds = sketch.quantile(0.99)
+
+
+def add_samples(samples):
+    """Adds {(organization_id, source_id, destination_id): [seconds, ...]} to the lane sketches."""
+    with transaction.atomic():
+        for (organization_id, source_id, destination_id), values in samples.items():
+            stats, _ = LaneTransitStats.objects.select_for_update().get_or_create(
+                source_branch_id=source_id, destination_branch_id=destination_id,
+                defaults={'organization_id': organization_id},
+            )
+            sketch = QuantileSketch.from_dict(stats.sketch)
+            for value in values:
+                sketch.add(value)
+            update_percentiles(stats, sketch)
+            stats.save()
+
+
+def apply_events(events):
+    """Adds the transit time of every ARRIVED event in the batch to its lane."""
+    samples = defaultdict(list)
+    for event in events:
+        shipment = event.shipment
+        if shipment is None or event.event_type != ShipmentStatus.ARRIVED:
+            continue
+        lane = (shipment.organization_id, shipment.source_branch_id, shipment.destination_branch_id)
+        samples[lane].append((event.created_at - shipment.created_at).total_seconds())
+    add_samples(samples)
+    return sum(len(values) for values in samples.values())
+
+
+def rebuild(organization=None, chunk_size=2000):
+    """
+    Recomputes every lane sketch in a single pass over ARRIVED history rows.
+    Holds the consumer's offset lock throughout, like rollups.reconcile(), and
+    skips arrivals whose ARRIVED event is past the offset: the consumer adds
+    those afterwards, so counting them here would count them twice.
+    Returns the number of lanes written.
+    """
+    with transaction.atomic():
+        offset, _ = ConsumerOffset.objects.select_for_update().get_or_create(consumer=CONSUMER)
+        pending = ShipmentEvent.objects.filter(
+            shipment=OuterRef('shipment'), event_type=ShipmentStatus.ARRIVED, id__gt=offset.last_event_id,
+        )
+        history = ShipmentHistory.objects.filter(status=ShipmentStatus.ARRIVED).filter(~Exists(pending))
+        if organization is not None:
+            history = history.filter(organization=organization)
+        rows = history.values_list(
+            'shipment__organization_id', 'shipment__source_branch_id', 'shipment__destination_branch_id',
+            'created_at', 'shipment__created_at',
+        ).order_by().iterator(chunk_size=chunk_size)
+
+        sketches = defaultdict(QuantileSketch)
+        for organization_id, source_id, destination_id, arrived_at, booked_at in rows:
+            sketches[(organization_id, source_id, destination_id)].add((arrived_at - booked_at).total_seconds())
+
+        stats = []
+        for (organization_id, source_id, destination_id), sketch in sketches.items():
+            lane = LaneTransitStats(
+                organization_id=organization_id, source_branch_id=source_id, destination_branch_id=destination_id,
+            )
+            update_percentiles(lane, sketch)
+            stats.append(lane)
+
+        existing = LaneTransitStats.objects.all()
+        if organization is not None:
+            existing = existing.filter(organization=organization)
+        existing.delete()
+        LaneTransitStats.objects.bulk_create(stats, batch_size=500)
+    return len(stats)
+
+
+LaneEta = namedtuple('LaneEta', ['expected_seconds', 'latest_seconds'])
+
+
+class LaneEtaTable:
+    """Per-process {organization id: {(source id, destination id): LaneEta}}, refreshed periodically."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tables = {}   # organization id -> (monotonic load time, lanes)
+
+    def lanes(self, organization_id):
+        cached = self._tables.get(organization_id)
+        if cached is not None and time.monotonic() - cached[0] < settings.LANE_ETA_REFRESH_SECONDS:
+            return cached[1]
+        rows = LaneTransitStats.objects.filter(
+            organization_id=organization_id, samples__gte=settings.LANE_ETA_MIN_SAMPLES,
+        ).values_list('source_branch_id', 'destination_branch_id', 'p50_seconds', 'p90_seconds')
+        lanes = {(source, destination): LaneEta(p50, p90) for source, destination, p50, p90 in rows}
+        with self._lock:
+            self._tables[organization_id] = (time.monotonic(), lanes)
+        return lanes
+
+    def estimate(self, shipment):
+        """{'expected_at', 'latest_at'} for an open shipment on a lane with enough samples, else None."""
+        return self.estimate_lane(
+            shipment.organization_id, shipment.source_branch_id, shipment.destination_branch_id,
+            shipment.current_status, shipment.created_at,
+        )
+
+    def estimate_lane(self, organization_id, source_branch_id, destination_branch_id, current_status, created_at):
+        """estimate() from plain column values, for callers working on .values() rows."""
+        if current_status not in OPEN_STATUSES:
+            return None
+        eta = self.lanes(organization_id).get((source_branch_id, destination_branch_id))
+        if eta is None:
+            return None
+        return {
+            'expected_at': created_at + timedelta(seconds=eta.expected_seconds),
+            'latest_at': created_at + timedelta(seconds=eta.latest_seconds),
+        }
+
+    def clear(self):
+        with self._lock:
+            self._tables.clear()
+
+
+lane_etas = LaneEtaTable()
+
+
+def flag_late_shipments(now=None):
+    """
+    Marks open shipments that have been travelling longer than their lane's
+    p90 transit time as late, one UPDATE per lane. Returns the number flagged.
+    """
+    now = now or timezone.now()
+    lanes = LaneTransitStats.objects.filter(
+        samples__gte=settings.LANE_ETA_MIN_SAMPLES, p90_seconds__isnull=False,
+    ).values_list('source_branch_id', 'destination_branch_id', 'p90_seconds')
+
+    flagged = 0
+    for source_id, destination_id, p90 in lanes:
+        flagged += Shipment.objects.filter(
+            source_branch_id=source_id, destination_branch_id=destination_id,
+            current_status__in=OPEN_STATUSES, is_late=False,
+            created_at__lt=now - timedelta(seconds=p90),
+        ).update(is_late=True, updated_at=now)
+    return flagged
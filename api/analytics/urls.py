@@ -0,0 +1,6 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('lanes/', views.lane_stats, name='lane_stats'),
+]
@@ -0,0 +1,74 @@
+from datetime import timedelta
+
+from django.db.models import Sum
+from django.utils import timezone
+from rest_framework.decorators import api_view, permission_classes, authentication_classes
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import status
+from core.utils import response
+from core.authentication import OrganizationJWTAuthentication
+from organization.permissions import IsOrganizationSet
+from organization.directory import get_branch_map
+from .models import LaneDailyRollup
+from .serializers import LaneStatsQuerySerializer, LaneStatsSerializer
+
+DEFAULT_RANGE_DAYS = 30
+COUNTERS = ('booked', 'revenue', 'arrived', 'transit_seconds', 'delivered', 'cancelled')
+
+
+@swagger_auto_schema(
+    method='get',
+    query_serializer=LaneStatsQuerySerializer,
+    responses={200: LaneStatsSerializer(many=True)},
+    operation_description=(
+        "Volume, revenue and average transit time per lane, per day (group=day) or summed over "
+        "the range (group=lane). Defaults to the last 30 days. Read from the daily lane rollups. "
+        "Requires Organization JWT authentication."
+    ),
+    security=[{'Bearer': []}]
+)
+@api_view(['GET'])
+@authentication_classes([OrganizationJWTAuthentication])
+@permission_classes([IsOrganizationSet])
+def lane_stats(request):
+    org = request.organization
+    query = LaneStatsQuerySerializer(data=request.query_params)
+    if not query.is_valid():
+        return response(status.HTTP_400_BAD_REQUEST, "Invalid query", error=query.errors)
+    params = query.validated_data
+
+    end = params.get('end') or timezone.localdate()
+    start = params.get('start') or end - timedelta(days=DEFAULT_RANGE_DAYS - 1)
+    rollups = LaneDailyRollup.objects.filter(organization=org, day__gte=start, day__lte=end)
+
+    # Deactivated branches keep their lanes: the rollups are history
+    branches = get_branch_map(org, include_inactive=True)
+    for param, field in (('source', 'source_branch_id'), ('destination', 'destination_branch_id')):
+        if params.get(param):
+            entry = branches.get(params[param])
+            if entry is None:
+                return response(status.HTTP_404_NOT_FOUND, "Branch not found")
+            rollups = rollups.filter(**{field: entry.id})
+
+    lane = ['source_branch_id', 'destination_branch_id']
+    if params['group'] == 'lane':
+        rows = rollups.values(*lane).annotate(**{c: Sum(c) for c in COUNTERS}).order_by(*lane)
+    else:
+        rows = rollups.values('day', *lane, *COUNTERS).order_by('day', *lane)
+
+    by_id = {entry.id: entry for entry in branches.values()}
+    data = []
+    for row in rows:
+        source, destination = by_id.get(row['source_branch_id']), by_id.get(row['destination_branch_id'])
+        if source is None or destination is None:
+            continue
+        transit = row.pop('transit_seconds')
+        row.update(
+            source_branch=source.slug, source_branch_title=source.title,
+            destination_branch=destination.slug, destination_branch_title=destination.title,
+            avg_transit_hours=round(transit / row['arrived'] / 3600, 2) if row['arrived'] else None,
+        )
+        data.append(row)
+
+    serializer = LaneStatsSerializer(data, many=True)
+    return response(status.HTTP_200_OK, "Lane statistics fetched successfully", data=serializer.data)
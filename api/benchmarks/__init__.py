@@ -0,0 +1,16 @@
+"""
+Load-testing and benchmark suite for the booking, scanning, tracking and
+dashboard workloads.
+
+Run from the api/ directory:
+
+    python -m benchmarks --size 1000 --requests 200 --output bench.json
+
+By default scenarios run in-process against a throwaway test database, with
+per-request query counts. Pass --base-url to drive a running server instead
+(data is then seeded into the database configured in settings, so point it
+at a disposable one).
+
+Rendering and compression of the list_shipments payload are measured
+separately with `python -m benchmarks.payload`.
+"""
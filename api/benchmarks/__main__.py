@@ -0,0 +1,39 @@
+import argparse
+import json
+import sys
+
+from .runner import setup_django, run
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description="Run API workload benchmarks.")
+    parser.add_argument('--scenarios', default='booking,scan,tracking,dashboard',
+                        help="Comma separated scenarios to run, in order.")
+    parser.add_argument('--size', type=int, default=1000, help="Shipments seeded before running.")
+    parser.add_argument('--requests', type=int, default=200, help="Requests per scenario.")
+    parser.add_argument('--branches', type=int, default=10, help="Branches seeded in the organization.")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed for reproducible data and traffic.")
+    parser.add_argument('--base-url', default=None, help="Benchmark a running server instead of in-process.")
+    parser.add_argument('--output', default=None, help="Write the JSON report here instead of stdout.")
+    args = parser.parse_args(argv)
+
+    setup_django()
+    from .scenarios import SCENARIOS
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)} (available: {', '.join(SCENARIOS)})")
+
+    report = run(scenarios, args.size, args.requests, seed_value=args.seed,
+                 branches=args.branches, base_url=args.base_url)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as fh:
+            fh.write(output + '\n')
+    else:
+        sys.stdout.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
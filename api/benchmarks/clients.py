@@ -0,0 +1,46 @@
+import json
+import time
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+
+class InProcessClient:
+    """Django test client; also reports the number of queries per request."""
+    measures_queries = True
+
+    def __init__(self, host):
+        self.client = Client(HTTP_HOST=host)
+
+    def request(self, method, path, data=None, token=None):
+        headers = {'HTTP_AUTHORIZATION': f"Bearer {token}"} if token else {}
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            resp = self.client.generic(
+                method, path, data=_json(data), content_type='application/json', **headers
+            )
+            elapsed = time.perf_counter() - start
+        return resp.status_code, elapsed, len(ctx.captured_queries)
+
+
+class LiveClient:
+    """Drives a running server over HTTP with connection reuse."""
+    measures_queries = False
+
+    def __init__(self, base_url, host):
+        import requests
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+        self.session.headers.update({'Host': host, 'Content-Type': 'application/json'})
+
+    def request(self, method, path, data=None, token=None):
+        headers = {'Authorization': f"Bearer {token}"} if token else {}
+        start = time.perf_counter()
+        resp = self.session.request(method, self.base_url + path, data=_json(data), headers=headers)
+        elapsed = time.perf_counter() - start
+        return resp.status_code, elapsed, None
+
+
+def _json(data):
+    return json.dumps(data) if data is not None else ''
@@ -0,0 +1,81 @@
+"""
+Password verification throughput per hasher, single-threaded and across a
+thread pool, reported per core. Run from the api/ directory:
+
+    python -m benchmarks.login --seconds 2 --output login.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .runner import setup_django
+
+PASSWORD = "BenchmarkPassword123"
+
+
+def measure(verify, encoded, seconds, threads):
+    deadline = time.perf_counter() + seconds
+
+    def worker():
+        count = 0
+        while time.perf_counter() < deadline:
+            verify(PASSWORD, encoded)
+            count += 1
+        return count
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        total = sum(f.result() for f in [pool.submit(worker) for _ in range(threads)])
+    elapsed = time.perf_counter() - start
+    return {
+        'threads': threads,
+        'verifications': total,
+        'per_second': round(total / elapsed, 2),
+        'per_second_per_core': round(total / elapsed / min(threads, os.cpu_count() or 1), 2),
+    }
+
+
+def run(seconds, threads):
+    from django.conf import settings
+    from django.contrib.auth.hashers import get_hashers, check_password
+    from django.test.utils import override_settings
+    from core.hashers import verify_password, verified_credentials
+
+    report = {'cpu_count': os.cpu_count(), 'hashers': {}}
+    for hasher in get_hashers():
+        encoded = hasher.encode(PASSWORD, hasher.salt())
+        report['hashers'][hasher.algorithm] = {
+            'single_thread': measure(check_password, encoded, seconds, 1),
+            'thread_pool': measure(check_password, encoded, seconds, threads),
+        }
+
+    # Repeat logins served by the verified-credential cache
+    preferred = get_hashers()[0]
+    encoded = preferred.encode(PASSWORD, preferred.salt())
+    verified_credentials.clear()
+    with override_settings(PASSWORD_VERIFY_CACHE_SECONDS=settings.PASSWORD_VERIFY_CACHE_SECONDS or 300):
+        report['verified_cache'] = measure(verify_password, encoded, seconds, 1)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.login', description="Benchmark login hashing throughput.")
+    parser.add_argument('--seconds', type=float, default=2.0, help="Measurement time per case.")
+    parser.add_argument('--threads', type=int, default=os.cpu_count() or 1, help="Threads for the pooled case.")
+    parser.add_argument('--output', default=None, help="Write the JSON report here instead of stdout.")
+    args = parser.parse_args(argv)
+
+    setup_django()
+    output = json.dumps(run(args.seconds, args.threads), indent=2)
+    if args.output:
+        with open(args.output, 'w') as fh:
+            fh.write(output + '\n')
+    else:
+        sys.stdout.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+list_shipments payload cost on seeded data: serialization time (DRF
+serializer vs the .values() fast path), render time per JSON renderer and
+size / time per compression setting. Run from the api/
+directory:
+
+    python -m benchmarks.payload --size 1000 --output payload.json
+"""
+import argparse
+import gzip
+import json
+import sys
+import time
+
+from .runner import setup_django
+
+
+def measure(fn, repeat):
+    """Best-of-`repeat` wall time in milliseconds, plus the last result."""
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best * 1000, 3), result
+
+
+def list_shipments_payload(size, branches, history, seed_value):
+    """The response body list_shipments returns to the organization admin."""
+    from rest_framework import status
+    from core.testing import seed_organization
+    from shipment.serializers import ShipmentSerializer
+    from shipment.views import shipment_queryset
+
+    org, _ = seed_organization(f"payload{seed_value}x{int(time.time())}", branches=branches, shipments=size,
+                               history_per_shipment=history, seed=seed_value)
+    data = ShipmentSerializer(shipment_queryset().filter(organization=org), many=True).data
+    return org, {'status_code': status.HTTP_200_OK, 'message': "Shipments fetched successfully", 'data': data, 'error': None}
+
+
+def measure_serialization(org, repeat):
+    """Query + serialization time of ShipmentSerializer against the .values() fast path."""
+    from shipment.models import Shipment
+    from shipment.representations import shipment_list_data
+    from shipment.serializers import ShipmentSerializer
+    from shipment.views import shipment_queryset
+
+    serializer_ms, _ = measure(lambda: ShipmentSerializer(shipment_queryset().filter(organization=org), many=True).data,
+                               repeat)
+    values_ms, _ = measure(lambda: shipment_list_data(Shipment.objects.filter(organization=org)), repeat)
+    return {'ShipmentSerializer': {'serialize_ms': serializer_ms}, 'shipment_list_data': {'serialize_ms': values_ms}}
+
+
+def run(size, branches, history, repeat, seed_value=0):
+    from django.conf import settings
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment, override_settings
+    from rest_framework.renderers import JSONRenderer
+    from core import renderers
+    from .runner import BENCHMARK_SETTINGS
+
+    report = {
+        'meta': {'size': size, 'branches': branches, 'history_per_shipment': history, 'repeat': repeat,
+                 'orjson': renderers.orjson is not None},
+        'serializers': {},
+        'renderers': {},
+        'compression': {},
+    }
+
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        with override_settings(**BENCHMARK_SETTINGS):
+            org, payload = list_shipments_payload(size, branches, history, seed_value)
+            report['serializers'] = measure_serialization(org, repeat)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+    bodies = []
+    for renderer in (JSONRenderer(), renderers.FastJSONRenderer()):
+        ms, body = measure(lambda: renderer.render(payload), repeat)
+        bodies.append(body)
+        report['renderers'][type(renderer).__name__] = {'render_ms': ms, 'bytes': len(body)}
+    report['meta']['identical_output'] = bodies[0] == bodies[1]
+
+    encoders = {'identity': lambda: body}
+    for level in (1, 6, 9):
+        encoders[f'gzip-{level}'] = lambda level=level: gzip.compress(body, compresslevel=level, mtime=0)
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+    if brotli is not None:
+        for quality in sorted({1, 4, settings.RESPONSE_COMPRESSION_BROTLI_QUALITY, 11}):
+            encoders[f'br-{quality}'] = lambda quality=quality: brotli.compress(body, quality=quality)
+    for name, encode in encoders.items():
+        ms, encoded = measure(encode, repeat)
+        report['compression'][name] = {
+            'encode_ms': ms,
+            'bytes': len(encoded),
+            'ratio': round(len(body) / len(encoded), 2),
+        }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.payload',
+                                     description="Benchmark list_shipments rendering and compression.")
+    parser.add_argument('--size', type=int, default=1000, help="Shipments in the listed organization.")
+    parser.add_argument('--branches', type=int, default=10, help="Branches seeded in the organization.")
+    parser.add_argument('--history', type=int, default=3, help="History rows per shipment.")
+    parser.add_argument('--repeat', type=int, default=5, help="Runs per case; the fastest is reported.")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed for reproducible data.")
+    parser.add_argument('--output', default=None, help="Write the JSON report here instead of stdout.")
+    args = parser.parse_args(argv)
+
+    setup_django()
+    output = json.dumps(run(args.size, args.branches, args.history, args.repeat, seed_value=args.seed), indent=2)
+    if args.output:
+        with open(args.output, 'w') as fh:
+            fh.write(output + '\n')
+    else:
+        sys.stdout.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
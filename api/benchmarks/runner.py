@@ -0,0 +1,113 @@
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import django
+from django.test.utils import override_settings
+
+from .stats import summarize
+
+# Keep side-effects (SMS, webhooks) out of the measured request path
+BENCHMARK_SETTINGS = {
+    'SHIPMENT_EVENTS_INLINE_DISPATCH': False,
+    'DEBUG': False,
+}
+
+
+def setup_django():
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'vyahan-be.settings')
+    django.setup()
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def seed(size, requests, seed_value, branches):
+    """Seeds one organization; `requests` extra BOOKED shipments feed the scan scenario."""
+    from core.testing import seed_organization, seed_shipments, access_token_for
+    from shipment.models import Shipment
+    from .scenarios import Dataset
+
+    rng = random.Random(seed_value)
+    subdomain = f"bench{seed_value}x{int(time.time())}"
+    org, branch_objs = seed_organization(subdomain, branches=branches, shipments=size, seed=seed_value)
+    seed_shipments(org, branch_objs, requests, history_per_shipment=1, rng=rng, prefix=f"B{org.id}")
+
+    return subdomain, Dataset(
+        organization=org,
+        branches=branch_objs,
+        org_token=access_token_for(org),
+        branch_tokens={branch.slug: access_token_for(branch) for branch in branch_objs},
+        tracking_ids=list(Shipment.objects.filter(organization=org).values_list('tracking_id', flat=True)),
+        rng=rng,
+    )
+
+
+def run_scenario(client, scenario, data, count):
+    latencies, queries = [], []
+    errors = 0
+    start = time.perf_counter()
+    for method, path, body, token in scenario(data, count):
+        status, elapsed, query_count = client.request(method, path, data=body, token=token)
+        latencies.append(elapsed)
+        if query_count is not None:
+            queries.append(query_count)
+        if status >= 400:
+            errors += 1
+    wall_time = time.perf_counter() - start
+    return summarize(latencies, wall_time, queries=queries, errors=errors)
+
+
+def run(scenarios, size, requests, seed_value=0, branches=10, base_url=None):
+    """
+    Seeds a dataset and runs the named scenarios in order, returning a JSON-ready report.
+    In-process runs use a throwaway test database; live runs use the configured one.
+    """
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+    from .clients import InProcessClient, LiveClient
+    from .scenarios import SCENARIOS
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'mode': 'live' if base_url else 'in-process',
+            'base_url': base_url,
+            'size': size,
+            'requests': requests,
+            'branches': branches,
+            'seed': seed_value,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+        },
+        'scenarios': {},
+    }
+
+    old_name = None
+    if not base_url:
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        with override_settings(**BENCHMARK_SETTINGS):
+            subdomain, data = seed(size, requests, seed_value, branches)
+            host = f"{subdomain}.vyahan.local"
+            client = LiveClient(base_url, host) if base_url else InProcessClient(host)
+            for name in scenarios:
+                report['scenarios'][name] = run_scenario(client, SCENARIOS[name], data, requests)
+    finally:
+        if not base_url:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+    return report
@@ -0,0 +1,77 @@
+"""
+Scripted workloads. Each scenario takes the seeded Dataset and yields
+(method, path, body, token) requests.
+"""
+import random
+from dataclasses import dataclass, field
+
+from core.testing import DEFAULT_PASSWORD
+from shipment.models import Shipment, ShipmentStatus
+
+
+@dataclass
+class Dataset:
+    organization: object
+    branches: list
+    org_token: str
+    branch_tokens: dict
+    tracking_ids: list = field(default_factory=list)
+    rng: random.Random = field(default_factory=random.Random)
+
+
+def booking_burst(data, count):
+    """Branch counters booking new shipments via create_shipment."""
+    for i in range(count):
+        source, destination = data.rng.sample(data.branches, 2)
+        body = {
+            'sender_name': f"Bench Sender {i}",
+            'sender_phone': f"9{data.rng.randrange(10 ** 9):09d}",
+            'receiver_name': f"Bench Receiver {i}",
+            'receiver_phone': f"9{data.rng.randrange(10 ** 9):09d}",
+            'description': "Benchmark parcel",
+            'price': "250.00",
+            'payment_mode': 'SENDER_PAYS',
+            'destination_branch': destination.slug,
+        }
+        yield 'POST', '/api/shipment/create/', body, data.branch_tokens[source.slug]
+
+
+def manifest_scan(data, count):
+    """A branch scanning a manifest of booked shipments out for transit."""
+    booked = list(
+        Shipment.objects.filter(organization=data.organization, current_status=ShipmentStatus.BOOKED)
+        .select_related('source_branch')
+        .order_by('id')[:count]
+    )
+    for shipment in booked:
+        body = {'status': ShipmentStatus.IN_TRANSIT, 'remarks': "Manifest scan"}
+        token = data.branch_tokens[shipment.source_branch.slug]
+        yield 'PATCH', f'/api/shipment/{shipment.tracking_id}/update-status/', body, token
+
+
+def tracking_storm(data, count):
+    """Anonymous customers polling track_shipment for random tracking IDs."""
+    for _ in range(count):
+        yield 'GET', f'/api/shipment/track/{data.rng.choice(data.tracking_ids)}/', None, None
+
+
+def dashboard_list(data, count):
+    """The organization dashboard refreshing list_shipments."""
+    for _ in range(count):
+        yield 'GET', '/api/shipment/list/', None, data.org_token
+
+
+def branch_login(data, count):
+    """Branch terminals logging in again, as they do when their access token expires."""
+    for _ in range(count):
+        branch = data.rng.choice(data.branches)
+        yield 'POST', '/api/organization/branch/login/', {'branch_id': branch.slug, 'password': DEFAULT_PASSWORD}, None
+
+
+SCENARIOS = {
+    'booking': booking_burst,
+    'scan': manifest_scan,
+    'tracking': tracking_storm,
+    'dashboard': dashboard_list,
+    'login': branch_login,
+}
@@ -0,0 +1,33 @@
+import math
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies, wall_time, queries=None, errors=0):
+    """Latencies in seconds; returns milliseconds, RPS and queries per request."""
+    ordered = sorted(latencies)
+    ms = lambda value: round(value * 1000, 3) if value is not None else None
+    summary = {
+        'requests': len(ordered),
+        'errors': errors,
+        'rps': round(len(ordered) / wall_time, 2) if wall_time else None,
+        'latency_ms': {
+            'p50': ms(percentile(ordered, 50)),
+            'p95': ms(percentile(ordered, 95)),
+            'p99': ms(percentile(ordered, 99)),
+            'mean': ms(sum(ordered) / len(ordered)) if ordered else None,
+            'max': ms(ordered[-1]) if ordered else None,
+        },
+    }
+    if queries:
+        summary['queries_per_request'] = {
+            'mean': round(sum(queries) / len(queries), 2),
+            'max': max(queries),
+        }
+    return summary
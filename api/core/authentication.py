@@ -2,10 +2,38 @@ from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 from rest_framework_simplejwt.backends import TokenBackend
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
-from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from core.denylist import is_token_denied
+from core import tenancy
 from django.contrib.auth.models import AnonymousUser
 from django.conf import settings
 from organization.models import Organization, Branch
+from organization.devices import device_sessions, DeviceSessionError, DEVICE_CLAIM
+from functools import wraps
+import time
+
+
+def timed(authenticate):
+    """Records time spent in authenticate() on the underlying HttpRequest for RequestMetricsMiddleware."""
+    @wraps(authenticate)
+    def wrapper(self, request):
+        start = time.perf_counter()
+        try:
+            return authenticate(self, request)
+        finally:
+            http_request = getattr(request, '_request', request)
+            http_request.auth_duration = getattr(http_request, 'auth_duration', 0.0) + time.perf_counter() - start
+    return wrapper
+
+
+def check_device_session(request, validated_token, branch):
+    """Validates the device session of tokens issued by a device login ('did' claim)."""
+    session_id = validated_token.get(DEVICE_CLAIM)
+    request.device_session = session_id
+    if session_id:
+        try:
+            device_sessions.validate(session_id, branch)
+        except DeviceSessionError as e:
+            raise AuthenticationFailed(str(e))
 
 
 class OrganizationJWTAuthentication(BaseAuthentication):
@@ -14,6 +42,7 @@ class OrganizationJWTAuthentication(BaseAuthentication):
     Only accepts tokens with sub_type='org'.
     """
     
+    @timed
     def authenticate(self, request):
         auth_header = request.META.get('HTTP_AUTHORIZATION', '')
         
@@ -30,7 +59,7 @@ class OrganizationJWTAuthentication(BaseAuthentication):
         
         # Check if token is blacklisted
         jti = validated_token.get('jti')
-        if jti and BlacklistedToken.objects.filter(token__jti=jti).exists():
+        if jti and is_token_denied(jti):
             raise AuthenticationFailed("Token has been blacklisted")
         
         sub_type = validated_token.get('sub_type')
@@ -49,6 +78,7 @@ class OrganizationJWTAuthentication(BaseAuthentication):
         except Organization.DoesNotExist:
             raise AuthenticationFailed("Organization not found")
         
+        tenancy.activate(request.organization)
         return (AnonymousUser(), validated_token)
 
 
@@ -58,6 +88,7 @@ class BranchJWTAuthentication(BaseAuthentication):
     Only accepts tokens with sub_type='branch'.
     """
     
+    @timed
     def authenticate(self, request):
         auth_header = request.META.get('HTTP_AUTHORIZATION', '')
         
@@ -74,7 +105,7 @@ class BranchJWTAuthentication(BaseAuthentication):
         
         # Check if token is blacklisted
         jti = validated_token.get('jti')
-        if jti and BlacklistedToken.objects.filter(token__jti=jti).exists():
+        if jti and is_token_denied(jti):
             raise AuthenticationFailed("Token has been blacklisted")
         
         sub_type = validated_token.get('sub_type')
@@ -87,12 +118,15 @@ class BranchJWTAuthentication(BaseAuthentication):
             raise AuthenticationFailed("Token missing 'sub_id' claim")
         
         try:
-            branch = Branch.objects.get(slug=sub_id)
+            branch = Branch.objects.select_related('organization').get(slug=sub_id, is_active=True)
             request.branch = branch
             request.organization = branch.organization
         except Branch.DoesNotExist:
             raise AuthenticationFailed("Branch not found")
         
+        check_device_session(request, validated_token, branch)
+        
+        tenancy.activate(request.organization)
         return (AnonymousUser(), validated_token)
 
 
@@ -102,6 +136,7 @@ class VyahanJWTAuthentication(BaseAuthentication):
     Sets request.organization and request.branch (if branch token) accordingly.
     """
     
+    @timed
     def authenticate(self, request):
         auth_header = request.META.get('HTTP_AUTHORIZATION', '')
         
@@ -118,7 +153,7 @@ class VyahanJWTAuthentication(BaseAuthentication):
         
         # Check if token is blacklisted
         jti = validated_token.get('jti')
-        if jti and BlacklistedToken.objects.filter(token__jti=jti).exists():
+        if jti and is_token_denied(jti):
             raise AuthenticationFailed("Token has been blacklisted")
         
         sub_type = validated_token.get('sub_type')
@@ -136,12 +171,14 @@ class VyahanJWTAuthentication(BaseAuthentication):
                 raise AuthenticationFailed("Organization not found")
         elif sub_type == 'branch':
             try:
-                branch = Branch.objects.get(slug=sub_id)
+                branch = Branch.objects.select_related('organization').get(slug=sub_id, is_active=True)
                 request.branch = branch
                 request.organization = branch.organization
             except Branch.DoesNotExist:
                 raise AuthenticationFailed("Branch not found")
+            check_device_session(request, validated_token, branch)
         else:
             raise AuthenticationFailed("Invalid token sub_type")
         
+        tenancy.activate(request.organization)
         return (AnonymousUser(), validated_token)
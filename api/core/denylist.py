@@ -0,0 +1,43 @@
+from datetime import datetime, timezone
+
+from django.db import IntegrityError, transaction
+
+from core import metrics
+from core.models import DeniedToken
+
+DENIED_REQUESTS = metrics.REGISTRY.counter(
+    'vyahan_token_denylist_rejections', "Requests rejected because their token is on the denylist."
+)
+
+
+def deny_token(token):
+    """Adds a simplejwt token to the denylist until its expiry."""
+    expires_at = datetime.fromtimestamp(token['exp'], tz=timezone.utc)
+    try:
+        with transaction.atomic():
+            DeniedToken.objects.create(jti=token['jti'], expires_at=expires_at)
+    except IntegrityError:
+        pass
+
+
+def blacklist_token(refresh):
+    """Blacklists a refresh token (simplejwt) and denylists its jti for bearer checks."""
+    refresh.blacklist()
+    deny_token(refresh)
+
+
+def is_token_denied(jti):
+    """Single indexed lookup on the jti, no join with OutstandingToken."""
+    denied = DeniedToken.objects.filter(jti=jti).exists()
+    if denied:
+        DENIED_REQUESTS.inc()
+    return denied
+
+
+def denylist_size():
+    return DeniedToken.objects.count()
+
+
+metrics.REGISTRY.gauge(
+    'vyahan_token_denylist_size', "Rows in the token denylist, counted at scrape time.", callback=denylist_size
+)
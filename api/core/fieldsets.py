@@ -0,0 +1,71 @@
+"""
+Sparse fieldsets: `?fields=` and `?expand=` query parameters.
+
+`fields` lists the fields to return; `expand` lists the nested (expensive)
+fields to include, such as a shipment's history. Without either parameter
+the full representation is returned. With `fields` alone nothing nested is
+included unless it is named in `fields` too; with `expand` alone every
+plain field is returned plus the listed nested ones, so `?expand=` (empty)
+drops all nesting. Views use the selected names to prune their queries as
+well as the output.
+"""
+from drf_yasg import openapi
+
+
+class FieldsetError(ValueError):
+    pass
+
+
+def split_names(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def requested_fields(query_params, available, expandable=()):
+    """
+    Field names selected by the request, in the order of `available`, or None
+    for the full representation. Raises FieldsetError on unknown names.
+    """
+    if 'fields' not in query_params and 'expand' not in query_params:
+        return None
+
+    if 'fields' in query_params:
+        selected = set(split_names(query_params['fields']))
+        unknown = selected - set(available)
+        if unknown:
+            raise FieldsetError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    else:
+        selected = set(available) - set(expandable)
+
+    if 'expand' in query_params:
+        expanded = set(split_names(query_params['expand']))
+        unknown = expanded - set(expandable)
+        if unknown:
+            raise FieldsetError(f"Cannot expand: {', '.join(sorted(unknown))}")
+        selected |= expanded
+    return [name for name in available if name in selected]
+
+
+def fieldset_parameters(available, expandable=()):
+    """swagger_auto_schema(manual_parameters=[...]) for a view supporting fieldsets."""
+    parameters = [
+        openapi.Parameter(
+            'fields', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=False,
+            description=f"Comma separated fields to return. One of: {', '.join(available)}",
+        ),
+    ]
+    if expandable:
+        parameters.append(openapi.Parameter(
+            'expand', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=False,
+            description=f"Comma separated nested fields to include: {', '.join(expandable)}",
+        ))
+    return parameters
+
+
+class FieldsetSerializerMixin:
+    """Serializer taking `fields=[...]` to render only those of its fields."""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
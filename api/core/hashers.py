@@ -0,0 +1,118 @@
+"""
+Password hashing for Organization and Branch credentials.
+
+- Tuned Argon2/scrypt hashers whose parameters come from settings; stored
+  hashes using other parameters (or an older algorithm such as PBKDF2) are
+  transparently re-hashed on the next successful login.
+- A short-lived in-memory cache of verified credentials so terminals that
+  re-login often don't pay for the key derivation every time. Entries are
+  keyed by HMAC(SECRET_KEY, stored hash + password), so a password change
+  invalidates them and no password is kept in memory.
+"""
+import hashlib
+import hmac
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher, ScryptPasswordHasher, check_password, identify_hasher
+)
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2id with parameters from settings.PASSWORD_HASHER_ARGON2."""
+
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_HASHER_ARGON2['time_cost']
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_HASHER_ARGON2['memory_cost']
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_HASHER_ARGON2['parallelism']
+
+
+class TunedScryptPasswordHasher(ScryptPasswordHasher):
+    """scrypt with parameters from settings.PASSWORD_HASHER_SCRYPT."""
+
+    @property
+    def work_factor(self):
+        return settings.PASSWORD_HASHER_SCRYPT['work_factor']
+
+    @property
+    def block_size(self):
+        return settings.PASSWORD_HASHER_SCRYPT['block_size']
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_HASHER_SCRYPT['parallelism']
+
+
+def is_password_hashed(value):
+    """True if `value` is an encoded hash produced by one of PASSWORD_HASHERS."""
+    try:
+        identify_hasher(value)
+    except ValueError:
+        return False
+    return True
+
+
+class VerifiedCredentialCache:
+    """Bounded LRU of recently verified credential digests with a TTL."""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, raw_password, encoded):
+        message = f"{encoded}\0{raw_password}".encode()
+        return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).digest()
+
+    def contains(self, raw_password, encoded):
+        key = self._key(raw_password, encoded)
+        with self._lock:
+            expires_at = self._entries.get(key)
+            if expires_at is None:
+                return False
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return False
+            self._entries.move_to_end(key)
+            return True
+
+    def add(self, raw_password, encoded):
+        key = self._key(raw_password, encoded)
+        with self._lock:
+            self._entries[key] = time.monotonic() + settings.PASSWORD_VERIFY_CACHE_SECONDS
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.PASSWORD_VERIFY_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+verified_credentials = VerifiedCredentialCache()
+
+
+def verify_password(raw_password, encoded, setter=None):
+    """
+    Checks a password against a stored hash. `setter(raw_password)` is called
+    when the hash should be upgraded to the preferred hasher or parameters.
+    """
+    if not raw_password or not encoded:
+        return False
+    if settings.PASSWORD_VERIFY_CACHE_SECONDS and verified_credentials.contains(raw_password, encoded):
+        return True
+    if not check_password(raw_password, encoded, setter):
+        return False
+    if settings.PASSWORD_VERIFY_CACHE_SECONDS:
+        verified_credentials.add(raw_password, encoded)
+    return True
+
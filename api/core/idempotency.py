@@ -0,0 +1,136 @@
+"""
+Idempotency-Key support for mutating endpoints.
+
+The first request with a given key claims it by inserting an
+IdempotencyKey row; the unique (scope, key) constraint makes a concurrent
+duplicate fail that insert and get 409 instead of running the view twice.
+The view runs in a transaction that also stores its response, so the
+response is recorded if and only if the view's writes commit; it is then
+replayed to retries with the same key until IDEMPOTENCY_KEY_TTL passes.
+Server errors release the key so the client can retry for real, and a claim
+left unfinished by a crashed worker is taken over after
+IDEMPOTENCY_KEY_LOCK_TIMEOUT.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from drf_yasg import openapi
+from rest_framework import status
+from rest_framework.response import Response
+
+from core.models import IdempotencyKey
+from core.utils import response
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+# For swagger_auto_schema(manual_parameters=[...]) of idempotent views
+HEADER_PARAMETER = openapi.Parameter(
+    HEADER, openapi.IN_HEADER, type=openapi.TYPE_STRING, required=False,
+    description="Unique key per logical request (e.g. a UUID). Retries with the same key replay the first response.",
+)
+
+
+class ServerError(Exception):
+    """Rolls back a view that returned a 5xx response."""
+
+    def __init__(self, response):
+        self.response = response
+
+
+def request_scope(request):
+    """Keys are per authenticated subject, so two terminals can't collide."""
+    branch = getattr(request, 'branch', None)
+    if branch is not None:
+        return f"branch:{branch.slug}"
+    organization = getattr(request, 'organization', None)
+    return f"org:{organization.slug}" if organization is not None else "anonymous"
+
+
+def request_fingerprint(request):
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(b'\0' + request.get_full_path().encode() + b'\0')
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def is_stale(record, now):
+    if record.expires_at <= now:
+        return True
+    # Never completed: the worker died before its transaction committed
+    return not record.is_complete and record.created_at <= now - settings.IDEMPOTENCY_KEY_LOCK_TIMEOUT
+
+
+def claim(scope, key, fingerprint):
+    """
+    Returns (record, created). An expired or abandoned record is replaced by
+    a fresh claim; record is None if the key keeps changing hands.
+    """
+    now = timezone.now()
+    record = None
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                return IdempotencyKey.objects.create(
+                    scope=scope, key=key, request_hash=fingerprint,
+                    expires_at=now + settings.IDEMPOTENCY_KEY_TTL,
+                ), True
+        except IntegrityError:
+            record = IdempotencyKey.objects.filter(scope=scope, key=key).first()
+            if record is not None and not is_stale(record, now):
+                return record, False
+            if record is not None:
+                IdempotencyKey.objects.filter(pk=record.pk, created_at=record.created_at).delete()
+    return record, False
+
+
+def idempotent(view):
+    """
+    Makes a DRF function view honour the Idempotency-Key header. Apply it
+    below @api_view/@authentication_classes so the request is authenticated.
+    Requests without the header are passed through unchanged.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return response(status.HTTP_400_BAD_REQUEST, f"{HEADER} must be at most {MAX_KEY_LENGTH} characters")
+
+        # Read before the view can consume the stream
+        fingerprint = request_fingerprint(request)
+        record, created = claim(request_scope(request), key, fingerprint)
+
+        if not created:
+            if record is not None and record.request_hash != fingerprint:
+                return response(
+                    status.HTTP_422_UNPROCESSABLE_ENTITY, f"{HEADER} was already used for a different request"
+                )
+            if record is None or not record.is_complete:
+                return response(status.HTTP_409_CONFLICT, f"A request with this {HEADER} is still in progress")
+            replay = Response(record.response_body, status=record.response_status)
+            replay[REPLAYED_HEADER] = 'true'
+            return replay
+
+        try:
+            with transaction.atomic():
+                resp = view(request, *args, **kwargs)
+                if resp.status_code >= 500:
+                    raise ServerError(resp)
+                record.response_status = resp.status_code
+                record.response_body = resp.data
+                record.save(update_fields=['response_status', 'response_body'])
+        except ServerError as e:
+            record.delete()
+            return e.response
+        except Exception:
+            record.delete()
+            raise
+        return resp
+    return wrapper
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import IdempotencyKey
+from core.utils import delete_in_batches
+
+
+class Command(BaseCommand):
+    help = "Delete idempotency keys past their TTL in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows deleted per batch.")
+        parser.add_argument('--sleep', type=float, default=0.0, help="Seconds to pause between batches.")
+
+    def handle(self, *args, **options):
+        expired = IdempotencyKey.objects.filter(expires_at__lt=timezone.now())
+        deleted = delete_in_batches(expired, options['batch_size'], options['sleep'])
+        self.stdout.write(f"Pruned {deleted} idempotency keys")
@@ -0,0 +1,43 @@
+# Generated by Django 6.0.1 on 2026-10-19 12:58
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_denied_tokens(apps, schema_editor):
+    BlacklistedToken = apps.get_model('token_blacklist', 'BlacklistedToken')
+    DeniedToken = apps.get_model('core', 'DeniedToken')
+    live = (
+        BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now())
+        .values_list('token__jti', 'token__expires_at')
+        .iterator(chunk_size=1000)
+    )
+    batch = []
+    for jti, expires_at in live:
+        batch.append(DeniedToken(jti=jti, expires_at=expires_at))
+        if len(batch) >= 1000:
+            DeniedToken.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        DeniedToken.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('token_blacklist', '0013_alter_blacklistedtoken_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeniedToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jti', models.CharField(max_length=255, unique=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_denied_tokens, migrations.RunPython.noop),
+    ]
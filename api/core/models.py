@@ -1,4 +1,5 @@
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.utils import timezone
 from .utils import generate_unique_hash
@@ -39,7 +40,7 @@ class User(AbstractBaseUser, PermissionsMixin):
 class BaseModel(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    slug = models.CharField(max_length=32)
+    slug = models.CharField(max_length=32, db_index=True)
     
     class Meta:
         abstract = True
@@ -47,4 +48,43 @@ class BaseModel(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = generate_unique_hash()
-        super(BaseModel, self).save(*args, **kwargs)    
\ No newline at end of file
+        super(BaseModel, self).save(*args, **kwargs)    
+
+class DeniedToken(models.Model):
+    """
+    Compact JTI denylist checked on every authenticated request.
+    Rows are only needed until the token would expire anyway (see prune_tokens).
+    """
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.jti
+
+
+class IdempotencyKey(models.Model):
+    """
+    A client supplied Idempotency-Key and the response it produced, replayed
+    when the same request is retried. The unique (scope, key) pair
+    serializes concurrent duplicates (see core.idempotency).
+    """
+    scope = models.CharField(max_length=100)
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key'], name='unique_idempotency_key'),
+        ]
+
+    @property
+    def is_complete(self):
+        return self.response_status is not None
+
+    def __str__(self):
+        return f"{self.scope}:{self.key}"
@@ -0,0 +1,71 @@
+"""
+Tenant scoping of model managers.
+
+OrganizationMiddleware opens a tenant_scope() for every request with the
+organization of the subdomain, and the JWT authentication classes switch it
+to the organization of the token with activate(). Inside a scope,
+`Model.objects` of tenant models (TenantManager) only returns rows of that
+organization, so a missing `organization=org` filter can't leak another
+tenant's data. Outside a request (management commands, outbox consumers,
+tests) or inside unscoped() nothing is filtered.
+
+Tenant models keep an unscoped `all_objects` manager and make it their
+default manager, so related managers, admin, validators and deletion
+cascades keep seeing every row.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import models
+
+
+class TenantScope:
+    __slots__ = ('organization',)
+
+    def __init__(self, organization=None):
+        self.organization = organization
+
+
+_scope = ContextVar('tenant_scope', default=None)
+
+
+@contextmanager
+def tenant_scope(organization=None):
+    """Scopes tenant managers to `organization` (None: unscoped) until the block exits."""
+    token = _scope.set(TenantScope(organization))
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def unscoped():
+    """Cross-tenant block inside a request, e.g. for outbox consumers."""
+    return tenant_scope(None)
+
+
+def activate(organization):
+    """Sets the organization of the enclosing tenant_scope(); does nothing outside one."""
+    scope = _scope.get()
+    if scope is not None:
+        scope.organization = organization
+
+
+def current_organization():
+    scope = _scope.get()
+    return scope.organization if scope is not None else None
+
+
+class TenantManager(models.Manager):
+    """Manager filtering on `tenant_field` by the current organization, when there is one."""
+
+    def __init__(self, tenant_field='organization'):
+        super().__init__()
+        self.tenant_field = tenant_field
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        organization = current_organization()
+        if organization is None:
+            return queryset
+        return queryset.filter(**{self.tenant_field: organization})
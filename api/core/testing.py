@@ -0,0 +1,131 @@
+"""
+Test and benchmark helpers: deterministic data seeding and query-count assertions.
+"""
+import random
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.utils import generate_unique_hash, normalize_phone
+from organization.models import Organization, Branch
+from shipment.models import Shipment, ShipmentHistory, ShipmentStatus, PaymentMode
+
+DEFAULT_PASSWORD = "SeedPassword123"
+
+FIRST_NAMES = ["Asha", "Ravi", "Meera", "Kiran", "Arjun", "Priya", "Vikram", "Neha", "Rahul", "Sneha"]
+LAST_NAMES = ["Patel", "Shah", "Mehta", "Iyer", "Singh", "Rao", "Desai", "Nair", "Joshi", "Kapoor"]
+CITIES = ["Surat", "Ahmedabad", "Pune", "Mumbai", "Vadodara", "Rajkot", "Nashik", "Indore", "Jaipur", "Udaipur"]
+
+
+def seed_organization(subdomain, branches=3, shipments=0, history_per_shipment=2, seed=0, password=DEFAULT_PASSWORD):
+    """
+    Creates an organization with `branches` branches and `shipments` shipments
+    spread across random branch pairs, using bulk inserts so large sizes stay fast.
+    The same `seed` always produces the same data. Returns (organization, [branches]).
+    """
+    rng = random.Random(seed)
+    org = Organization.objects.create(title=f"{subdomain.title()} Logistics", subdomain=subdomain, password=password)
+
+    # Hash once: every seeded branch shares the password
+    hashed = make_password(password)
+    branch_objs = Branch.objects.bulk_create([
+        Branch(
+            organization=org,
+            title=f"{CITIES[i % len(CITIES)]} {i + 1}",
+            password=hashed,
+            slug=generate_unique_hash(),
+        )
+        for i in range(branches)
+    ])
+
+    if shipments:
+        seed_shipments(org, branch_objs, shipments, history_per_shipment=history_per_shipment, rng=rng)
+    return org, branch_objs
+
+
+def seed_shipments(org, branches, count, history_per_shipment=2, rng=None, prefix=None):
+    """Bulk-creates `count` shipments (and their history) between random pairs of `branches`."""
+    rng = rng or random.Random(0)
+    prefix = prefix or f"T{org.id}"
+    statuses = [ShipmentStatus.BOOKED, ShipmentStatus.IN_TRANSIT, ShipmentStatus.ARRIVED, ShipmentStatus.DELIVERED]
+
+    new_shipments = []
+    for i in range(count):
+        source, destination = rng.sample(branches, 2) if len(branches) > 1 else (branches[0], branches[0])
+        new_shipments.append(Shipment(
+            organization=org,
+            source_branch=source,
+            destination_branch=destination,
+            tracking_id=f"{prefix}-{i:07d}"[:20],
+            slug=generate_unique_hash(),
+            sender_name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            sender_phone=f"9{rng.randrange(10 ** 9):09d}",
+            receiver_name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            receiver_phone=f"9{rng.randrange(10 ** 9):09d}",
+            description=rng.choice(["Documents", "Electronics", "Clothes", "Spare parts", None]),
+            price=Decimal(rng.randrange(5000, 500000)) / 100,
+            payment_mode=rng.choice(PaymentMode.values),
+            current_status=statuses[min(history_per_shipment, len(statuses)) - 1] if history_per_shipment else ShipmentStatus.BOOKED,
+        ))
+    # bulk_create skips Shipment.save(), which maintains the normalized phones
+    for shipment in new_shipments:
+        shipment.sender_phone_normalized = normalize_phone(shipment.sender_phone)
+        shipment.receiver_phone_normalized = normalize_phone(shipment.receiver_phone)
+    created = Shipment.objects.bulk_create(new_shipments, batch_size=500)
+
+    history = []
+    for shipment in created:
+        for step in range(history_per_shipment):
+            branch = shipment.source_branch if step < 2 else shipment.destination_branch
+            history.append(ShipmentHistory(
+                shipment=shipment,
+                organization=org,
+                branch=branch,
+                status=statuses[min(step, len(statuses) - 1)],
+                location=branch.title,
+                remarks="",
+            ))
+    ShipmentHistory.objects.bulk_create(history, batch_size=500)
+    return created
+
+
+def access_token_for(subject):
+    """Access token for an Organization or Branch, as issued by the login views."""
+    token = AccessToken()
+    token['sub_type'] = 'branch' if isinstance(subject, Branch) else 'org'
+    token['sub_id'] = subject.slug
+    return str(token)
+
+
+def count_queries(func):
+    """Runs `func` and returns (result, number_of_queries)."""
+    with CaptureQueriesContext(connection) as ctx:
+        result = func()
+    return result, len(ctx.captured_queries)
+
+
+class QueryCountAssertionsMixin:
+    """
+    assertConstantQueries runs a scenario against datasets of increasing size
+    and fails if the number of queries grows with the data (an N+1 regression).
+    """
+
+    SIZES = (10, 100, 1000)
+
+    def assertConstantQueries(self, scenario, sizes=None):
+        """
+        `scenario(size)` seeds data for `size` and returns a zero-argument callable
+        that performs the request being measured.
+        """
+        counts = {}
+        for size in sizes or self.SIZES:
+            request = scenario(size)
+            _, counts[size] = count_queries(request)
+        self.assertEqual(
+            len(set(counts.values())), 1,
+            f"Query count grows with data size (size -> queries): {counts}",
+        )
+        return next(iter(counts.values()))
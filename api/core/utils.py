@@ -43,6 +43,28 @@ def generate_unique_hash():
     
     return unique_hash
 
+def normalize_phone(phone, national_digits=10):
+    """
+    Digits-only form of a phone number used for lookups: separators are
+    dropped and a leading country code / trunk 0 is cut down to the last
+    `national_digits` digits, so "+91 98765-43210" and "098765 43210" match.
+    """
+    digits = re.sub(r'\D', '', phone or '')
+    return digits[-national_digits:] if len(digits) > national_digits else digits
+
+
+def delete_in_batches(queryset, batch_size, sleep):
+    """Deletes matching rows in primary-key batches so no single transaction locks the table for long."""
+    deleted = 0
+    while True:
+        ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        queryset.model.objects.filter(pk__in=ids).delete()
+        deleted += len(ids)
+        if sleep:
+            time.sleep(sleep)
+
 
 def custom_exception_handler(exc, context):
     resp = exception_handler(exc, context)
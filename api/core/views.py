@@ -1,3 +1,5 @@
+import hmac
+
 
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import api_view, permission_classes
@@ -6,8 +8,11 @@ from drf_yasg.utils import swagger_auto_schema
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny
 from django.contrib.auth import authenticate, login, logout
+from django.conf import settings
+from django.http import HttpResponse
 
 from core.models import User
+from core.metrics import REGISTRY
 from core.serializers import UserSerializer, RegisterSerializer, BaseResponseSerializer
 from rest_framework import serializers
 class LoginSerializer(serializers.Serializer):
@@ -65,4 +70,18 @@ class SessionLoginView(APIView):
 class SessionLogoutView(APIView):
     def post(self, request):
         logout(request)
-        return response(status.HTTP_200_OK, "Logout successful")
\ No newline at end of file
+        return response(status.HTTP_200_OK, "Logout successful")
+
+
+def metrics(request):
+    """
+    Prometheus scrape endpoint. Requires `Authorization: Bearer <METRICS_AUTH_TOKEN>`;
+    only open without a token when DEBUG is on.
+    """
+    token = settings.METRICS_AUTH_TOKEN
+    if not token:
+        if not settings.DEBUG:
+            return HttpResponse(status=401)
+    elif not hmac.compare_digest(request.META.get('HTTP_AUTHORIZATION', '').encode(), f"Bearer {token}".encode()):
+        return HttpResponse(status=401)
+    return HttpResponse(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
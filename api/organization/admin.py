@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Organization, Branch
+from .models import Organization, Branch, BranchDevice
 # Register your models here.
 
 
@@ -7,7 +7,9 @@ class OrganizationAdmin(admin.ModelAdmin):
 	readonly_fields = ('password','slug')
 
 class BranchAdmin(admin.ModelAdmin):
-	readonly_fields = ('password','slug')
+	readonly_fields = ('password','slug','deactivated_at')
+	list_filter = ('is_active',)
 
 admin.site.register(Organization, OrganizationAdmin)
 admin.site.register(Branch, BranchAdmin)
+admin.site.register(BranchDevice)
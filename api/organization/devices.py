@@ -0,0 +1,122 @@
+"""
+Device sessions for branch terminals.
+
+A device login issues a single long-lived access token carrying a 'did'
+(device session) claim instead of a 15 minute access + refresh pair, so
+terminals stop rotating refresh tokens. The session slides: it stays valid
+while the device keeps making requests within DEVICE_SESSION_IDLE_TIMEOUT.
+
+Validation is served from memory. Each process keeps the last-seen time of
+active sessions and a compact set of revoked session ids, refreshed from the
+database every DEVICE_REVOCATION_REFRESH_SECONDS, so revocations from other
+processes apply within that window.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.utils import generate_unique_hash
+from .models import BranchDevice
+
+DEVICE_CLAIM = 'did'
+
+
+class DeviceSessionError(Exception):
+    pass
+
+
+class DeviceSessionRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_seen = {}     # session id -> (last_seen_at, monotonic time it was read)
+        self._revoked = set()    # session ids revoked within the token lifetime
+        self._revoked_loaded_at = None
+
+    def _refresh_revoked(self):
+        now = time.monotonic()
+        if self._revoked_loaded_at is not None and now - self._revoked_loaded_at < settings.DEVICE_REVOCATION_REFRESH_SECONDS:
+            return
+        cutoff = timezone.now() - settings.DEVICE_SESSION_MAX_LIFETIME
+        revoked = set(BranchDevice.objects.filter(revoked_at__gte=cutoff).values_list('slug', flat=True))
+        with self._lock:
+            self._revoked = revoked
+            self._revoked_loaded_at = now
+            for session_id in revoked:
+                self._last_seen.pop(session_id, None)
+
+    def revoke(self, session_id):
+        with self._lock:
+            self._revoked.add(session_id)
+            self._last_seen.pop(session_id, None)
+
+    def forget(self, session_id):
+        with self._lock:
+            self._last_seen.pop(session_id, None)
+
+    def validate(self, session_id, branch):
+        """Raises DeviceSessionError unless the session is active; slides its expiry."""
+        self._refresh_revoked()
+        if session_id in self._revoked:
+            raise DeviceSessionError("Device session has been revoked")
+
+        now = timezone.now()
+        cached = self._last_seen.get(session_id)
+        if cached is not None and time.monotonic() - cached[1] < settings.DEVICE_REVOCATION_REFRESH_SECONDS:
+            last_seen, verified_at = cached
+        else:
+            # Re-read the session now and then so rotations made by other processes apply
+            device = BranchDevice.objects.filter(slug=session_id, branch=branch).values('last_seen_at', 'revoked_at').first()
+            if device is None or device['revoked_at'] is not None:
+                self.revoke(session_id)
+                raise DeviceSessionError("Device session has been revoked")
+            last_seen, verified_at = device['last_seen_at'], time.monotonic()
+
+        if now - last_seen > settings.DEVICE_SESSION_IDLE_TIMEOUT:
+            self.forget(session_id)
+            raise DeviceSessionError("Device session expired")
+
+        if now - last_seen > settings.DEVICE_SESSION_TOUCH_INTERVAL:
+            # Throttled write: the sliding expiry only needs minute-level precision
+            BranchDevice.objects.filter(slug=session_id).update(last_seen_at=now)
+            last_seen = now
+        with self._lock:
+            self._last_seen[session_id] = (last_seen, verified_at)
+
+
+device_sessions = DeviceSessionRegistry()
+
+
+def start_device_session(branch, device_id, label=''):
+    """
+    Registers (or re-registers) a device for the branch and returns
+    (device, access_token). Logging in again rotates the session id, which
+    ends any previous session of the same device.
+    """
+    now = timezone.now()
+    device, created = BranchDevice.objects.get_or_create(
+        branch=branch, device_id=device_id,
+        defaults={'label': label, 'last_seen_at': now},
+    )
+    if not created:
+        device_sessions.revoke(device.slug)
+        device.slug = generate_unique_hash()
+        device.label = label or device.label
+        device.last_seen_at = now
+        device.revoked_at = None
+        device.save(update_fields=['slug', 'label', 'last_seen_at', 'revoked_at', 'updated_at'])
+
+    token = AccessToken()
+    token.set_exp(lifetime=settings.DEVICE_SESSION_MAX_LIFETIME)
+    token['sub_type'] = 'branch'
+    token['sub_id'] = branch.slug
+    token[DEVICE_CLAIM] = device.slug
+    return device, str(token)
+
+
+def revoke_device(device):
+    device.revoked_at = timezone.now()
+    device.save(update_fields=['revoked_at', 'updated_at'])
+    device_sessions.revoke(device.slug)
@@ -0,0 +1,129 @@
+"""
+Cached organization directory (organization + its branches).
+
+Payloads are stored in the Django cache under a per-organization version
+that is bumped whenever the organization or one of its branches is saved or
+deleted (see signals.py), so they are rebuilt only after a change. Bulk
+writes that bypass model signals must call bump_directory_version(). With a
+shared cache backend (REDIS_URL) every worker sees the same version; a
+per-process cache drops its version after DIRECTORY_VERSION_TIMEOUT so
+changes made by other workers show up within that delay.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Branch
+from .serializers import OrganizationSerializer, BranchDirectorySerializer
+
+VERSION_KEY = 'org-directory-version:{slug}'
+PAYLOAD_KEY = 'org-directory:{slug}:{version}'
+
+
+def directory_version(organization):
+    key = VERSION_KEY.format(slug=organization.slug)
+    version = cache.get(key)
+    if version is None:
+        # Time based so an evicted counter never falls back to an older version
+        cache.add(key, time.time_ns(), timeout=settings.DIRECTORY_VERSION_TIMEOUT)
+        version = cache.get(key)
+    return version
+
+
+def bump_directory_version(organization):
+    key = VERSION_KEY.format(slug=organization.slug)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=settings.DIRECTORY_VERSION_TIMEOUT)
+
+
+# Same fields as OrganizationSerializer / BranchDirectorySerializer, read with .values()
+ORGANIZATION_FIELDS = OrganizationSerializer.Meta.fields
+BRANCH_FIELDS = BranchDirectorySerializer.Meta.fields
+
+
+def build_directory(organization):
+    branches = Branch.objects.filter(organization=organization, is_active=True).order_by('id').values(*BRANCH_FIELDS)
+    data = {field: getattr(organization, field) for field in ORGANIZATION_FIELDS}
+    data['branches'] = list(branches)
+    body = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True)
+    return {
+        'etag': f'"{hashlib.sha1(body.encode()).hexdigest()}"',
+        'data': json.loads(body),
+    }
+
+
+def get_directory(organization):
+    """
+    Returns {'version', 'etag', 'data'} for the organization, building and
+    caching it on the first request after a change.
+    """
+    version = directory_version(organization)
+    key = PAYLOAD_KEY.format(slug=organization.slug, version=version)
+    directory = cache.get(key)
+    if directory is None:
+        directory = build_directory(organization)
+        directory['version'] = version
+        cache.set(key, directory, timeout=None)
+    return directory
+
+
+BranchEntry = namedtuple('BranchEntry', ['id', 'slug', 'title', 'description'])
+
+# (organization slug, include_inactive) -> (directory version, {branch slug: BranchEntry}), per process
+_branch_maps = {}
+_branch_maps_lock = threading.Lock()
+
+
+def get_branch_map(organization, include_inactive=False):
+    """
+    In-memory {slug: BranchEntry} for the organization's active branches (or
+    all of them, for reports over history), reloaded only when the directory
+    version changes (a branch was created, updated, deactivated or deleted).
+    For read-only listings: it can be stale for up to DIRECTORY_VERSION_TIMEOUT,
+    so use resolve_branch() to pick a branch to write to.
+    """
+    version = directory_version(organization)
+    key = (organization.slug, include_inactive)
+    cached = _branch_maps.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    rows = Branch.objects.filter(organization=organization)
+    if not include_inactive:
+        rows = rows.filter(is_active=True)
+    rows = rows.order_by('id').values('id', 'slug', 'title', 'description')
+    entries = {row['slug']: BranchEntry(**row) for row in rows}
+    with _branch_maps_lock:
+        _branch_maps[key] = (version, entries)
+    return entries
+
+
+def resolve_branch(organization, slug):
+    """
+    Returns the active Branch of `organization` with `slug`, or None. Read
+    from the database (one indexed lookup) rather than the branch map: the
+    result is written to shipments and selects queues, and the map of this
+    process can lag behind branches created or deactivated by other workers.
+    """
+    try:
+        branch = Branch.objects.get(organization=organization, slug=slug, is_active=True)
+    except Branch.DoesNotExist:
+        return None
+    branch.organization = organization
+    return branch
+
+
+def resolve_branches(organization, slugs):
+    """resolve_branch() for many slugs in one query: {slug: Branch} of the active ones found."""
+    branches = Branch.objects.filter(organization=organization, slug__in=set(slugs), is_active=True)
+    for branch in branches:
+        branch.organization = organization
+    return {branch.slug: branch for branch in branches}
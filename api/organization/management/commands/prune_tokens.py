@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken, BlacklistedToken
+
+from core.models import DeniedToken
+from core.utils import delete_in_batches
+from organization.models import BranchDevice
+
+
+class Command(BaseCommand):
+    help = "Prune expired outstanding/blacklisted/denylisted tokens and ended device sessions in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows deleted per batch.")
+        parser.add_argument('--sleep', type=float, default=0.0, help="Seconds to pause between batches.")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        batch_size, sleep = options['batch_size'], options['sleep']
+
+        # An expired token fails signature validation anyway, so its blacklist entry is dead weight
+        blacklisted = delete_in_batches(BlacklistedToken.objects.filter(token__expires_at__lt=now), batch_size, sleep)
+        outstanding = delete_in_batches(OutstandingToken.objects.filter(expires_at__lt=now), batch_size, sleep)
+        denied = delete_in_batches(DeniedToken.objects.filter(expires_at__lt=now), batch_size, sleep)
+
+        # Device sessions revoked or unused for longer than the device token lifetime
+        ended = now - settings.DEVICE_SESSION_MAX_LIFETIME
+        devices = delete_in_batches(
+            BranchDevice.objects.filter(Q(revoked_at__lt=ended) | Q(last_seen_at__lt=ended)), batch_size, sleep
+        )
+
+        self.stdout.write(
+            f"Pruned {blacklisted} blacklisted tokens, {outstanding} outstanding tokens, "
+            f"{denied} denylisted tokens, {devices} device sessions"
+        )
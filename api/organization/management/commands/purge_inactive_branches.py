@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from core.utils import delete_in_batches
+from organization.models import Branch
+from shipment.models import Shipment, ShipmentHistory
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete branches deactivated longer ago than BRANCH_PURGE_AFTER, in batches, together with the "
+        "shipments between them. Shipments to or from any other branch are kept, and so is the branch "
+        "until they are gone."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Rows deleted per batch.")
+        parser.add_argument('--sleep', type=float, default=0.0, help="Seconds to pause between batches.")
+
+    def handle(self, *args, **options):
+        batch_size, sleep = options['batch_size'], options['sleep']
+        cutoff = timezone.now() - settings.BRANCH_PURGE_AFTER
+        branches = Branch.all_objects.filter(is_active=False, deactivated_at__lt=cutoff).select_related('organization')
+        purgeable = branches.values('id')
+
+        purged = skipped = shipments_deleted = 0
+        for branch in branches:
+            # Only shipments whose other end is purged too: the rest are still part
+            # of an active (or recently deactivated) branch's records
+            shipments = Shipment.all_objects.filter(
+                Q(source_branch=branch, destination_branch__in=purgeable)
+                | Q(destination_branch=branch, source_branch__in=purgeable)
+            )
+            # History first, so each shipment batch doesn't also cascade over its history rows
+            delete_in_batches(ShipmentHistory.all_objects.filter(shipment__in=shipments), batch_size, sleep)
+            shipments_deleted += delete_in_batches(shipments, batch_size, sleep)
+            # Shipments restrict the branch, so it stays while any are left
+            if Shipment.all_objects.filter(Q(source_branch=branch) | Q(destination_branch=branch)).exists():
+                skipped += 1
+                continue
+            branch.delete()
+            purged += 1
+
+        self.stdout.write(
+            f"Purged {purged} inactive branches and {shipments_deleted} shipments; "
+            f"kept {skipped} still referenced by shipments of other branches"
+        )
@@ -1,4 +1,5 @@
 from organization.models import Organization
+from core.tenancy import tenant_scope
 
 class OrganizationMiddleware:
     def __init__(self, get_response):
@@ -14,7 +15,9 @@ class OrganizationMiddleware:
             request.organization = organization
         except Organization.DoesNotExist:
             request.organization = None
-        response = self.get_response(request)
+        # Tenant managers are scoped to this organization (or the token's, see authentication)
+        with tenant_scope(organization):
+            response = self.get_response(request)
         if organization:
             response.set_cookie('organization_slug', organization.slug)        
         return response
\ No newline at end of file
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-19 12:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='branch',
+            name='slug',
+            field=models.CharField(db_index=True, max_length=32),
+        ),
+        migrations.AlterField(
+            model_name='organization',
+            name='slug',
+            field=models.CharField(db_index=True, max_length=32),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0.1 on 2026-10-19 12:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0002_slug_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BranchDevice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('slug', models.CharField(db_index=True, max_length=32)),
+                ('device_id', models.CharField(max_length=100)),
+                ('label', models.CharField(blank=True, default='', max_length=100)),
+                ('last_seen_at', models.DateTimeField()),
+                ('revoked_at', models.DateTimeField(blank=True, null=True)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='devices', to='organization.branch')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('branch', 'device_id'), name='unique_branch_device')],
+            },
+        ),
+    ]
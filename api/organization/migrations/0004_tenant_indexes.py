@@ -0,0 +1,34 @@
+# Generated by Django 6.0.1 on 2026-10-19 15:00
+
+import django.db.models.deletion
+import django.db.models.manager
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0003_branchdevice'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='branch',
+            options={'default_manager_name': 'all_objects'},
+        ),
+        migrations.AlterModelManagers(
+            name='branch',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='branch',
+            index=models.Index(fields=['organization', 'slug'], name='branch_org_slug'),
+        ),
+        migrations.AlterField(
+            model_name='branch',
+            name='organization',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='branches', to='organization.organization'),
+        ),
+    ]
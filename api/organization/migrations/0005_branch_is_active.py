@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-19 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0004_tenant_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='branch',
+            name='deactivated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='branch',
+            name='is_active',
+            field=models.BooleanField(default=True),
+        ),
+    ]
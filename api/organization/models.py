@@ -1,6 +1,9 @@
 from core.models import BaseModel
 from django.db import models
-from django.contrib.auth.hashers import make_password, check_password
+from django.utils import timezone
+from django.contrib.auth.hashers import make_password
+from core.hashers import is_password_hashed, verify_password
+from core.tenancy import TenantManager
 
 # Create your models here.
 
@@ -12,30 +15,80 @@ class Organization(BaseModel):
     password = models.CharField(max_length=128)
     
     def save(self, *args, **kwargs):
-        if self.password and not self.password.startswith('pbkdf2_'):
+        if self.password and not is_password_hashed(self.password):
             self.password = make_password(self.password)
         super().save(*args, **kwargs)
     
     def check_password(self, raw_password):
-        return check_password(raw_password, self.password)
+        return verify_password(raw_password, self.password, setter=self._upgrade_password)
+    
+    def _upgrade_password(self, raw_password):
+        # Re-hash with the preferred hasher/parameters after a successful login
+        self.password = make_password(raw_password)
+        self.save(update_fields=['password'])
     
     def __str__(self):
         return self.title
 
 class Branch(BaseModel):
-    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='branches')
+    # Indexed as the leading column of branch_org_slug
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='branches', db_index=False)
     title = models.CharField(max_length=100)
     description = models.TextField(null=True, blank=True)
     metadata = models.JSONField(null=True, blank=True)
     password = models.CharField(max_length=128)
+    # Deleted branches are only deactivated: shipments keep their branches, while
+    # listings, the directory and authentication skip inactive ones. The
+    # purge_inactive_branches command removes them for good later.
+    is_active = models.BooleanField(default=True)
+    deactivated_at = models.DateTimeField(null=True, blank=True)
+
+    # Scoped to the current request's organization (core.tenancy); all_objects sees every tenant
+    objects = TenantManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        default_manager_name = 'all_objects'
+        indexes = [
+            models.Index(fields=['organization', 'slug'], name='branch_org_slug'),
+        ]
     
     def save(self, *args, **kwargs):
-        if self.password and not self.password.startswith('pbkdf2_'):
+        if self.password and not is_password_hashed(self.password):
             self.password = make_password(self.password)
         super().save(*args, **kwargs)
     
     def check_password(self, raw_password):
-        return check_password(raw_password, self.password)
+        return verify_password(raw_password, self.password, setter=self._upgrade_password)
     
+    def _upgrade_password(self, raw_password):
+        # Re-hash with the preferred hasher/parameters after a successful login
+        self.password = make_password(raw_password)
+        self.save(update_fields=['password'])
+    
+    def deactivate(self):
+        self.is_active = False
+        self.deactivated_at = timezone.now()
+        self.save(update_fields=['is_active', 'deactivated_at'])
+
+    def __str__(self):
+        return f"{self.title} - {self.organization.title}"
+
+class BranchDevice(BaseModel):
+    """
+    A registered branch terminal. The slug is the device session id carried
+    in the 'did' claim of its access tokens and changes on every login.
+    """
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name='devices')
+    device_id = models.CharField(max_length=100)
+    label = models.CharField(max_length=100, blank=True, default='')
+    last_seen_at = models.DateTimeField()
+    revoked_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['branch', 'device_id'], name='unique_branch_device'),
+        ]
+
     def __str__(self):
-        return f"{self.title} - {self.organization.title}"
\ No newline at end of file
+        return f"{self.label or self.device_id} - {self.branch.title}"
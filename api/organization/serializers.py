@@ -1,18 +1,36 @@
 from rest_framework import serializers
-from .models import Organization, Branch
+from .models import Organization, Branch, BranchDevice
 from .utils import authenticate_organization, authenticate_branch
+from core.fieldsets import FieldsetSerializerMixin
 
 class OrganizationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Organization
         fields = ['slug', 'title', 'subdomain', 'description', 'metadata']
 
-class BranchSerializer(serializers.ModelSerializer):
+class BranchSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
     organization = OrganizationSerializer(read_only=True)
     class Meta:
         model = Branch
         fields = ['slug', 'title', 'description', 'metadata', 'organization']
 
+class BranchDirectorySerializer(serializers.ModelSerializer):
+    """Compact branch representation for directory listings, without the nested organization."""
+    class Meta:
+        model = Branch
+        fields = ['slug', 'title', 'description']
+
+class OrganizationDirectorySerializer(OrganizationSerializer):
+    """Schema for the health check directory—used only for Swagger documentation."""
+    branches = BranchDirectorySerializer(many=True)
+
+    class Meta(OrganizationSerializer.Meta):
+        fields = OrganizationSerializer.Meta.fields + ['branches']
+
+class BranchDirectoryListResponseSerializer(serializers.Serializer):
+    """Schema for compact branch listings—used only for Swagger documentation."""
+    branches = BranchDirectorySerializer(many=True)
+
 class BranchListRequestSerializer(serializers.Serializer):
     pass
 
@@ -38,6 +56,19 @@ class OrganizationCreateSerializer(serializers.ModelSerializer):
 class BranchLoginSerializer(serializers.Serializer):
     branch_id = serializers.CharField(help_text="Branch ID or slug")
     password = serializers.CharField(write_only=True)
+    device_id = serializers.CharField(
+        required=False, max_length=100,
+        help_text="Stable terminal identifier. Starts a long-lived device session instead of access/refresh tokens."
+    )
+    device_label = serializers.CharField(required=False, max_length=100, allow_blank=True)
+
+class BranchDeviceSerializer(serializers.ModelSerializer):
+    branch = serializers.SlugRelatedField(slug_field='slug', read_only=True)
+    branch_title = serializers.ReadOnlyField(source='branch.title')
+
+    class Meta:
+        model = BranchDevice
+        fields = ['slug', 'device_id', 'label', 'branch', 'branch_title', 'last_seen_at', 'revoked_at', 'created_at']
 
 class TokenResponseSerializer(serializers.Serializer):
     access = serializers.CharField()
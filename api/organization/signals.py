@@ -0,0 +1,15 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Organization, Branch
+from .directory import bump_directory_version
+
+
+@receiver([post_save, post_delete], sender=Organization)
+def organization_changed(sender, instance, **kwargs):
+    bump_directory_version(instance)
+
+
+@receiver([post_save, post_delete], sender=Branch)
+def branch_changed(sender, instance, **kwargs):
+    bump_directory_version(instance.organization)
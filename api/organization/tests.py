@@ -1,7 +1,19 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, RequestFactory, override_settings
+from core.authentication import OrganizationJWTAuthentication, BranchJWTAuthentication, VyahanJWTAuthentication
+from core.testing import QueryCountAssertionsMixin, seed_organization, access_token_for, DEFAULT_PASSWORD
 from django.urls import reverse
-from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
-from .models import Organization, Branch
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from core.models import User, DeniedToken
+from django.contrib.auth.hashers import make_password, identify_hasher, get_hashers
+from core.hashers import verified_credentials
+from core.denylist import deny_token
+from .models import Organization, Branch, BranchDevice
+from .devices import device_sessions
+from .utils import authenticate_organization
 import json
 
 
@@ -276,3 +288,413 @@ class TokenBlacklistTests(TestCase):
         # Verify it's now blacklisted
         blacklisted = BlacklistedToken.objects.filter(token__jti=jti).exists()
         self.assertTrue(blacklisted)
+
+
+class RequestMetricsTests(TestCase):
+    """Test request instrumentation and the Prometheus endpoint."""
+
+    def setUp(self):
+        self.org = Organization.objects.create(
+            title="Test Organization",
+            subdomain="test",
+            password="TestPassword123"
+        )
+
+    @override_settings(METRICS_AUTH_TOKEN='scrape-token')
+    def test_metrics_exposed_per_view(self):
+        self.client.get('/api/organization/health/', HTTP_HOST='test.vyahan.local')
+        response = self.client.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer scrape-token')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        self.assertIn('vyahan_http_requests_total{view="health_check",method="GET",status="200"}', body)
+        self.assertIn('vyahan_http_request_duration_seconds_bucket{view="health_check",method="GET",le="+Inf"}', body)
+        self.assertIn('vyahan_db_queries_per_request_count{view="health_check"}', body)
+        self.assertIn('vyahan_http_response_size_bytes_sum{view="health_check"}', body)
+
+    def test_metrics_require_token(self):
+        with self.settings(METRICS_AUTH_TOKEN='scrape-token'):
+            self.assertEqual(self.client.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+        with self.settings(METRICS_AUTH_TOKEN=''):
+            self.assertEqual(self.client.get('/api/metrics/').status_code, 401)
+        with self.settings(METRICS_AUTH_TOKEN='', DEBUG=True):
+            self.assertEqual(self.client.get('/api/metrics/').status_code, 200)
+
+
+class OrganizationQueryCountTests(QueryCountAssertionsMixin, TestCase):
+    """Query counts of organization endpoints and auth classes must not grow with the number of branches."""
+
+    def test_health_check(self):
+        def scenario(size):
+            seed_organization(f"health{size}", branches=size)
+            def request():
+                resp = self.client.get('/api/organization/health/', HTTP_HOST=f"health{size}.vyahan.local")
+                self.assertEqual(len(resp.json()['data']['branches']), size)
+            return request
+        self.assertConstantQueries(scenario)
+
+    def test_organization_branches_list(self):
+        def scenario(size):
+            org, _ = seed_organization(f"admin{size}", branches=size)
+            def request():
+                resp = self.client.get(
+                    '/api/organization/branches/admin/', HTTP_AUTHORIZATION=f"Bearer {access_token_for(org)}"
+                )
+                self.assertEqual(len(resp.json()['data']['branches']), size)
+            return request
+        self.assertConstantQueries(scenario)
+
+    def test_authentication_classes(self):
+        factory = RequestFactory()
+        cases = [
+            (OrganizationJWTAuthentication, lambda org, branches: org),
+            (BranchJWTAuthentication, lambda org, branches: branches[-1]),
+            (VyahanJWTAuthentication, lambda org, branches: org),
+            (VyahanJWTAuthentication, lambda org, branches: branches[-1]),
+        ]
+        for index, (auth_class, subject) in enumerate(cases):
+            def scenario(size):
+                org, branches = seed_organization(f"auth{index}x{size}", branches=size)
+                request = factory.get('/', HTTP_AUTHORIZATION=f"Bearer {access_token_for(subject(org, branches))}")
+                def authenticate():
+                    auth_class().authenticate(request)
+                    # Reading the organization of a branch must not cost another query
+                    request.organization.title
+                return authenticate
+            with self.subTest(auth_class=auth_class.__name__, case=index):
+                self.assertLessEqual(self.assertConstantQueries(scenario), 2)
+
+
+class OrganizationDirectoryTests(TestCase):
+    """Test the cached health check directory and ETag revalidation."""
+
+    def setUp(self):
+        self.org, self.branches = seed_organization("directory", branches=3)
+        self.host = "directory.vyahan.local"
+
+    def test_compact_branches_without_nested_organization(self):
+        data = self.client.get('/api/organization/health/', HTTP_HOST=self.host).json()['data']
+        self.assertEqual(data['slug'], self.org.slug)
+        self.assertEqual([b['slug'] for b in data['branches']], [b.slug for b in self.branches])
+        self.assertNotIn('organization', data['branches'][0])
+
+    def test_etag_revalidation_and_invalidation(self):
+        first = self.client.get('/api/organization/health/', HTTP_HOST=self.host)
+        etag = first['ETag']
+
+        with self.assertNumQueries(1):  # only the subdomain lookup in OrganizationMiddleware
+            cached = self.client.get('/api/organization/health/', HTTP_HOST=self.host, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+
+        Branch.objects.create(organization=self.org, title="New Branch", password="BranchPassword123")
+        changed = self.client.get('/api/organization/health/', HTTP_HOST=self.host, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+        self.assertEqual(len(changed.json()['data']['branches']), 4)
+
+    @override_settings(RESPONSE_COMPRESSION_MIN_BYTES=1)
+    def test_compressed_etag_revalidates(self):
+        first = self.client.get('/api/organization/health/', HTTP_HOST=self.host, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(first['Content-Encoding'], 'gzip')
+        self.assertTrue(first['ETag'].startswith('W/"'))
+
+        cached = self.client.get(
+            '/api/organization/health/', HTTP_HOST=self.host, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=first['ETag']
+        )
+        self.assertEqual(cached.status_code, 304)
+
+    @override_settings(DIRECTORY_VERSION_TIMEOUT=0.2)
+    def test_unsignalled_change_shows_up_after_version_timeout(self):
+        import time
+        from django.core.cache import cache
+        cache.clear()
+        self.client.get('/api/organization/health/', HTTP_HOST=self.host)
+        # Stands in for a write made by another worker process, which this process's cache never hears about
+        Branch.objects.bulk_create([Branch(organization=self.org, title="Elsewhere", password="BranchPassword123")])
+        stale = self.client.get('/api/organization/health/', HTTP_HOST=self.host).json()['data']
+        self.assertEqual(len(stale['branches']), 3)
+        time.sleep(0.3)
+        fresh = self.client.get('/api/organization/health/', HTTP_HOST=self.host).json()['data']
+        self.assertEqual(len(fresh['branches']), 4)
+
+    def test_directory_matches_serializers(self):
+        from django.core.serializers.json import DjangoJSONEncoder
+        from .directory import build_directory
+        from .serializers import OrganizationSerializer, BranchDirectorySerializer
+        self.org.metadata = {'region': "north", 'hubs': [1, 2]}
+        self.org.save()
+
+        expected = OrganizationSerializer(self.org).data
+        expected['branches'] = BranchDirectorySerializer(self.org.branches.order_by('id'), many=True).data
+        self.assertEqual(build_directory(self.org)['data'], json.loads(json.dumps(expected, cls=DjangoJSONEncoder)))
+
+
+class PasswordHashingTests(TestCase):
+    """Test hasher upgrades on login and the verified-credential cache."""
+
+    def setUp(self):
+        verified_credentials.clear()
+
+    def test_legacy_hash_upgraded_on_login(self):
+        org = Organization.objects.create(
+            title="Legacy Organization",
+            subdomain="legacy",
+            password=make_password("TestPassword123", hasher='pbkdf2_sha256'),
+        )
+        self.assertTrue(org.password.startswith('pbkdf2_sha256$'))
+
+        self.assertTrue(authenticate_organization(org.slug, "TestPassword123"))
+        org.refresh_from_db()
+        self.assertEqual(identify_hasher(org.password).algorithm, get_hashers()[0].algorithm)
+        self.assertTrue(org.check_password("TestPassword123"))
+
+    def test_verified_credentials_cached_only_on_success(self):
+        org = Organization.objects.create(title="Test Organization", subdomain="test", password="TestPassword123")
+        self.assertFalse(org.check_password("WrongPassword"))
+        self.assertFalse(verified_credentials.contains("WrongPassword", org.password))
+
+        self.assertTrue(org.check_password("TestPassword123"))
+        self.assertTrue(verified_credentials.contains("TestPassword123", org.password))
+
+        # A changed password never matches an entry for the old hash
+        org.password = "NewPassword123"
+        org.save()
+        self.assertFalse(verified_credentials.contains("TestPassword123", org.password))
+        self.assertFalse(org.check_password("TestPassword123"))
+
+
+class BranchFieldsetTests(TestCase):
+    """Test ?fields= / ?expand= on the branch listings."""
+
+    def setUp(self):
+        self.org, self.branches = seed_organization("branchfields", branches=3)
+
+    def get(self, path, subject, **params):
+        resp = self.client.get(path, params, HTTP_AUTHORIZATION=f"Bearer {access_token_for(subject)}")
+        return resp.status_code, resp.json()
+
+    def test_fields_prune_output_and_query(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            status_code, body = self.get('/api/organization/branches/admin/', self.org, fields='slug,title')
+        self.assertEqual(status_code, 200)
+        self.assertEqual(body['data']['branches'][0], {'slug': self.branches[0].slug, 'title': self.branches[0].title})
+        sql = queries.captured_queries[-1]['sql']
+        self.assertNotIn('password', sql)
+        self.assertNotIn('JOIN', sql)
+
+        status_code, body = self.get('/api/organization/branches/admin/', self.org, fields='slug', expand='organization')
+        self.assertEqual(list(body['data']['branches'][0]), ['slug', 'organization'])
+        self.assertEqual(body['data']['branches'][0]['organization']['slug'], self.org.slug)
+
+        status_code, body = self.get('/api/organization/branches/admin/', self.org, fields='password')
+        self.assertEqual(status_code, 400)
+
+    def test_transfer_list_fields(self):
+        status_code, body = self.get('/api/organization/branch/branches/other/', self.branches[0], fields='slug')
+        self.assertEqual(status_code, 200)
+        self.assertEqual(body['data']['branches'], [{'slug': b.slug} for b in self.branches[1:]])
+
+
+class BranchSoftDeleteTests(TestCase):
+    """Test branch deactivation and the purge_inactive_branches command."""
+
+    def setUp(self):
+        self.org, self.branches = seed_organization("softdelete", branches=3, shipments=10)
+        self.branch = self.branches[0]
+
+    def delete(self, branch):
+        return self.client.delete(
+            f'/api/organization/branches/admin/{branch.slug}/delete/',
+            HTTP_AUTHORIZATION=f"Bearer {access_token_for(self.org)}",
+        )
+
+    def test_delete_deactivates_and_keeps_shipments(self):
+        from shipment.models import Shipment
+        shipments = Shipment.objects.count()
+        self.assertEqual(self.delete(self.branch).status_code, 200)
+        self.branch.refresh_from_db()
+        self.assertFalse(self.branch.is_active)
+        self.assertIsNotNone(self.branch.deactivated_at)
+        self.assertEqual(Shipment.objects.count(), shipments)
+        self.assertEqual(self.delete(self.branch).status_code, 404)
+
+        listed = self.client.get(
+            '/api/organization/branches/admin/', HTTP_AUTHORIZATION=f"Bearer {access_token_for(self.org)}"
+        ).json()['data']['branches']
+        self.assertNotIn(self.branch.slug, [b['slug'] for b in listed])
+        directory = self.client.get('/api/organization/health/', HTTP_HOST="softdelete.vyahan.local").json()['data']
+        self.assertNotIn(self.branch.slug, [b['slug'] for b in directory['branches']])
+
+    def test_inactive_branch_cannot_authenticate(self):
+        token = access_token_for(self.branch)
+        self.branch.deactivate()
+        resp = self.client.get('/api/shipment/list/', HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertEqual(resp.status_code, 403)  # AuthenticationFailed("Branch not found")
+        resp = self.client.post(
+            '/api/organization/branch/login/',
+            data=json.dumps({'branch_id': self.branch.slug, 'password': DEFAULT_PASSWORD}),
+            content_type='application/json',
+        )
+        self.assertEqual(resp.status_code, 401)
+
+    def test_shipments_restrict_branch_hard_delete(self):
+        from django.db.models import RestrictedError
+        with self.assertRaises(RestrictedError):
+            self.branch.delete()
+
+    def test_organization_delete_cascades_over_branches_and_shipments(self):
+        from shipment.models import Shipment
+        self.org.delete()
+        self.assertFalse(Branch.all_objects.filter(organization_id=self.org.id).exists())
+        self.assertFalse(Shipment.all_objects.filter(organization_id=self.org.id).exists())
+
+    def test_purge_removes_branches_past_the_grace_period(self):
+        from django.db.models import Q
+        from core.testing import seed_shipments
+        from shipment.models import Shipment, ShipmentHistory
+        org, (old, old_peer, active, recent) = seed_organization("purge", branches=4)
+        between = seed_shipments(org, [old, old_peer], 4, prefix="PAIR")
+        seed_shipments(org, [old_peer, active], 3, prefix="LIVE")
+        seed_shipments(org, [old, recent], 2, prefix="RECENT")
+        for branch in (old, old_peer, recent):
+            branch.deactivate()
+        Branch.all_objects.filter(pk__in=[old.pk, old_peer.pk]).update(deactivated_at=timezone.now() - timedelta(days=365))
+
+        out = StringIO()
+        call_command('purge_inactive_branches', '--batch-size', '2', stdout=out)
+        # Shipments between two purged branches go; a shipment to an active or
+        # recently deactivated branch stays, and keeps its purged-side branch too
+        self.assertIn("Purged 0 inactive branches and 4 shipments; kept 2", out.getvalue())
+        self.assertFalse(Shipment.all_objects.filter(pk__in=[s.pk for s in between]).exists())
+        self.assertEqual(Shipment.all_objects.filter(organization=org).count(), 5)
+        self.assertFalse(ShipmentHistory.all_objects.filter(shipment_id__in=[s.pk for s in between]).exists())
+
+        # Once the last shipment to a live branch is gone, the branch goes too
+        Shipment.all_objects.filter(Q(source_branch=recent) | Q(destination_branch=recent)).delete()
+        out = StringIO()
+        call_command('purge_inactive_branches', stdout=out)
+        self.assertIn("Purged 1 inactive branches and 0 shipments; kept 1", out.getvalue())
+        self.assertFalse(Branch.all_objects.filter(pk=old.pk).exists())
+        self.assertEqual(Branch.all_objects.filter(pk__in=[old_peer.pk, recent.pk]).count(), 2)
+
+
+class BranchDeviceSessionTests(TestCase):
+    """Test device logins, sliding expiry, revocation and token pruning."""
+
+    def setUp(self):
+        self.org, self.branches = seed_organization("devices", branches=2)
+        self.branch = self.branches[0]
+        device_sessions._revoked_loaded_at = None
+        device_sessions._last_seen.clear()
+
+    def device_login(self, device_id="scanner-1"):
+        response = self.client.post(
+            '/api/organization/branch/login/',
+            data=json.dumps({'branch_id': self.branch.slug, 'password': DEFAULT_PASSWORD, 'device_id': device_id}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()['data']
+
+    def transfer_list(self, access):
+        return self.client.get('/api/organization/branch/branches/other/', HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def test_device_login_issues_single_session_token(self):
+        data = self.device_login()
+        self.assertNotIn('refresh', data)
+        self.assertEqual(data['device']['device_id'], "scanner-1")
+        self.assertFalse(OutstandingToken.objects.exists())
+        self.assertEqual(self.transfer_list(data['access']).status_code, 200)
+
+    def test_sliding_expiry(self):
+        data = self.device_login()
+        BranchDevice.objects.update(last_seen_at=timezone.now() - timedelta(hours=23))
+        device_sessions._last_seen.clear()
+        # Still within the idle timeout: accepted, and last seen slides forward
+        self.assertEqual(self.transfer_list(data['access']).status_code, 200)
+        self.assertGreater(BranchDevice.objects.get().last_seen_at, timezone.now() - timedelta(minutes=1))
+
+        BranchDevice.objects.update(last_seen_at=timezone.now() - timedelta(hours=25))
+        device_sessions._last_seen.clear()
+        self.assertEqual(self.transfer_list(data['access']).status_code, 403)
+
+    def test_revocation_and_relogin_rotation(self):
+        first = self.device_login()
+        second = self.device_login()
+        # Logging in again from the same device ends the previous session
+        self.assertEqual(self.transfer_list(first['access']).status_code, 403)
+        self.assertEqual(self.transfer_list(second['access']).status_code, 200)
+
+        org_token = access_token_for(self.org)
+        response = self.client.post(
+            f"/api/organization/branches/admin/devices/{second['device']['slug']}/revoke/",
+            HTTP_AUTHORIZATION=f'Bearer {org_token}'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.transfer_list(second['access']).status_code, 403)
+
+    def test_prune_tokens(self):
+        from rest_framework_simplejwt.tokens import RefreshToken
+        refresh = RefreshToken.for_user(User.objects.create_user(email="ops@example.com", password="x"))
+        refresh.blacklist()
+        OutstandingToken.objects.update(expires_at=timezone.now() - timedelta(days=1))
+        self.device_login()
+        BranchDevice.objects.update(revoked_at=timezone.now() - timedelta(days=31))
+
+        call_command('prune_tokens', batch_size=1, stdout=StringIO())
+        self.assertFalse(OutstandingToken.objects.exists())
+        self.assertFalse(BlacklistedToken.objects.exists())
+        self.assertFalse(BranchDevice.objects.exists())
+
+
+class TokenDenylistTests(TestCase):
+    """Revoked refresh tokens land in the compact JTI denylist checked by authentication."""
+
+    def setUp(self):
+        self.client = Client()
+        self.org, _ = seed_organization("denylist", branches=1)
+
+    def login(self):
+        response = self.client.post(
+            '/api/organization/login/',
+            data=json.dumps({'org_id': self.org.slug, 'password': DEFAULT_PASSWORD}),
+            content_type='application/json'
+        )
+        return response.json()['data']['refresh']
+
+    def test_logout_and_rotation_deny_refresh_token(self):
+        from rest_framework_simplejwt.tokens import RefreshToken
+        refresh = self.login()
+        self.client.post(
+            '/api/organization/token/refresh/',
+            data=json.dumps({'refresh': refresh}),
+            content_type='application/json'
+        )
+        other = self.login()
+        self.client.post(
+            '/api/organization/logout/',
+            data=json.dumps({'refresh': other}),
+            content_type='application/json'
+        )
+        denied = set(DeniedToken.objects.values_list('jti', flat=True))
+        self.assertEqual(denied, {RefreshToken(refresh, verify=False)['jti'], RefreshToken(other, verify=False)['jti']})
+
+    def test_denied_token_is_rejected_as_bearer(self):
+        from rest_framework.exceptions import AuthenticationFailed
+        from rest_framework_simplejwt.tokens import AccessToken
+        token = AccessToken(access_token_for(self.org))
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertIsNotNone(OrganizationJWTAuthentication().authenticate(request))
+
+        deny_token(token)
+        with self.assertRaisesMessage(AuthenticationFailed, "Token has been blacklisted"):
+            OrganizationJWTAuthentication().authenticate(request)
+
+    def test_prune_tokens_removes_expired_entries(self):
+        DeniedToken.objects.create(jti="expired", expires_at=timezone.now() - timedelta(minutes=1))
+        DeniedToken.objects.create(jti="live", expires_at=timezone.now() + timedelta(days=1))
+        call_command('prune_tokens', stdout=StringIO())
+        self.assertEqual(list(DeniedToken.objects.values_list('jti', flat=True)), ["live"])
@@ -3,7 +3,8 @@ from .views import (
     list_branches, organization_login, branch_login, 
     refresh_tokens, logout, health_check,
     organization_branches_list, branch_transfer_list,
-    create_branch, delete_branch, create_organization
+    create_branch, delete_branch, create_organization,
+    organization_devices_list, revoke_branch_device, device_logout
 )
 
 urlpatterns = [
@@ -16,6 +17,9 @@ urlpatterns = [
     path('branches/admin/', organization_branches_list, name='organization_branches_list'),
     path('branches/admin/create/', create_branch, name='create_branch'),
     path('branches/admin/<slug:branch_slug>/delete/', delete_branch, name='delete_branch'),
+    path('branches/admin/devices/', organization_devices_list, name='organization_devices_list'),
+    path('branches/admin/devices/<slug:device_slug>/revoke/', revoke_branch_device, name='revoke_branch_device'),
+    path('branch/device/logout/', device_logout, name='device_logout'),
     path('branch/branches/other/', branch_transfer_list, name='branch_transfer_list'),
     path('health/', health_check, name='health_check'),
 ]
@@ -11,9 +11,11 @@ def authenticate_organization(org_id_or_slug, password):
 
 def authenticate_branch(branch_id_or_slug, password):
 	try:
-		branch = Branch.objects.get(id=branch_id_or_slug) if str(branch_id_or_slug).isdigit() else Branch.objects.get(slug=branch_id_or_slug)
+		branches = Branch.objects.filter(is_active=True)
+		branch = branches.get(id=branch_id_or_slug) if str(branch_id_or_slug).isdigit() else branches.get(slug=branch_id_or_slug)
 	except Branch.DoesNotExist:
 		return None
 	if branch.check_password(password):
 		return branch
 	return None
+
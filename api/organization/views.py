@@ -3,23 +3,50 @@ from drf_yasg.utils import swagger_auto_schema
 from rest_framework.permissions import AllowAny
 from rest_framework import status, serializers
 from rest_framework_simplejwt.tokens import RefreshToken
-from .models import Branch
+from django.utils.cache import get_conditional_response
+from .models import Branch, BranchDevice
+from .devices import start_device_session, revoke_device
+from .directory import get_directory, get_branch_map
 from .utils import authenticate_organization, authenticate_branch
 from core.utils import response
+from core.fieldsets import FieldsetError, requested_fields, fieldset_parameters
+from core.denylist import blacklist_token
 from .permissions import IsOrganizationSet
 from core.authentication import OrganizationJWTAuthentication, BranchJWTAuthentication
 from .serializers import (
     OrganizationSerializer, BranchSerializer, BranchListRequestSerializer, BranchListResponseSerializer,
     OrganizationLoginSerializer, BranchLoginSerializer, TokenResponseSerializer,
-    RefreshTokenSerializer, LogoutSerializer, BranchCreateSerializer, OrganizationCreateSerializer
+    RefreshTokenSerializer, LogoutSerializer, BranchCreateSerializer, OrganizationCreateSerializer,
+    OrganizationDirectorySerializer, BranchDirectoryListResponseSerializer, BranchDeviceSerializer,
+    BranchDirectorySerializer,
 )
 
 
+# ?fields= / ?expand= on the branch listings; the nested organization is the only expansion
+BRANCH_FIELDS = BranchSerializer.Meta.fields
+BRANCH_EXPANDABLE = ('organization',)
+DIRECTORY_BRANCH_FIELDS = BranchDirectorySerializer.Meta.fields
+
+
+def branch_list_data(request, org):
+	"""
+	{'branches': [...]} as BranchListResponseSerializer renders it, loading only
+	the columns of the requested fields. Raises FieldsetError.
+	"""
+	fields = requested_fields(request.query_params, BRANCH_FIELDS, BRANCH_EXPANDABLE)
+	branches = Branch.objects.filter(organization=org, is_active=True).order_by('id')
+	if fields is None or 'organization' in fields:
+		branches = branches.select_related('organization')
+	if fields is not None:
+		branches = branches.only('id', 'organization', *(field for field in fields if field != 'organization'))
+	return {'branches': BranchSerializer(branches, many=True, fields=fields).data}
+
+
 # open
 @swagger_auto_schema(
 	method='get',
-	responses={200: OrganizationSerializer},
-	operation_description="Check organization health and return details if subdomain is valid.",
+	responses={200: OrganizationDirectorySerializer, 304: "Directory unchanged (matches If-None-Match)"},
+	operation_description="Check organization health and return details if subdomain is valid. Supports ETag revalidation.",
 )
 @api_view(['GET'])
 @permission_classes([AllowAny])
@@ -28,14 +55,14 @@ def health_check(request):
 	if not org:
 		return response(status.HTTP_404_NOT_FOUND, "Organization not found")
 	
-	org_serializer = OrganizationSerializer(org)
-	branches = Branch.objects.filter(organization=org)
-	branch_serializer = BranchSerializer(branches, many=True)
-	
-	resp_data = org_serializer.data
-	resp_data['branches'] = branch_serializer.data
-	
-	return response(status.HTTP_200_OK, "Organization is healthy", data=resp_data)
+	directory = get_directory(org)
+	# Weak comparison: CompressionMiddleware sends the ETag back as W/"..."
+	resp = get_conditional_response(request, etag=directory['etag'])
+	if resp is None:
+		resp = response(status.HTTP_200_OK, "Organization is healthy", data=directory['data'])
+	resp['ETag'] = directory['etag']
+	resp['Cache-Control'] = 'no-cache'
+	return resp
 	
 @swagger_auto_schema(
 	method='post',
@@ -55,6 +82,7 @@ def create_organization(request):
 @swagger_auto_schema(
 	method='get',
 	query_serializer=BranchListRequestSerializer,
+	manual_parameters=fieldset_parameters(BRANCH_FIELDS, BRANCH_EXPANDABLE),
 	responses={200: BranchListResponseSerializer},
 	operation_description="Get all branches under an organization. (Legacy/Public usage)",
 )
@@ -64,9 +92,11 @@ def list_branches(request):
 	org = getattr(request, 'organization', None)
 	if not org:
 		return response(status.HTTP_404_NOT_FOUND, "Organization not found")
-	branches = Branch.objects.filter(organization=org)
-	resp_serializer = BranchListResponseSerializer({'branches': branches})
-	return response(status.HTTP_200_OK, "Branches fetched successfully", data=resp_serializer.data)
+	try:
+		data = branch_list_data(request, org)
+	except FieldsetError as e:
+		return response(status.HTTP_400_BAD_REQUEST, str(e))
+	return response(status.HTTP_200_OK, "Branches fetched successfully", data=data)
 
 
 
@@ -96,7 +126,7 @@ def refresh_tokens(request):
 		sub_id = old_refresh.get('sub_id')
 		
 		# Blacklist the old refresh token
-		old_refresh.blacklist()
+		blacklist_token(old_refresh)
 		
 		# Create new tokens with the same claims
 		new_refresh = RefreshToken()
@@ -133,7 +163,7 @@ def logout(request):
     try:
         # Blacklist refresh token
         refresh = RefreshToken(refresh_token_str)
-        refresh.blacklist()
+        blacklist_token(refresh)
         
         return response(status.HTTP_200_OK, "Logout successful")
     except Exception as e:
@@ -177,7 +207,7 @@ def organization_login(request):
 	method='post',
 	request_body=BranchLoginSerializer,
 	responses={200: TokenResponseSerializer},
-	operation_description="Authenticate branch with branch_id and password. Returns access and refresh tokens."
+	operation_description="Authenticate branch with branch_id and password. Returns access and refresh tokens, or a device session token when device_id is given."
 )
 @api_view(['POST'])
 @permission_classes([AllowAny])
@@ -193,6 +223,17 @@ def branch_login(request):
 	if not branch:
 		return response(status.HTTP_401_UNAUTHORIZED, "Invalid branch credentials")
 	
+	device_id = serializer.validated_data.get('device_id')
+	if device_id:
+		# Device session: one long-lived, sliding access token and no refresh token
+		device, access = start_device_session(branch, device_id, serializer.validated_data.get('device_label', ''))
+		token_data = {
+			'access': access,
+			'device': BranchDeviceSerializer(device).data,
+			'branch': BranchSerializer(branch).data,
+		}
+		return response(status.HTTP_200_OK, "Branch device login successful", data=token_data)
+	
 	refresh = RefreshToken()
 	refresh['sub_type'] = 'branch'
 	refresh['sub_id'] = branch.slug
@@ -232,6 +273,7 @@ def create_branch(request):
 
 @swagger_auto_schema(
 	method='get',
+	manual_parameters=fieldset_parameters(BRANCH_FIELDS, BRANCH_EXPANDABLE),
 	responses={200: BranchListResponseSerializer},
 	operation_description="Get all branches under the organization. Requires Organization JWT authentication.",
 	security=[{'Bearer': []}]
@@ -243,15 +285,20 @@ def organization_branches_list(request):
 	org = getattr(request, 'organization', None)
 	if not org:
 		return response(status.HTTP_404_NOT_FOUND, "Organization not found")
-	branches = Branch.objects.filter(organization=org)
-	resp_serializer = BranchListResponseSerializer({'branches': branches})
-	return response(status.HTTP_200_OK, "Organization branches fetched successfully", data=resp_serializer.data)
+	try:
+		data = branch_list_data(request, org)
+	except FieldsetError as e:
+		return response(status.HTTP_400_BAD_REQUEST, str(e))
+	return response(status.HTTP_200_OK, "Organization branches fetched successfully", data=data)
 
 
 @swagger_auto_schema(
 	method='delete',
 	responses={200: "Branch deleted successfully", 404: "Branch not found"},
-	operation_description="Delete a branch. Requires Organization JWT authentication.",
+	operation_description=(
+		"Delete a branch. The branch is deactivated: it can no longer log in and disappears from "
+		"listings, while its shipments are kept. Requires Organization JWT authentication."
+	),
 	security=[{'Bearer': []}]
 )
 @api_view(['DELETE'])
@@ -263,17 +310,77 @@ def delete_branch(request, branch_slug):
 		return response(status.HTTP_404_NOT_FOUND, "Organization not found")
 	
 	try:
-		branch = Branch.objects.get(organization=org, slug=branch_slug)
-		branch.delete()
+		branch = Branch.objects.get(organization=org, slug=branch_slug, is_active=True)
+		branch.deactivate()
 		return response(status.HTTP_200_OK, "Branch deleted successfully")
 	except Branch.DoesNotExist:
 		return response(status.HTTP_404_NOT_FOUND, "Branch not found")
 
 
+@swagger_auto_schema(
+	method='get',
+	responses={200: BranchDeviceSerializer(many=True)},
+	operation_description="List registered branch devices. Requires Organization JWT authentication.",
+	security=[{'Bearer': []}]
+)
+@api_view(['GET'])
+@authentication_classes([OrganizationJWTAuthentication])
+@permission_classes([IsOrganizationSet])
+def organization_devices_list(request):
+	org = getattr(request, 'organization', None)
+	if not org:
+		return response(status.HTTP_404_NOT_FOUND, "Organization not found")
+	devices = BranchDevice.objects.filter(branch__organization=org).select_related('branch').order_by('-last_seen_at')
+	return response(status.HTTP_200_OK, "Devices fetched successfully", data=BranchDeviceSerializer(devices, many=True).data)
+
+
+@swagger_auto_schema(
+	method='post',
+	responses={200: "Device revoked successfully", 404: "Device not found"},
+	operation_description="Revoke a branch device session. Requires Organization JWT authentication.",
+	security=[{'Bearer': []}]
+)
+@api_view(['POST'])
+@authentication_classes([OrganizationJWTAuthentication])
+@permission_classes([IsOrganizationSet])
+def revoke_branch_device(request, device_slug):
+	org = getattr(request, 'organization', None)
+	if not org:
+		return response(status.HTTP_404_NOT_FOUND, "Organization not found")
+	
+	try:
+		device = BranchDevice.objects.get(branch__organization=org, slug=device_slug)
+	except BranchDevice.DoesNotExist:
+		return response(status.HTTP_404_NOT_FOUND, "Device not found")
+	revoke_device(device)
+	return response(status.HTTP_200_OK, "Device revoked successfully")
+
+
 # Branch Specific
+@swagger_auto_schema(
+	method='post',
+	responses={200: "Device logout successful", 400: "Not a device session"},
+	operation_description="End the current device session. Requires a device session token.",
+	security=[{'Bearer': []}]
+)
+@api_view(['POST'])
+@authentication_classes([BranchJWTAuthentication])
+@permission_classes([IsOrganizationSet])
+def device_logout(request):
+	session_id = getattr(request, 'device_session', None)
+	if not session_id:
+		return response(status.HTTP_400_BAD_REQUEST, "Not a device session")
+	
+	device = BranchDevice.objects.filter(branch=request.branch, slug=session_id).first()
+	if device:
+		revoke_device(device)
+	return response(status.HTTP_200_OK, "Device logout successful")
+
+
 @swagger_auto_schema(
 	method='get',
-	responses={200: BranchListResponseSerializer},
+	manual_parameters=fieldset_parameters(DIRECTORY_BRANCH_FIELDS),
+	responses={200: BranchDirectoryListResponseSerializer},
 	operation_description="Get all branches in the organization except the authenticated branch. Requires Branch JWT authentication.",
 	security=[{'Bearer': []}]
 )
@@ -288,7 +395,15 @@ def branch_transfer_list(request):
 		return response(status.HTTP_404_NOT_FOUND, "Organization not found")
 	if not current_branch:
 		return response(status.HTTP_401_UNAUTHORIZED, "Branch context required")
-		
-	branches = Branch.objects.filter(organization=org).exclude(id=current_branch.id)
-	resp_serializer = BranchListResponseSerializer({'branches': branches})
-	return response(status.HTTP_200_OK, "Transfer branches fetched successfully", data=resp_serializer.data)
+	try:
+		fields = requested_fields(request.query_params, DIRECTORY_BRANCH_FIELDS) or DIRECTORY_BRANCH_FIELDS
+	except FieldsetError as e:
+		return response(status.HTTP_400_BAD_REQUEST, str(e))
+	
+	# Served from the in-memory branch directory, no branch query
+	branches = [
+		{field: getattr(entry, field) for field in fields}
+		for entry in get_branch_map(org).values()
+		if entry.id != current_branch.id
+	]
+	return response(status.HTTP_200_OK, "Transfer branches fetched successfully", data={'branches': branches})
@@ -0,0 +1,82 @@
+"""
+Branch activity feed: status changes scanned at a branch, newest first.
+
+Pages are a keyset on (created_at, id) of ShipmentHistory rows with
+branch = ?, served backwards from the history_branch_activity index, which
+also holds status and shipment so the history side of the query never
+reads the table; the tracking id comes from a primary key lookup on the
+shipment. The cursor is opaque to clients and holds the (created_at, id) of
+the last row returned and the window of the first page, so a walk that
+crosses midnight keeps the day it started on.
+"""
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import cursors
+from .cursors import CursorError
+from .models import ShipmentHistory
+from .representations import format_datetime
+
+COLUMNS = ('id', 'tracking_id', 'status', 'created_at')
+
+
+def encode_cursor(created_at, history_id, since, until):
+    return cursors.encode_cursor({
+        't': created_at.isoformat(),
+        'h': history_id,
+        's': since.isoformat(),
+        'u': until.isoformat() if until else None,
+    })
+
+
+def decode_cursor(value):
+    """Returns (created_at, history id, since, until or None). Raises CursorError."""
+    try:
+        data = cursors.decode_cursor(value)
+        until = datetime.fromisoformat(data['u']) if data['u'] else None
+        return datetime.fromisoformat(data['t']), int(data['h']), datetime.fromisoformat(data['s']), until
+    except (ValueError, KeyError, TypeError) as e:
+        raise CursorError("Invalid cursor") from e
+
+
+def start_of_day(now=None):
+    return timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def branch_activity(branch, since, until=None, cursor=None, limit=None):
+    """
+    Returns a dict with 'activity', 'cursor' and 'has_more' for history rows
+    of `branch` created in [since, until). With a cursor the window of the
+    first page is used instead. `branch` must already be checked against the
+    organization. Raises CursorError for a malformed cursor.
+    """
+    limit = limit or settings.BRANCH_ACTIVITY_PAGE_SIZE
+    before = last_id = None
+    if cursor:
+        before, last_id, since, until = decode_cursor(cursor)
+
+    # Unscoped: the branch implies the tenant, and an organization filter
+    # would need the table row for every index entry
+    rows = ShipmentHistory.all_objects.filter(branch=branch, created_at__gte=since)
+    if until is not None:
+        rows = rows.filter(created_at__lt=until)
+    if before is not None:
+        rows = rows.filter(Q(created_at__lt=before) | Q(created_at=before, id__lt=last_id))
+    rows = list(
+        rows.order_by('-created_at', '-id')
+        .annotate(tracking_id=F('shipment__tracking_id'))
+        .values(*COLUMNS)[:limit + 1]
+    )
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if rows:
+        cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id'], since, until)
+    return {
+        'activity': [{**row, 'created_at': format_datetime(row['created_at'])} for row in rows],
+        'cursor': cursor or None,
+        'has_more': has_more,
+    }
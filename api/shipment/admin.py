@@ -1,6 +1,8 @@
 from django.contrib import admin
-from .models import Shipment, ShipmentHistory
+from .models import Shipment, ShipmentHistory, ShipmentEvent, ConsumerOffset
 # Register your models here.
 
 admin.site.register(Shipment)
 admin.site.register(ShipmentHistory)
+admin.site.register(ShipmentEvent)
+admin.site.register(ConsumerOffset)
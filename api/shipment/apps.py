@@ -1,5 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ShipmentConfig(AppConfig):
     name = 'shipment'
+
+    def ready(self):
+        from . import consumers  # noqa: F401 - registers shipment event consumers
+        from . import signals  # noqa: F401 - writes tombstones for the changes feed
+        from .search import ensure_search_index
+        post_migrate.connect(ensure_search_index, sender=self)
@@ -0,0 +1,102 @@
+"""
+Changes feed: shipments, history rows and deletions after a cursor.
+
+The cursor is opaque to clients. It holds the (updated_at, id) of the last
+shipment returned, a keyset served by the (organization, updated_at, id)
+index, the id of the last tombstone returned and when it was issued: a
+cursor older than the tombstone retention may have missed deletions. Every write path must
+bump Shipment.updated_at, including queryset.update() and bulk_update(),
+which don't apply auto_now: pass updated_at explicitly there.
+
+History rows of each returned shipment are those created after the previous
+cursor. A row written in the same transaction as the shipment that ended the
+previous page can be sent twice, so clients upsert history by id.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import cursors
+from .cursors import CursorError
+from .models import Shipment, ShipmentHistory, ShipmentTombstone
+
+
+class CursorExpired(CursorError):
+    pass
+
+
+def encode_cursor(updated_at, shipment_id, tombstone_id, issued_at):
+    return cursors.encode_cursor({
+        't': updated_at.isoformat() if updated_at else None,
+        's': shipment_id,
+        'd': tombstone_id,
+        'a': issued_at.isoformat(),
+    })
+
+
+def decode_cursor(value):
+    """Returns (updated_at or None, shipment id, tombstone id, issued_at or None). Raises CursorError."""
+    if not value:
+        return None, 0, 0, None
+    try:
+        data = cursors.decode_cursor(value)
+        updated_at = datetime.fromisoformat(data['t']) if data['t'] else None
+        return updated_at, int(data['s']), int(data['d']), datetime.fromisoformat(data['a'])
+    except (ValueError, KeyError, TypeError) as e:
+        raise CursorError("Invalid cursor") from e
+
+
+def branch_scope(queryset, branch):
+    if branch is None:
+        return queryset
+    return queryset.filter(Q(source_branch=branch) | Q(destination_branch=branch))
+
+
+def changes_since(organization, cursor, branch=None, limit=None):
+    """
+    Returns a dict with 'shipments', 'history', 'deleted', 'cursor' and
+    'has_more'. Raises CursorError for a malformed cursor and CursorExpired
+    when tombstones the client still needs may have been pruned.
+    """
+    limit = limit or settings.CHANGES_FEED_PAGE_SIZE
+    since, last_id, last_tombstone, issued_at = decode_cursor(cursor)
+    now = timezone.now()
+    if issued_at is not None and issued_at < now - settings.CHANGES_TOMBSTONE_RETENTION:
+        raise CursorExpired("Cursor is older than the tombstone retention; resync from scratch")
+
+    shipments = branch_scope(Shipment.objects.filter(organization=organization), branch)
+    if settings.CHANGES_FEED_SETTLE_SECONDS:
+        # Leave time for transactions that stamped an earlier updated_at to commit
+        shipments = shipments.filter(updated_at__lte=now - timedelta(seconds=settings.CHANGES_FEED_SETTLE_SECONDS))
+    if since is not None:
+        shipments = shipments.filter(Q(updated_at__gt=since) | Q(updated_at=since, id__gt=last_id))
+    shipments = list(
+        shipments.select_related('source_branch', 'destination_branch').order_by('updated_at', 'id')[:limit + 1]
+    )
+
+    tombstones = branch_scope(
+        ShipmentTombstone.objects.filter(organization=organization, id__gt=last_tombstone), branch
+    )
+    tombstones = list(tombstones.order_by('id')[:limit + 1])
+
+    has_more = len(shipments) > limit or len(tombstones) > limit
+    shipments, tombstones = shipments[:limit], tombstones[:limit]
+
+    history = ShipmentHistory.objects.filter(shipment__in=[s.id for s in shipments])
+    if since is not None:
+        history = history.filter(created_at__gt=since)
+    history = list(history.annotate(tracking_id=F('shipment__tracking_id')).order_by('created_at', 'id'))
+
+    if shipments:
+        since, last_id = shipments[-1].updated_at, shipments[-1].id
+    if tombstones:
+        last_tombstone = tombstones[-1].id
+    return {
+        'shipments': shipments,
+        'history': history,
+        'deleted': tombstones,
+        'cursor': encode_cursor(since, last_id, last_tombstone, now),
+        'has_more': has_more,
+    }
@@ -0,0 +1,9 @@
+from .events import register_consumer
+from .notifications import notify_shipment_event
+
+
+@register_consumer('sms')
+def send_sms_notifications(events):
+    for event in events:
+        if event.shipment is not None:
+            notify_shipment_event(event.shipment, event.event_type, location=event.location)
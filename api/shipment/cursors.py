@@ -0,0 +1,26 @@
+"""
+Opaque page cursors shared by the shipment feeds: a small JSON object,
+base64url encoded without padding. Each feed decides what goes in it.
+"""
+import base64
+import json
+
+
+class CursorError(ValueError):
+    pass
+
+
+def encode_cursor(data):
+    raw = json.dumps(data, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(value):
+    """Returns the dict encoded in `value`. Raises CursorError."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)))
+    except (ValueError, TypeError) as e:
+        raise CursorError("Invalid cursor") from e
+    if not isinstance(data, dict):
+        raise CursorError("Invalid cursor")
+    return data
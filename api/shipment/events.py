@@ -0,0 +1,142 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core.tenancy import unscoped
+from .models import ShipmentEvent, ConsumerOffset
+
+logger = logging.getLogger(__name__)
+
+# consumer name -> (handler, batch_size)
+_consumers = {}
+
+
+def register_consumer(name, batch_size=None):
+    """
+    Registers an in-process consumer of shipment events.
+    The handler receives a list of ShipmentEvent objects (in id order) and
+    must tolerate seeing an event more than once: the consumer offset is only
+    advanced after the handler returns, so a failed batch is redelivered.
+    """
+    def decorator(handler):
+        _consumers[name] = (handler, batch_size)
+        return handler
+    return decorator
+
+
+def get_consumers():
+    return dict(_consumers)
+
+
+def record_event(shipment, event_type, location='', payload=None):
+    """
+    Appends an event to the outbox. Call it inside the transaction that
+    changes the shipment so the event commits (or rolls back) with it.
+    """
+    event = ShipmentEvent.objects.create(
+        organization_id=shipment.organization_id,
+        shipment=shipment,
+        event_type=event_type,
+        location=location or '',
+        payload={
+            'tracking_id': shipment.tracking_id,
+            'status': shipment.current_status,
+            **(payload or {}),
+        },
+    )
+    if inline_dispatch_enabled():
+        transaction.on_commit(dispatch_inline)
+    return event
+
+
+def record_events(items):
+    """
+    Bulk variant of record_event for set-based writers.
+    `items` are (shipment, event_type, location, payload) tuples.
+    """
+    events = ShipmentEvent.objects.bulk_create([
+        ShipmentEvent(
+            organization_id=shipment.organization_id,
+            shipment=shipment,
+            event_type=event_type,
+            location=location or '',
+            payload={
+                'tracking_id': shipment.tracking_id,
+                'status': event_type,
+                **(payload or {}),
+            },
+        )
+        for shipment, event_type, location, payload in items
+    ])
+    if events and inline_dispatch_enabled():
+        transaction.on_commit(dispatch_inline)
+    return events
+
+
+def inline_dispatch_enabled():
+    # Consumers hold the offset row lock while they run, so requests must not
+    # dispatch outside of development
+    return settings.SHIPMENT_EVENTS_INLINE_DISPATCH and settings.DEBUG
+
+
+def dispatch_inline():
+    # A single development process has no out-of-order commits to wait for
+    dispatch_pending(settle=False)
+
+
+def dispatch_consumer(name, batch_size=None, settle=True):
+    """
+    Delivers the next batch of events to one consumer, leaving events younger
+    than SHIPMENT_EVENTS_SETTLE_SECONDS unless `settle` is false.
+    Returns the number of events delivered.
+    """
+    handler, consumer_batch_size = _consumers[name]
+    batch_size = batch_size or consumer_batch_size or settings.SHIPMENT_EVENTS_BATCH_SIZE
+
+    # Batches mix organizations, even when dispatched at the end of a request
+    with unscoped(), transaction.atomic():
+        offset, _ = ConsumerOffset.objects.select_for_update().get_or_create(consumer=name)
+        events = ShipmentEvent.objects.filter(id__gt=offset.last_event_id)
+        if settle and settings.SHIPMENT_EVENTS_SETTLE_SECONDS:
+            # Leave time for concurrent transactions holding lower ids to commit
+            settle = timezone.now() - timedelta(seconds=settings.SHIPMENT_EVENTS_SETTLE_SECONDS)
+            events = events.filter(created_at__lte=settle)
+        events = list(
+            events.select_related(
+                'shipment__organization', 'shipment__source_branch', 'shipment__destination_branch'
+            ).order_by('id')[:batch_size]
+        )
+        if not events:
+            return 0
+
+        handler(events)
+
+        offset.last_event_id = events[-1].id
+        offset.save(update_fields=['last_event_id', 'updated_at'])
+    return len(events)
+
+
+def dispatch_pending(batch_size=None, max_batches=None, settle=True):
+    """
+    Drains the outbox for every registered consumer.
+    A failing consumer is logged and retried on the next run without
+    holding back the others. Returns {consumer: events_delivered}.
+    """
+    delivered = {}
+    for name in _consumers:
+        delivered[name] = 0
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            try:
+                count = dispatch_consumer(name, batch_size=batch_size, settle=settle)
+            except Exception:
+                logger.exception(f"Shipment event consumer '{name}' failed")
+                break
+            if not count:
+                break
+            delivered[name] += count
+            batches += 1
+    return delivered
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from shipment.events import dispatch_pending
+
+
+class Command(BaseCommand):
+    help = "Deliver pending shipment events from the outbox to registered consumers."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help="Events per consumer batch.")
+        parser.add_argument('--loop', action='store_true', help="Keep polling instead of exiting when drained.")
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds between polls with --loop.")
+
+    def handle(self, *args, **options):
+        while True:
+            delivered = dispatch_pending(batch_size=options['batch_size'])
+            for name, count in delivered.items():
+                if count:
+                    self.stdout.write(f"{name}: delivered {count} events")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
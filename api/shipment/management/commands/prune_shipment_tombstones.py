@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.utils import delete_in_batches
+from shipment.models import ShipmentTombstone
+
+
+class Command(BaseCommand):
+    help = "Delete shipment tombstones older than CHANGES_TOMBSTONE_RETENTION in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows deleted per batch.")
+        parser.add_argument('--sleep', type=float, default=0.0, help="Seconds to pause between batches.")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - settings.CHANGES_TOMBSTONE_RETENTION
+        deleted = delete_in_batches(
+            ShipmentTombstone.objects.filter(deleted_at__lt=cutoff), options['batch_size'], options['sleep']
+        )
+        self.stdout.write(f"Pruned {deleted} shipment tombstones")
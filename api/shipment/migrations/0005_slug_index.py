@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 12:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shipment', '0004_shipmentevent_consumeroffset'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='shipment',
+            name='slug',
+            field=models.CharField(db_index=True, max_length=32),
+        ),
+    ]
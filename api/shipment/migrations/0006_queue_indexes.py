@@ -0,0 +1,22 @@
+# Generated by Django 6.0.1 on 2026-10-19 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0003_branchdevice'),
+        ('shipment', '0005_slug_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(condition=models.Q(('current_status', 'BOOKED')), fields=['source_branch', 'created_at'], name='shipment_awaiting_dispatch'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(condition=models.Q(('current_status', 'IN_TRANSIT')), fields=['destination_branch', 'created_at'], name='shipment_awaiting_arrival'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 13:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shipment', '0006_queue_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shipment',
+            name='is_late',
+            field=models.BooleanField(default=False),
+        ),
+    ]
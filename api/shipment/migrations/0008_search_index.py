@@ -0,0 +1,99 @@
+# Generated by Django 6.0.1 on 2026-10-19 13:30
+
+import re
+
+from django.db import migrations, models
+
+# Frozen copies of core.utils.normalize_phone and the shipment.search DDL as of
+# this migration, so later edits to those modules don't change its history.
+
+
+def normalize_phone(phone, national_digits=10):
+    digits = re.sub(r'\D', '', phone or '')
+    return digits[-national_digits:] if len(digits) > national_digits else digits
+
+
+def normalize_phones(apps, schema_editor):
+    Shipment = apps.get_model('shipment', 'Shipment')
+    last_id = 0
+    while True:
+        batch = list(
+            Shipment.objects.filter(id__gt=last_id).order_by('id').only('id', 'sender_phone', 'receiver_phone')[:1000]
+        )
+        if not batch:
+            break
+        for shipment in batch:
+            shipment.sender_phone_normalized = normalize_phone(shipment.sender_phone)
+            shipment.receiver_phone_normalized = normalize_phone(shipment.receiver_phone)
+        Shipment.objects.bulk_update(batch, ['sender_phone_normalized', 'receiver_phone_normalized'])
+        last_id = batch[-1].id
+
+
+SQLITE_INSTALL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS shipment_search USING fts5(
+        tracking_id, sender_name, receiver_name, description, sender_phone_normalized, receiver_phone_normalized,
+        content='shipment_shipment', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS shipment_search_ai AFTER INSERT ON shipment_shipment BEGIN
+        INSERT INTO shipment_search(rowid, tracking_id, sender_name, receiver_name, description, sender_phone_normalized, receiver_phone_normalized)
+        VALUES (new.id, new.tracking_id, new.sender_name, new.receiver_name, new.description, new.sender_phone_normalized, new.receiver_phone_normalized);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS shipment_search_ad AFTER DELETE ON shipment_shipment BEGIN
+        INSERT INTO shipment_search(shipment_search, rowid, tracking_id, sender_name, receiver_name, description, sender_phone_normalized, receiver_phone_normalized)
+        VALUES ('delete', old.id, old.tracking_id, old.sender_name, old.receiver_name, old.description, old.sender_phone_normalized, old.receiver_phone_normalized);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS shipment_search_au AFTER UPDATE OF tracking_id, sender_name, receiver_name, description, sender_phone_normalized, receiver_phone_normalized ON shipment_shipment BEGIN
+        INSERT INTO shipment_search(shipment_search, rowid, tracking_id, sender_name, receiver_name, description, sender_phone_normalized, receiver_phone_normalized)
+        VALUES ('delete', old.id, old.tracking_id, old.sender_name, old.receiver_name, old.description, old.sender_phone_normalized, old.receiver_phone_normalized);
+        INSERT INTO shipment_search(rowid, tracking_id, sender_name, receiver_name, description, sender_phone_normalized, receiver_phone_normalized)
+        VALUES (new.id, new.tracking_id, new.sender_name, new.receiver_name, new.description, new.sender_phone_normalized, new.receiver_phone_normalized);
+    END""",
+    "INSERT INTO shipment_search(shipment_search) VALUES ('rebuild')",
+]
+SQLITE_UNINSTALL = [
+    "DROP TRIGGER IF EXISTS shipment_search_ai",
+    "DROP TRIGGER IF EXISTS shipment_search_ad",
+    "DROP TRIGGER IF EXISTS shipment_search_au",
+    "DROP TABLE IF EXISTS shipment_search",
+]
+POSTGRES_INSTALL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """CREATE INDEX IF NOT EXISTS shipment_search_trgm ON shipment_shipment USING gin (
+        tracking_id gin_trgm_ops, sender_name gin_trgm_ops, receiver_name gin_trgm_ops, description gin_trgm_ops,
+        sender_phone_normalized gin_trgm_ops, receiver_phone_normalized gin_trgm_ops
+    )""",
+]
+POSTGRES_UNINSTALL = ["DROP INDEX IF EXISTS shipment_search_trgm"]
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shipment', '0007_shipment_is_late'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shipment',
+            name='receiver_phone_normalized',
+            field=models.CharField(blank=True, default='', editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='shipment',
+            name='sender_phone_normalized',
+            field=models.CharField(blank=True, default='', editable=False, max_length=20),
+        ),
+        migrations.RunPython(normalize_phones, migrations.RunPython.noop),
+        # SQLite FTS5 table + triggers, or pg_trgm GIN index on PostgreSQL
+        migrations.RunPython(
+            run_for_vendor({'sqlite': SQLITE_INSTALL, 'postgresql': POSTGRES_INSTALL}),
+            run_for_vendor({'sqlite': SQLITE_UNINSTALL, 'postgresql': POSTGRES_UNINSTALL}),
+        ),
+    ]
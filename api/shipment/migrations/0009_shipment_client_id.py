@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 13:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shipment', '0008_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shipment',
+            name='client_id',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+    ]
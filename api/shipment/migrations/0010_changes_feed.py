@@ -0,0 +1,47 @@
+# Generated by Django 6.0.1 on 2026-10-19 14:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0003_branchdevice'),
+        ('shipment', '0009_shipment_client_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShipmentTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tracking_id', models.CharField(max_length=20)),
+                ('slug', models.CharField(max_length=32)),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['organization', 'updated_at', 'id'], name='shipment_org_updated'),
+        ),
+        migrations.AddField(
+            model_name='shipmenttombstone',
+            name='destination_branch',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='organization.branch'),
+        ),
+        migrations.AddField(
+            model_name='shipmenttombstone',
+            name='organization',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='organization.organization'),
+        ),
+        migrations.AddField(
+            model_name='shipmenttombstone',
+            name='source_branch',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='organization.branch'),
+        ),
+        migrations.AddIndex(
+            model_name='shipmenttombstone',
+            index=models.Index(fields=['organization', 'id'], name='tombstone_org_id'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 6.0.1 on 2026-10-19 15:00
+
+import django.db.models.deletion
+import django.db.models.manager
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0004_tenant_indexes'),
+        ('shipment', '0010_changes_feed'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='shipment',
+            options={'default_manager_name': 'all_objects'},
+        ),
+        migrations.AlterModelOptions(
+            name='shipmenthistory',
+            options={'default_manager_name': 'all_objects', 'ordering': ['-created_at'], 'verbose_name_plural': 'Shipment Histories'},
+        ),
+        migrations.AlterModelManagers(
+            name='shipment',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='shipmenthistory',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['organization', 'created_at'], name='shipment_org_created'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['organization', 'current_status'], name='shipment_org_status'),
+        ),
+        migrations.AddIndex(
+            model_name='shipmenthistory',
+            index=models.Index(fields=['shipment', 'created_at'], name='history_shipment_created'),
+        ),
+        migrations.AlterField(
+            model_name='shipment',
+            name='organization',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='shipments', to='organization.organization'),
+        ),
+        migrations.AlterField(
+            model_name='shipmenthistory',
+            name='shipment',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='history', to='shipment.shipment'),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:00
+
+import django.db.models.deletion
+from django.db import migrations, models, transaction
+
+BATCH_SIZE = 2000
+LATER_STATUSES = ('ARRIVED', 'DELIVERED')
+
+
+def backfill_history(apps, schema_editor):
+    """
+    Copies the shipment's organization onto every history row and infers the
+    scanning branch from the location, which held the branch title.
+    Committed per batch of ids so a large table is never locked as a whole.
+    """
+    ShipmentHistory = apps.get_model('shipment', 'ShipmentHistory')
+    manager = ShipmentHistory._default_manager
+    last_id = 0
+    while True:
+        rows = list(
+            manager.filter(id__gt=last_id, organization__isnull=True).order_by('id').values(
+                'id', 'status', 'location', 'shipment__organization_id',
+                'shipment__source_branch_id', 'shipment__source_branch__title',
+                'shipment__destination_branch_id', 'shipment__destination_branch__title',
+            )[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        batch = []
+        for row in rows:
+            source = (row['shipment__source_branch_id'], row['shipment__source_branch__title'])
+            destination = (row['shipment__destination_branch_id'], row['shipment__destination_branch__title'])
+            candidates = (destination, source) if row['status'] in LATER_STATUSES else (source, destination)
+            branch_id = next((branch_id for branch_id, title in candidates if title == row['location']), None)
+            batch.append(ShipmentHistory(
+                id=row['id'], organization_id=row['shipment__organization_id'], branch_id=branch_id,
+            ))
+        with transaction.atomic(using=schema_editor.connection.alias):
+            manager.bulk_update(batch, ['organization', 'branch'])
+        last_id = rows[-1]['id']
+
+
+class Migration(migrations.Migration):
+    # Backfill batches commit on their own instead of in one long transaction
+    atomic = False
+
+    dependencies = [
+        ('organization', '0004_tenant_indexes'),
+        ('shipment', '0011_tenant_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shipmenthistory',
+            name='branch',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='organization.branch'),
+        ),
+        migrations.AddField(
+            model_name='shipmenthistory',
+            name='organization',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='organization.organization'),
+        ),
+        migrations.RunPython(backfill_history, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='shipmenthistory',
+            name='organization',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='organization.organization'),
+        ),
+        migrations.AddIndex(
+            model_name='shipmenthistory',
+            index=models.Index(fields=['organization', 'created_at'], name='history_org_created'),
+        ),
+        migrations.AddIndex(
+            model_name='shipmenthistory',
+            index=models.Index(fields=['branch', 'created_at'], name='history_branch_created'),
+        ),
+    ]
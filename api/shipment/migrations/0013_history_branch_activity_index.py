@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-19 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0004_tenant_indexes'),
+        ('shipment', '0012_history_organization_branch'),
+    ]
+
+    operations = [
+        # Build the covering index before dropping the one it replaces
+        migrations.AddIndex(
+            model_name='shipmenthistory',
+            index=models.Index(fields=['branch', 'created_at', 'id', 'status', 'shipment'], name='history_branch_activity'),
+        ),
+        migrations.RemoveIndex(
+            model_name='shipmenthistory',
+            name='history_branch_created',
+        ),
+    ]
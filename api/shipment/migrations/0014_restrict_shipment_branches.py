@@ -0,0 +1,25 @@
+# Generated by Django 6.0.1 on 2026-10-19 18:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0005_branch_is_active'),
+        ('shipment', '0013_history_branch_activity_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='shipment',
+            name='destination_branch',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.RESTRICT, related_name='incoming_shipments', to='organization.branch'),
+        ),
+        migrations.AlterField(
+            model_name='shipment',
+            name='source_branch',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.RESTRICT, related_name='outgoing_shipments', to='organization.branch'),
+        ),
+    ]
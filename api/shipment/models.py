@@ -1,5 +1,7 @@
 from django.db import models
 from core.models import BaseModel
+from core.utils import normalize_phone
+from core.tenancy import TenantManager
 from organization.models import Organization, Branch
 import random
 import string
@@ -20,14 +22,21 @@ class PaymentMode(models.TextChoices):
 
 class Shipment(BaseModel):
     tracking_id = models.CharField(max_length=20, unique=True, default=generate_tracking_id)
-    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='shipments')
-    source_branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name='outgoing_shipments')
-    destination_branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name='incoming_shipments')
+    # Indexed as the leading column of the composite indexes in Meta
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='shipments', db_index=False)
+    # Branches are deactivated rather than deleted; purge_inactive_branches removes
+    # a branch's shipments in batches before the branch itself. RESTRICT (not
+    # PROTECT) still lets Organization.delete() cascade over both at once.
+    source_branch = models.ForeignKey(Branch, on_delete=models.RESTRICT, related_name='outgoing_shipments')
+    destination_branch = models.ForeignKey(Branch, on_delete=models.RESTRICT, related_name='incoming_shipments')
     
     sender_name = models.CharField(max_length=100)
     sender_phone = models.CharField(max_length=20)
     receiver_name = models.CharField(max_length=100)
     receiver_phone = models.CharField(max_length=20)
+    # Digits-only copies maintained in save(), used by search
+    sender_phone_normalized = models.CharField(max_length=20, blank=True, default='', editable=False)
+    receiver_phone_normalized = models.CharField(max_length=20, blank=True, default='', editable=False)
     
     description = models.TextField(null=True, blank=True)
     
@@ -35,20 +44,135 @@ class Shipment(BaseModel):
     payment_mode = models.CharField(max_length=20, choices=PaymentMode.choices, default=PaymentMode.SENDER_PAYS)
     
     current_status = models.CharField(max_length=20, choices=ShipmentStatus.choices, default=ShipmentStatus.BOOKED)
+    # Generated by offline terminals so re-uploads of the same booking are recognised
+    client_id = models.UUIDField(null=True, blank=True, unique=True, editable=False)
+    # Set by the flag_late_shipments sweep once transit exceeds the lane's p90
+    is_late = models.BooleanField(default=False)
+
+    # Scoped to the current request's organization (core.tenancy); all_objects sees every tenant
+    objects = TenantManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        default_manager_name = 'all_objects'
+        indexes = [
+            # Tenant queries range-scan their organization's rows
+            models.Index(fields=['organization', 'created_at'], name='shipment_org_created'),
+            models.Index(fields=['organization', 'current_status'], name='shipment_org_status'),
+            # Branch work queues only ever touch open shipments, so these stay
+            # small no matter how much delivered history accumulates
+            models.Index(
+                fields=['source_branch', 'created_at'],
+                condition=models.Q(current_status=ShipmentStatus.BOOKED),
+                name='shipment_awaiting_dispatch',
+            ),
+            models.Index(
+                fields=['destination_branch', 'created_at'],
+                condition=models.Q(current_status=ShipmentStatus.IN_TRANSIT),
+                name='shipment_awaiting_arrival',
+            ),
+            # Changes feed keyset: WHERE organization = ? AND (updated_at, id) > cursor
+            models.Index(fields=['organization', 'updated_at', 'id'], name='shipment_org_updated'),
+        ]
     
+    def save(self, *args, **kwargs):
+        self.sender_phone_normalized = normalize_phone(self.sender_phone)
+        self.receiver_phone_normalized = normalize_phone(self.receiver_phone)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            phones = {'sender_phone', 'receiver_phone'} & set(update_fields)
+            kwargs['update_fields'] = [*update_fields, *(f'{field}_normalized' for field in phones)]
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.tracking_id} ({self.sender_name} -> {self.receiver_name})"
 
 class ShipmentHistory(models.Model):
-    shipment = models.ForeignKey(Shipment, on_delete=models.CASCADE, related_name='history')
+    shipment = models.ForeignKey(Shipment, on_delete=models.CASCADE, related_name='history', db_index=False)
+    # Copied from the shipment / the scanning branch so tenant and branch timelines
+    # are single-table range scans; indexed as leading columns in Meta
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='+', db_index=False)
+    branch = models.ForeignKey(Branch, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', db_index=False)
     status = models.CharField(max_length=20, choices=ShipmentStatus.choices)
     location = models.CharField(max_length=255)
     remarks = models.TextField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = TenantManager()
+    all_objects = models.Manager()
+
     class Meta:
         verbose_name_plural = "Shipment Histories"
         ordering = ['-created_at']
+        default_manager_name = 'all_objects'
+        indexes = [
+            # A shipment's timeline, newest first
+            models.Index(fields=['shipment', 'created_at'], name='history_shipment_created'),
+            models.Index(fields=['organization', 'created_at'], name='history_org_created'),
+            # Branch activity feed (shipment.activity): keyset on (created_at, id),
+            # covering status and shipment so pages never read the table
+            models.Index(fields=['branch', 'created_at', 'id', 'status', 'shipment'], name='history_branch_activity'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # bulk_create() skips this; callers set organization themselves
+        if self.organization_id is None and self.shipment_id is not None:
+            self.organization_id = self.shipment.organization_id
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"Shipment #{self.shipment_id} - {self.status} at {self.location}"
+
+class ShipmentTombstone(models.Model):
+    """
+    Record of a deleted shipment, so the changes feed can tell clients to
+    drop it. Written by a post_delete signal; pruned after
+    CHANGES_TOMBSTONE_RETENTION. No database constraints on the foreign keys:
+    tombstones outlive the rows (and organization) they describe.
+    """
+    organization = models.ForeignKey(
+        Organization, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+'
+    )
+    source_branch = models.ForeignKey(Branch, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    destination_branch = models.ForeignKey(
+        Branch, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+'
+    )
+    tracking_id = models.CharField(max_length=20)
+    slug = models.CharField(max_length=32)
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['organization', 'id'], name='tombstone_org_id'),
+        ]
+
+    def __str__(self):
+        return f"{self.tracking_id} deleted at {self.deleted_at}"
+
+class ShipmentEvent(models.Model):
+    """
+    Transactional outbox row, appended in the same transaction as every
+    shipment create and status change. Consumers read it in id order.
+    """
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='shipment_events')
+    shipment = models.ForeignKey(Shipment, on_delete=models.SET_NULL, null=True, related_name='events')
+    event_type = models.CharField(max_length=20, choices=ShipmentStatus.choices)
+    location = models.CharField(max_length=255, blank=True, default='')
+    payload = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"#{self.id} {self.event_type} ({self.payload.get('tracking_id', '')})"
+
+
+class ConsumerOffset(models.Model):
+    """Last ShipmentEvent id processed by each registered consumer."""
+    consumer = models.CharField(max_length=100, unique=True)
+    last_event_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"{self.shipment.tracking_id} - {self.status} at {self.location}"
\ No newline at end of file
+        return f"{self.consumer} @ {self.last_event_id}"
@@ -0,0 +1,198 @@
+import logging
+from functools import lru_cache
+from string import Formatter
+
+from django.conf import settings
+
+from core.sms_service import send_sms
+from .models import ShipmentStatus
+
+logger = logging.getLogger(__name__)
+
+SENDER = 'sender'
+RECEIVER = 'receiver'
+
+# Built-in templates, keyed by locale -> event -> recipient.
+# Organizations can override any of these through
+# Organization.metadata['notification_templates'] using the same layout.
+DEFAULT_TEMPLATES = {
+    'en': {
+        ShipmentStatus.BOOKED: {
+            SENDER: (
+                "Shipment Confirmed!\n"
+                "Tracking ID: {tracking_id}\n"
+                "To: {receiver_name}\n"
+                "Route: {source_branch} -> {destination_branch}\n"
+                "Track: {tracking_url}\n"
+                "- {organization}"
+            ),
+            RECEIVER: (
+                "Incoming Shipment!\n"
+                "From: {sender_name}\n"
+                "Tracking ID: {tracking_id}\n"
+                "Route: {source_branch} -> {destination_branch}\n"
+                "Track: {tracking_url}\n"
+                "- {organization}"
+            ),
+        },
+        ShipmentStatus.IN_TRANSIT: {
+            RECEIVER: (
+                "Your shipment {tracking_id} from {sender_name} has left {location} "
+                "and is on its way to {destination_branch}.\n"
+                "Track: {tracking_url}\n"
+                "- {organization}"
+            ),
+        },
+        ShipmentStatus.ARRIVED: {
+            RECEIVER: (
+                "Your shipment {tracking_id} has arrived at {destination_branch} "
+                "and is ready for pickup.\n"
+                "- {organization}"
+            ),
+        },
+        ShipmentStatus.DELIVERED: {
+            SENDER: (
+                "Your shipment {tracking_id} to {receiver_name} has been delivered.\n"
+                "- {organization}"
+            ),
+        },
+    },
+    'hi': {
+        ShipmentStatus.BOOKED: {
+            SENDER: (
+                "शिपमेंट बुक हो गया!\n"
+                "ट्रैकिंग आईडी: {tracking_id}\n"
+                "प्राप्तकर्ता: {receiver_name}\n"
+                "मार्ग: {source_branch} -> {destination_branch}\n"
+                "ट्रैक करें: {tracking_url}\n"
+                "- {organization}"
+            ),
+            RECEIVER: (
+                "आपके लिए शिपमेंट आ रहा है!\n"
+                "भेजने वाला: {sender_name}\n"
+                "ट्रैकिंग आईडी: {tracking_id}\n"
+                "मार्ग: {source_branch} -> {destination_branch}\n"
+                "ट्रैक करें: {tracking_url}\n"
+                "- {organization}"
+            ),
+        },
+        ShipmentStatus.IN_TRANSIT: {
+            RECEIVER: (
+                "आपका शिपमेंट {tracking_id} {location} से {destination_branch} के लिए रवाना हो गया है।\n"
+                "ट्रैक करें: {tracking_url}\n"
+                "- {organization}"
+            ),
+        },
+        ShipmentStatus.ARRIVED: {
+            RECEIVER: (
+                "आपका शिपमेंट {tracking_id} {destination_branch} पहुँच गया है और लेने के लिए तैयार है।\n"
+                "- {organization}"
+            ),
+        },
+        ShipmentStatus.DELIVERED: {
+            SENDER: (
+                "आपका शिपमेंट {tracking_id} {receiver_name} को डिलीवर कर दिया गया है।\n"
+                "- {organization}"
+            ),
+        },
+    },
+}
+
+
+class CompiledTemplate:
+    """
+    A message template parsed once into literal/placeholder chunks.
+    Rendering is a single join, no re-parsing per message.
+    """
+
+    __slots__ = ('source', 'chunks')
+
+    def __init__(self, source):
+        self.source = source
+        self.chunks = tuple(
+            (literal, field_name)
+            for literal, field_name, _spec, _conv in Formatter().parse(source)
+        )
+
+    def render(self, context):
+        parts = []
+        for literal, field_name in self.chunks:
+            parts.append(literal)
+            if field_name is not None:
+                parts.append(str(context.get(field_name, '')))
+        return ''.join(parts)
+
+
+@lru_cache(maxsize=512)
+def compile_template(source):
+    return CompiledTemplate(source)
+
+
+def get_locale(organization):
+    metadata = organization.metadata or {}
+    locale = metadata.get('locale') or settings.NOTIFICATION_DEFAULT_LOCALE
+    if locale not in DEFAULT_TEMPLATES and locale not in metadata.get('notification_templates', {}):
+        return settings.NOTIFICATION_DEFAULT_LOCALE
+    return locale
+
+
+def get_templates(organization, event, locale=None):
+    """
+    Returns {recipient: CompiledTemplate} for an event, with organization
+    overrides taking precedence over the built-in templates per recipient.
+    """
+    locale = locale or get_locale(organization)
+    overrides = ((organization.metadata or {}).get('notification_templates') or {}).get(locale, {})
+    defaults = DEFAULT_TEMPLATES.get(locale) or DEFAULT_TEMPLATES[settings.NOTIFICATION_DEFAULT_LOCALE]
+
+    sources = dict(defaults.get(event, {}))
+    sources.update(overrides.get(event, {}))
+    return {
+        recipient: compile_template(source)
+        for recipient, source in sources.items()
+        if source
+    }
+
+
+def build_context(shipment, location=None):
+    return {
+        'tracking_id': shipment.tracking_id,
+        'sender_name': shipment.sender_name,
+        'receiver_name': shipment.receiver_name,
+        'source_branch': shipment.source_branch.title,
+        'destination_branch': shipment.destination_branch.title,
+        'organization': shipment.organization.title,
+        'status': shipment.get_current_status_display(),
+        'location': location or shipment.source_branch.title,
+        'tracking_url': settings.NOTIFICATION_TRACKING_URL.format(tracking_id=shipment.tracking_id),
+    }
+
+
+def render_notifications(shipment, event, location=None):
+    """
+    Renders the messages for a shipment event.
+    Returns a list of (phone_number, message_body) tuples.
+    """
+    templates = get_templates(shipment.organization, event)
+    if not templates:
+        return []
+
+    context = build_context(shipment, location=location)
+    phones = {SENDER: shipment.sender_phone, RECEIVER: shipment.receiver_phone}
+    return [
+        (phones[recipient], template.render(context))
+        for recipient, template in templates.items()
+        if recipient in phones
+    ]
+
+
+def notify_shipment_event(shipment, event, location=None):
+    """
+    Sends the SMS notifications for a shipment event.
+    Failures are logged, never raised, so callers don't fail on gateway errors.
+    """
+    try:
+        for phone, body in render_notifications(shipment, event, location=location):
+            send_sms(phone, body)
+    except Exception as e:
+        logger.error(f"Failed to send notifications for {shipment.tracking_id}: {str(e)}")
@@ -0,0 +1,139 @@
+"""
+Read-only fast path for ShipmentSerializer output.
+
+The shipment read endpoints build their response dicts straight from
+.values() rows instead of model instances and nested serializers: one query
+for the shipments (branch slugs and titles joined in), one for their
+history. The output is the same as ShipmentSerializer's, key order and
+value formatting included (tests compare the rendered bytes), so a field
+added to the serializer must be added here too. A sparse fieldset
+(`?fields=`, see core.fieldsets) selects only the columns its fields need
+and skips the history query unless history is requested.
+"""
+import decimal
+from collections import defaultdict
+
+from django.utils import timezone
+
+from analytics.transit import lane_etas
+from .models import Shipment, ShipmentHistory
+
+# Always read: the history lookup and branch access checks need them
+BASE_COLUMNS = ('id', 'source_branch_id', 'destination_branch_id')
+HISTORY_COLUMNS = ('shipment_id', 'status', 'location', 'remarks', 'created_at')
+ETA_COLUMNS = ('organization_id', 'source_branch_id', 'destination_branch_id', 'current_status', 'created_at')
+
+_price_field = Shipment._meta.get_field('price')
+PRICE_QUANTUM = decimal.Decimal('.1') ** _price_field.decimal_places
+PRICE_CONTEXT = decimal.Context(prec=_price_field.max_digits)
+
+
+def format_datetime(value):
+    """DRF DateTimeField output: ISO 8601 in the current time zone, UTC written as 'Z'."""
+    if value is None:
+        return None
+    value = timezone.localtime(value).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def format_price(value):
+    """DRF DecimalField output for Shipment.price (COERCE_DECIMAL_TO_STRING)."""
+    if value is None:
+        return ''
+    return '{:f}'.format(value.quantize(PRICE_QUANTUM, context=PRICE_CONTEXT))
+
+
+def history_by_shipment(shipment_ids):
+    """{shipment id: [history dict, ...]} in the model's default (newest first) order."""
+    history = defaultdict(list)
+    if not shipment_ids:
+        return history
+    rows = ShipmentHistory.objects.filter(shipment_id__in=shipment_ids).values_list(*HISTORY_COLUMNS)
+    for shipment_id, status, location, remarks, created_at in rows:
+        history[shipment_id].append({
+            'status': status,
+            'location': location,
+            'remarks': remarks,
+            'created_at': format_datetime(created_at),
+        })
+    return history
+
+
+def eta_data(row):
+    eta = lane_etas.estimate_lane(
+        row['organization_id'], row['source_branch_id'], row['destination_branch_id'],
+        row['current_status'], row['created_at'],
+    )
+    if not eta:
+        return None
+    return {'expected_at': format_datetime(eta['expected_at']), 'latest_at': format_datetime(eta['latest_at'])}
+
+
+def column(name, format=None):
+    if format is None:
+        return (name,), lambda row, history: row[name]
+    return (name,), lambda row, history: format(row[name])
+
+
+# ShipmentSerializer fields, in its order: (columns read, value builder)
+FIELDS = {
+    'slug': column('slug'),
+    'tracking_id': column('tracking_id'),
+    'sender_name': column('sender_name'),
+    'sender_phone': column('sender_phone'),
+    'receiver_name': column('receiver_name'),
+    'receiver_phone': column('receiver_phone'),
+    'description': column('description'),
+    'price': column('price', format_price),
+    'payment_mode': column('payment_mode'),
+    'current_status': column('current_status'),
+    'source_branch': column('source_branch__slug'),
+    'destination_branch': column('destination_branch__slug'),
+    'source_branch_title': column('source_branch__title'),
+    'destination_branch_title': column('destination_branch__title'),
+    'history': ((), lambda row, history: history.get(row['id'], [])),
+    'is_late': column('is_late'),
+    'eta': (ETA_COLUMNS, lambda row, history: eta_data(row)),
+    'created_at': column('created_at', format_datetime),
+}
+ALL_FIELDS = tuple(FIELDS)
+EXPANDABLE = ('history',)
+
+
+def field_plan(fields):
+    """(columns to select, [(field, builder), ...]) for the requested fields (None for all)."""
+    fields = ALL_FIELDS if fields is None else fields
+    columns = dict.fromkeys(BASE_COLUMNS)
+    for name in fields:
+        columns.update(dict.fromkeys(FIELDS[name][0]))
+    return tuple(columns), [(name, FIELDS[name][1]) for name in fields]
+
+
+def rows_data(rows, fields=None):
+    """Response dicts for rows from shipment_rows(), fetching their history if requested."""
+    _, builders = field_plan(fields)
+    wants_history = fields is None or 'history' in fields
+    history = history_by_shipment([row['id'] for row in rows]) if wants_history else {}
+    return [{name: builder(row, history) for name, builder in builders} for row in rows]
+
+
+def shipment_rows(queryset, fields=None):
+    """.values() rows of `queryset` with just the columns the requested fields need."""
+    columns, _ = field_plan(fields)
+    return list(queryset.values(*columns))
+
+
+def shipment_list_data(queryset, fields=None):
+    """
+    ShipmentSerializer(queryset, many=True).data for a Shipment queryset, in
+    two queries, or one when history isn't among the requested `fields`.
+    """
+    return rows_data(shipment_rows(queryset, fields), fields)
+
+
+def shipment_detail_data(queryset, fields=None):
+    """ShipmentSerializer(queryset.get()).data; raises Shipment.DoesNotExist / MultipleObjectsReturned like get()."""
+    columns, _ = field_plan(fields)
+    return rows_data([queryset.values(*columns).get()], fields)[0]
@@ -0,0 +1,167 @@
+"""
+Shipment search by tracking ID, names, phone numbers and description.
+
+SQLite: an FTS5 external-content table (trigram tokenizer, so any 3+
+character substring matches) kept in sync with shipment_shipment by
+triggers. PostgreSQL: a multi-column pg_trgm GIN index on the plain
+columns, which serves `column ILIKE '%term%'` (but not the
+UPPER(column) LIKE UPPER(...) that icontains compiles to).
+Phone numbers are matched on their normalized digits (see normalize_phone),
+written by Shipment.save().
+"""
+import re
+
+from django.db import connection, connections
+from django.db.models import CharField, Lookup, Q, TextField
+
+from core.utils import normalize_phone
+from .models import Shipment
+
+MIN_TERM_LENGTH = 3
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+FTS_TABLE = 'shipment_search'
+TEXT_COLUMNS = ('tracking_id', 'sender_name', 'receiver_name', 'description')
+PHONE_COLUMNS = ('sender_phone_normalized', 'receiver_phone_normalized')
+# Digit-only terms may be part of a phone number or a tracking ID
+DIGIT_COLUMNS = PHONE_COLUMNS + ('tracking_id',)
+PHONE_TERM = re.compile(r'^\+?[\d\-().]+$')
+
+_COLUMNS = ', '.join(TEXT_COLUMNS + PHONE_COLUMNS)
+_NEW = ', '.join(f'new.{column}' for column in TEXT_COLUMNS + PHONE_COLUMNS)
+_OLD = ', '.join(f'old.{column}' for column in TEXT_COLUMNS + PHONE_COLUMNS)
+
+SQLITE_INSTALL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        {_COLUMNS}, content='shipment_shipment', content_rowid='id', tokenize='trigram'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON shipment_shipment BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, {_COLUMNS}) VALUES (new.id, {_NEW});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON shipment_shipment BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_COLUMNS}) VALUES ('delete', old.id, {_OLD});
+    END""",
+    # Only searchable columns: status changes don't touch the index
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {_COLUMNS} ON shipment_shipment BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_COLUMNS}) VALUES ('delete', old.id, {_OLD});
+        INSERT INTO {FTS_TABLE}(rowid, {_COLUMNS}) VALUES (new.id, {_NEW});
+    END""",
+]
+SQLITE_TRIGGERS = [f'{FTS_TABLE}_ai', f'{FTS_TABLE}_ad', f'{FTS_TABLE}_au']
+SQLITE_UNINSTALL = [f"DROP TRIGGER IF EXISTS {name}" for name in SQLITE_TRIGGERS] + [
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+POSTGRES_INSTALL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"""CREATE INDEX IF NOT EXISTS shipment_search_trgm ON shipment_shipment USING gin (
+        {', '.join(f'{column} gin_trgm_ops' for column in TEXT_COLUMNS + PHONE_COLUMNS)}
+    )""",
+]
+POSTGRES_UNINSTALL = ["DROP INDEX IF EXISTS shipment_search_trgm"]
+
+
+@CharField.register_lookup
+@TextField.register_lookup
+class ILikeContains(Lookup):
+    """`column ILIKE '%value%'` on PostgreSQL, the form a pg_trgm index on the column can serve."""
+    lookup_name = 'ilike_contains'
+
+    def get_db_prep_lookup(self, value, connection):
+        return '%s', [f"%{connection.ops.prep_for_like_query(value)}%"]
+
+    def as_postgresql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} ILIKE {rhs}", [*lhs_params, *rhs_params]
+
+
+def _execute(conn, statements):
+    with conn.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def install_search_index(conn):
+    """Creates the search index on a database connection, backfilling existing rows."""
+    if conn.vendor == 'sqlite':
+        _execute(conn, SQLITE_INSTALL + [f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"])
+    elif conn.vendor == 'postgresql':
+        _execute(conn, POSTGRES_INSTALL)
+
+
+def uninstall_search_index(conn):
+    _execute(conn, {'sqlite': SQLITE_UNINSTALL, 'postgresql': POSTGRES_UNINSTALL}.get(conn.vendor, []))
+
+
+def ensure_search_index(using='default', **kwargs):
+    """
+    post_migrate hook. SQLite rebuilds a table on many schema changes, which
+    drops its triggers; recreate them (and resync the index) when missing.
+    """
+    conn = connections[using]
+    if conn.vendor != 'sqlite':
+        return
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name IN (%s, %s, %s, %s)",
+            [FTS_TABLE, *SQLITE_TRIGGERS],
+        )
+        present = {row[0] for row in cursor.fetchall()}
+    if FTS_TABLE not in present or present == {FTS_TABLE, *SQLITE_TRIGGERS}:
+        return
+    install_search_index(conn)
+
+
+def parse_terms(query):
+    """
+    Splits a query into (term, columns) pairs. Phone-like terms are
+    normalized and only matched against phone numbers and tracking IDs.
+    Terms shorter than MIN_TERM_LENGTH are dropped (trigram indexes need 3).
+    """
+    terms = []
+    for raw in query.split():
+        if PHONE_TERM.match(raw):
+            term, columns = normalize_phone(raw), DIGIT_COLUMNS
+        else:
+            term, columns = raw, TEXT_COLUMNS + PHONE_COLUMNS
+        if len(term) >= MIN_TERM_LENGTH:
+            terms.append((term, columns))
+    return terms
+
+
+def fts_expression(terms):
+    clauses = []
+    for term, columns in terms:
+        quoted = '"' + term.replace('"', '""') + '"'
+        clauses.append(f"{{{' '.join(columns)}}} : {quoted}")
+    return ' AND '.join(clauses)
+
+
+def search_ids(organization, terms, branch=None, limit=DEFAULT_LIMIT):
+    """Ids of matching shipments of the organization, best match first."""
+    if connection.vendor == 'sqlite':
+        sql = (
+            f"SELECT s.id FROM {FTS_TABLE} JOIN shipment_shipment s ON s.id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s AND s.organization_id = %s"
+        )
+        params = [fts_expression(terms), organization.id]
+        if branch is not None:
+            sql += " AND (s.source_branch_id = %s OR s.destination_branch_id = %s)"
+            params += [branch.id, branch.id]
+        sql += " ORDER BY rank LIMIT %s"
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [*params, limit])
+            return [row[0] for row in cursor.fetchall()]
+
+    # PostgreSQL: each ILIKE is served by the pg_trgm GIN index (icontains would not be)
+    queryset = Shipment.objects.filter(organization=organization)
+    if branch is not None:
+        queryset = queryset.filter(Q(source_branch=branch) | Q(destination_branch=branch))
+    for term, columns in terms:
+        match = Q()
+        for column in columns:
+            match |= Q(**{f'{column}__ilike_contains': term})
+        queryset = queryset.filter(match)
+    return list(queryset.order_by('-created_at').values_list('id', flat=True)[:limit])
@@ -1,15 +1,23 @@
 from rest_framework import serializers
-from .models import Shipment, ShipmentHistory, ShipmentStatus, PaymentMode
-from organization.models import Branch
+from drf_yasg.utils import swagger_serializer_method
+from .models import Shipment, ShipmentHistory, ShipmentTombstone, ShipmentStatus, PaymentMode
 from organization.serializers import BranchSerializer
+from organization.directory import resolve_branch
+from core.tenancy import current_organization
+from analytics.transit import lane_etas
 
 class ShipmentHistorySerializer(serializers.ModelSerializer):
     class Meta:
         model = ShipmentHistory
         fields = ['status', 'location', 'remarks', 'created_at']
 
+class ShipmentEtaSerializer(serializers.Serializer):
+    expected_at = serializers.DateTimeField()
+    latest_at = serializers.DateTimeField()
+
 class ShipmentSerializer(serializers.ModelSerializer):
     history = ShipmentHistorySerializer(many=True, read_only=True)
+    eta = serializers.SerializerMethodField()
     source_branch = serializers.SlugRelatedField(slug_field='slug', read_only=True)
     destination_branch = serializers.SlugRelatedField(slug_field='slug', read_only=True)
     source_branch_title = serializers.ReadOnlyField(source='source_branch.title')
@@ -23,11 +31,44 @@ class ShipmentSerializer(serializers.ModelSerializer):
             'price', 'payment_mode', 'current_status', 
             'source_branch', 'destination_branch', 
             'source_branch_title', 'destination_branch_title',
-            'history', 'created_at'
+            'history', 'is_late', 'eta', 'created_at'
         ]
 
+    @swagger_serializer_method(serializer_or_field=ShipmentEtaSerializer)
+    def get_eta(self, obj):
+        # Median / p90 transit time of the lane, from the in-memory lane table
+        eta = lane_etas.estimate(obj)
+        return ShipmentEtaSerializer(eta).data if eta else None
+
+class DirectoryBranchField(serializers.Field):
+    """
+    Active branch referenced by slug, looked up in the organization passed in
+    the serializer context. Batch callers can pass the branches they already
+    resolved as context['branches'] ({slug: Branch}, see resolve_branches).
+    """
+    default_error_messages = {
+        'does_not_exist': 'Branch with slug "{slug}" does not exist in this organization.',
+        'invalid': 'Invalid value.',
+    }
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str):
+            self.fail('invalid')
+        branches = self.context.get('branches')
+        organization = self.context.get('organization') or current_organization()
+        if branches is not None:
+            branch = branches.get(data)
+        else:
+            branch = resolve_branch(organization, data) if organization else None
+        if branch is None:
+            self.fail('does_not_exist', slug=data)
+        return branch
+
+    def to_representation(self, value):
+        return value.slug
+
 class ShipmentCreateSerializer(serializers.ModelSerializer):
-    destination_branch = serializers.SlugRelatedField(slug_field='slug', queryset=Branch.objects.all())
+    destination_branch = DirectoryBranchField()
     
     class Meta:
         model = Shipment
@@ -39,4 +80,82 @@ class ShipmentCreateSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         # organization and source_branch will be passed from the view via save()
+        # destination_branch must be resolved with context={'organization': org}
         return super().create(validated_data)
+
+class SyncBookingSerializer(ShipmentCreateSerializer):
+    client_id = serializers.UUIDField()
+
+    class Meta(ShipmentCreateSerializer.Meta):
+        fields = ShipmentCreateSerializer.Meta.fields + ['client_id']
+
+class SyncStatusChangeSerializer(serializers.Serializer):
+    client_id = serializers.UUIDField()
+    tracking_id = serializers.CharField(required=False)
+    shipment_client_id = serializers.UUIDField(required=False, help_text="client_id of a booking not yet synced")
+    status = serializers.ChoiceField(choices=ShipmentStatus.choices)
+    remarks = serializers.CharField(required=False, allow_blank=True, default="")
+    occurred_at = serializers.DateTimeField(required=False)
+    clock = serializers.DictField(
+        child=serializers.IntegerField(min_value=0), required=False,
+        help_text="Vector timestamp: {device id: counter}",
+    )
+
+    def validate(self, attrs):
+        if not attrs.get('tracking_id') and not attrs.get('shipment_client_id'):
+            raise serializers.ValidationError("Either tracking_id or shipment_client_id is required.")
+        return attrs
+
+class SyncRequestSerializer(serializers.Serializer):
+    cursor = serializers.IntegerField(min_value=0, default=0, help_text="Cursor returned by the previous sync")
+    shipments = serializers.ListField(child=serializers.DictField(), required=False, default=list)
+    events = serializers.ListField(child=serializers.DictField(), required=False, default=list)
+
+class SyncResultSerializer(serializers.Serializer):
+    client_id = serializers.CharField()
+    result = serializers.ChoiceField(choices=['applied', 'duplicate', 'stale', 'rejected'])
+    tracking_id = serializers.CharField(allow_null=True)
+    errors = serializers.DictField(required=False)
+
+class SyncResponseSerializer(serializers.Serializer):
+    cursor = serializers.IntegerField()
+    has_more = serializers.BooleanField()
+    shipments = ShipmentSerializer(many=True)
+    booking_results = SyncResultSerializer(many=True)
+    event_results = SyncResultSerializer(many=True)
+
+class ShipmentChangeSerializer(ShipmentSerializer):
+    """ShipmentSerializer without the nested history, which the changes feed sends separately."""
+    class Meta(ShipmentSerializer.Meta):
+        fields = [field for field in ShipmentSerializer.Meta.fields if field != 'history'] + ['updated_at']
+
+class ShipmentHistoryChangeSerializer(ShipmentHistorySerializer):
+    """A row may be sent again on a later page; clients upsert by id."""
+    tracking_id = serializers.CharField(read_only=True)
+
+    class Meta(ShipmentHistorySerializer.Meta):
+        fields = ['id', 'tracking_id'] + ShipmentHistorySerializer.Meta.fields
+
+class ShipmentTombstoneSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ShipmentTombstone
+        fields = ['tracking_id', 'slug', 'deleted_at']
+
+class ShipmentChangesSerializer(serializers.Serializer):
+    shipments = ShipmentChangeSerializer(many=True)
+    history = ShipmentHistoryChangeSerializer(many=True)
+    deleted = ShipmentTombstoneSerializer(many=True)
+    cursor = serializers.CharField()
+    has_more = serializers.BooleanField()
+
+class BranchActivityEntrySerializer(serializers.ModelSerializer):
+    tracking_id = serializers.CharField(read_only=True)
+
+    class Meta:
+        model = ShipmentHistory
+        fields = ['id', 'tracking_id', 'status', 'created_at']
+
+class BranchActivitySerializer(serializers.Serializer):
+    activity = BranchActivityEntrySerializer(many=True)
+    cursor = serializers.CharField(allow_null=True)
+    has_more = serializers.BooleanField()
@@ -0,0 +1,15 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import Shipment, ShipmentTombstone
+
+
+@receiver(post_delete, sender=Shipment)
+def shipment_deleted(sender, instance, **kwargs):
+    ShipmentTombstone.objects.create(
+        organization_id=instance.organization_id,
+        source_branch_id=instance.source_branch_id,
+        destination_branch_id=instance.destination_branch_id,
+        tracking_id=instance.tracking_id,
+        slug=instance.slug,
+    )
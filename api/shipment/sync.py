@@ -0,0 +1,214 @@
+"""
+Offline sync for branch terminals.
+
+A terminal uploads the shipments it booked and the status changes it scanned
+while offline, each carrying a client-generated UUID, and downloads what
+changed since its last cursor. The cursor is the id of the last
+ShipmentEvent (outbox row) the terminal has seen. Ids are assigned at insert,
+not commit, so downloads only include events older than
+SHIPMENT_EVENTS_SETTLE_SECONDS: a cursor must never pass an id whose
+transaction is still open.
+
+Uploads are applied set-based inside one transaction: one query to find
+already-synced bookings, bulk inserts for new shipments, history and outbox
+events, and one bulk update for status changes. Concurrent edits of the same
+shipment (e.g. two offline terminals, whose vector clocks can't order them)
+are resolved by the status state order: a change only applies if it moves
+the shipment forward, so replays and stale scans are no-ops. The shipments
+are locked while the upload is applied, so concurrent uploads and status
+updates of the same shipment are ordered rather than overwriting each other.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.utils import generate_unique_hash, normalize_phone
+from .events import record_events
+from .models import Shipment, ShipmentEvent, ShipmentHistory, ShipmentStatus, generate_tracking_id
+
+# Position of each status in the shipment lifecycle. Terminal statuses share
+# the last rank so neither can override the other.
+STATUS_RANK = {
+    ShipmentStatus.BOOKED: 0,
+    ShipmentStatus.IN_TRANSIT: 1,
+    ShipmentStatus.ARRIVED: 2,
+    ShipmentStatus.DELIVERED: 3,
+    ShipmentStatus.CANCELLED: 3,
+}
+
+APPLIED = 'applied'
+DUPLICATE = 'duplicate'
+STALE = 'stale'
+REJECTED = 'rejected'
+
+
+def unique_tracking_ids(count):
+    """`count` fresh tracking IDs, checked against the table in a single query."""
+    ids = set()
+    while len(ids) < count:
+        candidates = {generate_tracking_id() for _ in range(count - len(ids))} - ids
+        taken = set(Shipment.objects.filter(tracking_id__in=candidates).values_list('tracking_id', flat=True))
+        ids |= candidates - taken
+    return list(ids)
+
+
+def apply_bookings(organization, branch, bookings, retry=True):
+    """
+    Creates the shipments of `bookings` (validated ShipmentCreateSerializer
+    data plus 'client_id') that weren't synced before.
+    Returns {client_id: (result, shipment)}.
+
+    Two uploads of the same booking can both miss the duplicate check; the
+    second insert then fails on the unique client_id once the first commits,
+    and is retried so those bookings come back as DUPLICATE.
+    """
+    results = {}
+    client_ids = [booking['client_id'] for booking in bookings]
+    for shipment in Shipment.objects.filter(organization=organization, client_id__in=client_ids):
+        results[shipment.client_id] = (DUPLICATE, shipment)
+
+    pending, seen = [], set(results)
+    for booking in bookings:
+        if booking['client_id'] not in seen:
+            seen.add(booking['client_id'])
+            pending.append(booking)
+    if not pending:
+        return results
+
+    # bulk_create skips Shipment.save(): fill in what it would have set
+    new_shipments = [
+        Shipment(
+            **booking,
+            organization=organization,
+            source_branch=branch,
+            tracking_id=tracking_id,
+            slug=generate_unique_hash(),
+            sender_phone_normalized=normalize_phone(booking['sender_phone']),
+            receiver_phone_normalized=normalize_phone(booking['receiver_phone']),
+        )
+        for booking, tracking_id in zip(pending, unique_tracking_ids(len(pending)))
+    ]
+    try:
+        # Savepoint, so a conflict doesn't abort the rest of the upload
+        with transaction.atomic():
+            shipments = Shipment.objects.bulk_create(new_shipments)
+    except IntegrityError:
+        if not retry:
+            raise
+        return apply_bookings(organization, branch, bookings, retry=False)
+    ShipmentHistory.objects.bulk_create([
+        ShipmentHistory(
+            shipment=shipment, organization=organization, branch=branch,
+            status=ShipmentStatus.BOOKED, location=branch.title,
+            remarks="Shipment booked offline and synced.",
+        )
+        for shipment in shipments
+    ])
+    record_events([(shipment, ShipmentStatus.BOOKED, branch.title, {'client_id': str(shipment.client_id)})
+                   for shipment in shipments])
+    for shipment in shipments:
+        results[shipment.client_id] = (APPLIED, shipment)
+    return results
+
+
+def apply_status_changes(organization, branch, changes, booked=None):
+    """
+    Applies scanned status changes. Each change names its shipment by
+    'tracking_id' or by the 'shipment_client_id' of a booking (possibly one
+    uploaded in the same batch, passed in `booked`).
+    Returns {change client_id: (result, shipment or None)}. Must run in a
+    transaction: the shipments are read with select_for_update().
+    """
+    # Created by this transaction, so nobody else can have changed them yet.
+    # DUPLICATE bookings were read without a lock and are selected again below.
+    created = {client_id: shipment for client_id, (result, shipment) in (booked or {}).items() if result == APPLIED}
+    tracking_ids = {c['tracking_id'] for c in changes if c.get('tracking_id')}
+    client_ids = {c['shipment_client_id'] for c in changes if c.get('shipment_client_id')} - set(created)
+    # Locked (in id order, so concurrent uploads can't deadlock) so the rank
+    # checks below compare against the committed status, not a stale read
+    shipments = Shipment.objects.select_for_update().filter(organization=organization).filter(
+        Q(tracking_id__in=tracking_ids) | Q(client_id__in=client_ids)
+    ).order_by('id')
+    by_tracking_id = {s.tracking_id: s for s in shipments}
+    by_client_id = {s.client_id: s for s in by_tracking_id.values() if s.client_id}
+    by_client_id.update(created)
+
+    results = {}
+    per_shipment = defaultdict(list)
+    for change in changes:
+        shipment = by_tracking_id.get(change.get('tracking_id')) or by_client_id.get(change.get('shipment_client_id'))
+        if shipment is None:
+            results[change['client_id']] = (REJECTED, None)
+            continue
+        per_shipment[shipment].append(change)
+
+    now = timezone.now()
+    updated, history, outbox = [], [], []
+    for shipment, shipment_changes in per_shipment.items():
+        # Lifecycle order first; the device's own timestamp only breaks ties
+        shipment_changes.sort(key=lambda c: (STATUS_RANK[c['status']], c.get('occurred_at') or now))
+        original = shipment.current_status
+        for change in shipment_changes:
+            if change['status'] == shipment.current_status:
+                results[change['client_id']] = (DUPLICATE, shipment)
+            elif STATUS_RANK[change['status']] <= STATUS_RANK[shipment.current_status]:
+                results[change['client_id']] = (STALE, shipment)
+            else:
+                shipment.current_status = change['status']
+                results[change['client_id']] = (APPLIED, shipment)
+                history.append(ShipmentHistory(
+                    shipment=shipment, organization=organization, branch=branch,
+                    status=change['status'], location=branch.title,
+                    remarks=change.get('remarks', ''),
+                ))
+                outbox.append((shipment, change['status'], branch.title, {
+                    'remarks': change.get('remarks', ''),
+                    'client_id': str(change['client_id']),
+                    'occurred_at': change['occurred_at'].isoformat() if change.get('occurred_at') else None,
+                    'clock': change.get('clock') or {},
+                }))
+        if shipment.current_status != original:
+            # bulk_update doesn't apply auto_now
+            shipment.updated_at = now
+            updated.append(shipment)
+
+    Shipment.objects.bulk_update(updated, ['current_status', 'updated_at'])
+    ShipmentHistory.objects.bulk_create(history)
+    record_events(outbox)
+    return results
+
+
+def apply_upload(organization, branch, bookings, changes):
+    """Applies a terminal's upload in one transaction. Returns (booking results, change results)."""
+    with transaction.atomic():
+        booked = apply_bookings(organization, branch, bookings) if bookings else {}
+        changed = apply_status_changes(organization, branch, changes, booked=booked) if changes else {}
+    return booked, changed
+
+
+def changes_since(organization, branch, cursor, limit=None):
+    """
+    Shipments of the branch touched by outbox events after `cursor`.
+    Returns (shipment ids, next cursor, has_more).
+    """
+    limit = limit or settings.SYNC_PAGE_SIZE
+    events = ShipmentEvent.objects.filter(organization=organization, id__gt=cursor or 0)
+    if settings.SHIPMENT_EVENTS_SETTLE_SECONDS:
+        # Same settle window as the outbox consumers: lower ids may still commit
+        settle = timezone.now() - timedelta(seconds=settings.SHIPMENT_EVENTS_SETTLE_SECONDS)
+        events = events.filter(created_at__lte=settle)
+    events = list(
+        events.filter(Q(shipment__source_branch=branch) | Q(shipment__destination_branch=branch))
+        .order_by('id')
+        .values_list('id', 'shipment_id')[:limit + 1]
+    )
+    has_more = len(events) > limit
+    events = events[:limit]
+    if not events:
+        return [], cursor or 0, False
+    shipment_ids = list(dict.fromkeys(shipment_id for _, shipment_id in events))
+    return shipment_ids, events[-1][0], has_more
@@ -1,3 +1,1004 @@
-from django.test import TestCase
+import json
+import uuid
+from datetime import timedelta
+from io import StringIO
+from unittest import skipUnless
+from django.core.management import call_command
+from django.utils import timezone
+from django.db import connection, models
+from django.test import TestCase, override_settings
+from core.testing import QueryCountAssertionsMixin, seed_organization, seed_shipments, access_token_for
+from core.models import IdempotencyKey
+from organization.models import Organization, Branch
+from . import events
+from .models import Shipment, ShipmentHistory, ShipmentEvent, ShipmentTombstone, ShipmentStatus, ConsumerOffset
+from .serializers import ShipmentCreateSerializer
+from .notifications import render_notifications, compile_template
 
-# Create your tests here.
+
+class NotificationTemplateTests(TestCase):
+    """Test notification template rendering, overrides and localization."""
+
+    def setUp(self):
+        self.org = Organization.objects.create(
+            title="Test Organization",
+            subdomain="test",
+            password="TestPassword123"
+        )
+        self.source = Branch.objects.create(organization=self.org, title="Surat", password="BranchPassword123")
+        self.destination = Branch.objects.create(organization=self.org, title="Pune", password="BranchPassword123")
+        self.shipment = Shipment.objects.create(
+            organization=self.org,
+            source_branch=self.source,
+            destination_branch=self.destination,
+            sender_name="Asha",
+            sender_phone="9000000001",
+            receiver_name="Ravi",
+            receiver_phone="9000000002",
+            price="150.00",
+        )
+
+    def test_booked_notifies_sender_and_receiver_with_tracking_link(self):
+        messages = dict(render_notifications(self.shipment, ShipmentStatus.BOOKED))
+        self.assertEqual(set(messages), {"9000000001", "9000000002"})
+        for body in messages.values():
+            self.assertIn(self.shipment.tracking_id, body)
+            self.assertIn(f"/track/{self.shipment.tracking_id}", body)
+            self.assertIn("Surat -> Pune", body)
+
+    def test_organization_override_and_locale(self):
+        self.org.metadata = {
+            'locale': 'hi',
+            'notification_templates': {
+                'hi': {ShipmentStatus.ARRIVED: {'receiver': "{tracking_id} {destination_branch} पहुँचा"}},
+            },
+        }
+        self.org.save()
+        messages = render_notifications(self.shipment, ShipmentStatus.ARRIVED)
+        self.assertEqual(messages, [("9000000002", f"{self.shipment.tracking_id} Pune पहुँचा")])
+
+        # Events without an override fall back to the built-in templates for the locale
+        delivered = render_notifications(self.shipment, ShipmentStatus.DELIVERED)
+        self.assertIn("डिलीवर", delivered[0][1])
+
+    def test_templates_are_compiled_once(self):
+        source = "Tracking ID: {tracking_id}"
+        self.assertIs(compile_template(source), compile_template(source))
+        self.assertEqual(render_notifications(self.shipment, ShipmentStatus.CANCELLED), [])
+
+
+@override_settings(SHIPMENT_EVENTS_SETTLE_SECONDS=0)
+class ShipmentEventOutboxTests(TestCase):
+    """Test outbox recording and at-least-once dispatch to consumers."""
+
+    def setUp(self):
+        self.org = Organization.objects.create(title="Test Organization", subdomain="test", password="TestPassword123")
+        self.branch = Branch.objects.create(organization=self.org, title="Surat", password="BranchPassword123")
+        self.shipment = Shipment.objects.create(
+            organization=self.org,
+            source_branch=self.branch,
+            destination_branch=self.branch,
+            sender_name="Asha",
+            sender_phone="9000000001",
+            receiver_name="Ravi",
+            receiver_phone="9000000002",
+            price="150.00",
+        )
+        self.received = []
+        self.fail = False
+        self._saved_consumers = dict(events._consumers)
+        events._consumers.clear()
+
+        @events.register_consumer('test', batch_size=2)
+        def consumer(batch):
+            if self.fail:
+                raise RuntimeError("consumer down")
+            self.received.extend(event.id for event in batch)
+
+    def tearDown(self):
+        events._consumers.clear()
+        events._consumers.update(self._saved_consumers)
+
+    def test_events_delivered_in_batches_and_offset_advances(self):
+        recorded = [events.record_event(self.shipment, ShipmentStatus.BOOKED).id for _ in range(5)]
+
+        self.assertEqual(events.dispatch_pending(), {'test': 5})
+        self.assertEqual(self.received, recorded)
+        self.assertEqual(ConsumerOffset.objects.get(consumer='test').last_event_id, recorded[-1])
+
+        # Nothing is redelivered once the offset has moved past it
+        self.assertEqual(events.dispatch_pending(), {'test': 0})
+
+    def test_failed_batch_is_redelivered(self):
+        event = events.record_event(self.shipment, ShipmentStatus.IN_TRANSIT, location="Surat")
+
+        self.fail = True
+        self.assertEqual(events.dispatch_pending(), {'test': 0})
+        self.assertFalse(ConsumerOffset.objects.filter(consumer='test', last_event_id=event.id).exists())
+
+        self.fail = False
+        self.assertEqual(events.dispatch_pending(), {'test': 1})
+        self.assertEqual(self.received, [event.id])
+        self.assertEqual(event.payload['tracking_id'], self.shipment.tracking_id)
+
+    @override_settings(SHIPMENT_EVENTS_SETTLE_SECONDS=60)
+    def test_unsettled_events_wait(self):
+        event = events.record_event(self.shipment, ShipmentStatus.BOOKED)
+        self.assertEqual(events.dispatch_pending(), {'test': 0})
+        self.assertFalse(ConsumerOffset.objects.filter(consumer='test', last_event_id=event.id).exists())
+
+        ShipmentEvent.objects.filter(id=event.id).update(created_at=timezone.now() - timedelta(minutes=2))
+        self.assertEqual(events.dispatch_pending(), {'test': 1})
+
+    @override_settings(SHIPMENT_EVENTS_INLINE_DISPATCH=True, DEBUG=False)
+    def test_inline_dispatch_is_development_only(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            events.record_event(self.shipment, ShipmentStatus.BOOKED)
+        self.assertEqual(callbacks, [])
+        with self.settings(DEBUG=True), self.captureOnCommitCallbacks(execute=True) as callbacks:
+            events.record_event(self.shipment, ShipmentStatus.BOOKED)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(len(self.received), 2)
+
+
+class ShipmentQueryCountTests(QueryCountAssertionsMixin, TestCase):
+    """Query counts of shipment endpoints must not grow with the number of rows (N+1 guard)."""
+
+    def get(self, path, subject=None, host=None):
+        headers = {}
+        if subject is not None:
+            headers['HTTP_AUTHORIZATION'] = f"Bearer {access_token_for(subject)}"
+        if host is not None:
+            headers['HTTP_HOST'] = host
+        resp = self.client.get(path, **headers)
+        self.assertEqual(resp.status_code, 200, resp.content)
+        return resp
+
+    def test_list_shipments_as_organization(self):
+        def scenario(size):
+            org, _ = seed_organization(f"org{size}", branches=5, shipments=size)
+            return lambda: self.assertEqual(len(self.get('/api/shipment/list/', org).json()['data']), size)
+        self.assertConstantQueries(scenario)
+
+    def test_list_shipments_as_branch(self):
+        def scenario(size):
+            _, branches = seed_organization(f"branch{size}", branches=2, shipments=size)
+            return lambda: self.assertEqual(len(self.get('/api/shipment/list/', branches[0]).json()['data']), size)
+        self.assertConstantQueries(scenario)
+
+    def test_retrieve_shipment(self):
+        def scenario(size):
+            org, _ = seed_organization(f"retrieve{size}", branches=5, shipments=size)
+            shipment = Shipment.objects.filter(organization=org).first()
+            return lambda: self.get(f'/api/shipment/{shipment.tracking_id}/', org)
+        self.assertConstantQueries(scenario)
+
+    def test_track_shipment(self):
+        def scenario(size):
+            org, _ = seed_organization(f"track{size}", branches=5, shipments=size, history_per_shipment=4)
+            shipment = Shipment.objects.filter(organization=org).first()
+            return lambda: self.get(f'/api/shipment/track/{shipment.tracking_id}/', host=f"track{size}.vyahan.local")
+        self.assertConstantQueries(scenario)
+
+
+class BookingBranchDirectoryTests(TestCase):
+    """Test destination branch resolution from the org-scoped branch directory."""
+
+    def setUp(self):
+        self.org, self.branches = seed_organization("booking", branches=3)
+        self.other_org, self.other_branches = seed_organization("other", branches=2)
+        self.payload = {
+            'sender_name': "Asha",
+            'sender_phone': "9000000001",
+            'receiver_name': "Ravi",
+            'receiver_phone': "9000000002",
+            'price': "150.00",
+            'destination_branch': self.branches[1].slug,
+        }
+
+    def book(self, payload):
+        return self.client.post(
+            '/api/shipment/create/', data=json.dumps(payload), content_type='application/json',
+            HTTP_AUTHORIZATION=f"Bearer {access_token_for(self.branches[0])}",
+        )
+
+    def test_booking_resolves_destination_with_one_query(self):
+        with self.assertNumQueries(1):
+            serializer = ShipmentCreateSerializer(data=self.payload, context={'organization': self.org})
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual(serializer.validated_data['destination_branch'].organization, self.org)
+
+        resp = self.book(self.payload)
+        self.assertEqual(resp.status_code, 201, resp.content)
+        data = resp.json()['data']
+        self.assertEqual(data['destination_branch'], self.branches[1].slug)
+        self.assertEqual(data['destination_branch_title'], self.branches[1].title)
+        self.assertEqual(Shipment.objects.get(tracking_id=data['tracking_id']).destination_branch_id, self.branches[1].id)
+
+    def test_resolution_ignores_stale_branch_map(self):
+        from organization.directory import get_branch_map
+        get_branch_map(self.org)
+        # Writes of another worker: this process's branch map doesn't see them
+        Branch.objects.filter(pk=self.branches[1].pk).update(is_active=False)
+        Branch.objects.bulk_create([Branch(organization=self.org, title="Jaipur", password="BranchPassword123")])
+        new_branch = Branch.objects.get(organization=self.org, title="Jaipur")
+        self.assertIn(self.branches[1].slug, get_branch_map(self.org))
+
+        self.assertEqual(self.book(self.payload).status_code, 400)
+        resp = self.book({**self.payload, 'destination_branch': new_branch.slug})
+        self.assertEqual(resp.status_code, 201, resp.content)
+
+    def test_booking_rejects_branch_of_another_organization(self):
+        resp = self.book({**self.payload, 'destination_branch': self.other_branches[0].slug})
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('destination_branch', resp.json()['error'])
+        self.assertFalse(Shipment.objects.exists())
+
+    def test_transfer_list_excludes_current_branch_and_tracks_changes(self):
+        token = access_token_for(self.branches[0])
+        resp = self.client.get('/api/organization/branch/branches/other/', HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertEqual([b['slug'] for b in resp.json()['data']['branches']], [b.slug for b in self.branches[1:]])
+
+        new_branch = Branch.objects.create(organization=self.org, title="Jaipur", password="BranchPassword123")
+        resp = self.client.get('/api/organization/branch/branches/other/', HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertIn(new_branch.slug, [b['slug'] for b in resp.json()['data']['branches']])
+
+
+class BranchQueueTests(QueryCountAssertionsMixin, TestCase):
+    """Test the awaiting dispatch / awaiting arrival work queues."""
+
+    def setUp(self):
+        self.org, self.branches = seed_organization("queues", branches=2)
+        source, destination = self.branches
+        self.booked, self.in_transit, self.delivered = seed_shipments(self.org, [source, destination], 3, history_per_shipment=0)
+        Shipment.objects.filter(pk__in=[self.booked.pk, self.in_transit.pk, self.delivered.pk]).update(
+            source_branch=source, destination_branch=destination
+        )
+        Shipment.objects.filter(pk=self.in_transit.pk).update(current_status=ShipmentStatus.IN_TRANSIT)
+        Shipment.objects.filter(pk=self.delivered.pk).update(current_status=ShipmentStatus.DELIVERED)
+
+    def queue(self, name, subject, **params):
+        return self.client.get(
+            f'/api/shipment/queue/{name}/', params, HTTP_AUTHORIZATION=f"Bearer {access_token_for(subject)}"
+        )
+
+    def tracking_ids(self, resp):
+        self.assertEqual(resp.status_code, 200, resp.content)
+        return [row['tracking_id'] for row in resp.json()['data']]
+
+    def test_branch_sees_its_queues(self):
+        source, destination = self.branches
+        self.assertEqual(self.tracking_ids(self.queue('dispatch', source)), [self.booked.tracking_id])
+        self.assertEqual(self.tracking_ids(self.queue('arrival', source)), [])
+        self.assertEqual(self.tracking_ids(self.queue('arrival', destination)), [self.in_transit.tracking_id])
+        self.assertEqual(self.tracking_ids(self.queue('dispatch', destination)), [])
+
+    def test_organization_picks_branch(self):
+        destination = self.branches[1]
+        self.assertEqual(self.queue('arrival', self.org).status_code, 400)
+        self.assertEqual(self.queue('arrival', self.org, branch="missing").status_code, 404)
+        resp = self.queue('arrival', self.org, branch=destination.slug)
+        self.assertEqual(self.tracking_ids(resp), [self.in_transit.tracking_id])
+
+    @skipUnless(connection.vendor == 'sqlite', "EXPLAIN output is backend specific")
+    def test_queues_use_partial_indexes(self):
+        from .views import queue_queryset
+        source, destination = self.branches
+        self.assertIn('shipment_awaiting_dispatch', queue_queryset('dispatch', source).explain())
+        self.assertIn('shipment_awaiting_arrival', queue_queryset('arrival', destination).explain())
+
+    def test_queue_query_count_is_constant(self):
+        def scenario(size):
+            org, branches = seed_organization(f"queue{size}", branches=2, shipments=size, history_per_shipment=1)
+            return lambda: self.tracking_ids(self.queue('dispatch', branches[0]))
+        self.assertConstantQueries(scenario)
+
+
+class ShipmentSearchTests(TestCase):
+    """Test shipment search by name, phone, tracking ID and description."""
+
+    def setUp(self):
+        self.org, self.branches = seed_organization("search", branches=3)
+        self.other_org, self.other_branches = seed_organization("othersearch", branches=2)
+        self.shipment = Shipment.objects.create(
+            organization=self.org, source_branch=self.branches[0], destination_branch=self.branches[1],
+            sender_name="Meera Iyer", sender_phone="+91 98765-43210",
+            receiver_name="Kiran Desai", receiver_phone="09123 456789",
+            description="Handloom sarees", price="250.00",
+        )
+        Shipment.objects.create(
+            organization=self.other_org, source_branch=self.other_branches[0], destination_branch=self.other_branches[1],
+            sender_name="Meera Iyer", sender_phone="9876543210", receiver_name="Kiran Desai",
+            receiver_phone="9123456789", price="100.00",
+        )
+
+    def search(self, q, subject=None, **params):
+        return self.client.get(
+            '/api/shipment/search/', {'q': q, **params},
+            HTTP_AUTHORIZATION=f"Bearer {access_token_for(subject or self.org)}",
+        )
+
+    def found(self, q, subject=None):
+        resp = self.search(q, subject)
+        self.assertEqual(resp.status_code, 200, resp.content)
+        return [row['tracking_id'] for row in resp.json()['data']]
+
+    def test_phones_normalized_on_save(self):
+        self.assertEqual(self.shipment.sender_phone_normalized, "9876543210")
+        self.assertEqual(self.shipment.receiver_phone_normalized, "9123456789")
+        self.shipment.receiver_phone = "+91-90000 00001"
+        self.shipment.save(update_fields=['receiver_phone'])
+        self.shipment.refresh_from_db()
+        self.assertEqual(self.shipment.receiver_phone_normalized, "9000000001")
+
+    def test_search_is_scoped_to_organization(self):
+        expected = [self.shipment.tracking_id]
+        self.assertEqual(self.found("98765 43210"), expected)
+        self.assertEqual(self.found("+91 9123-456789"), expected)
+        self.assertEqual(self.found("43210"), expected)
+        self.assertEqual(self.found("kiran"), expected)
+        self.assertEqual(self.found("meer iyer"), expected)
+        self.assertEqual(self.found("handloom"), expected)
+        self.assertEqual(self.found(self.shipment.tracking_id), expected)
+        self.assertEqual(self.found("nobody"), [])
+
+    def test_index_follows_updates_and_branch_scope(self):
+        self.shipment.receiver_name = "Neha Kapoor"
+        self.shipment.save()
+        self.assertEqual(self.found("kiran"), [])
+        self.assertEqual(self.found("kapoor"), [self.shipment.tracking_id])
+        self.assertEqual(self.found("kapoor", self.branches[1]), [self.shipment.tracking_id])
+        self.assertEqual(self.found("kapoor", self.branches[2]), [])
+
+        self.shipment.delete()
+        self.assertEqual(self.found("kapoor"), [])
+
+    def test_short_query_rejected(self):
+        self.assertEqual(self.search("ab").status_code, 400)
+
+    @skipUnless(connection.vendor == 'sqlite', "FTS5 triggers are SQLite only")
+    def test_missing_triggers_recreated_after_migrate(self):
+        from .search import ensure_search_index
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TRIGGER shipment_search_au")
+        ensure_search_index()
+        self.shipment.receiver_name = "Neha Kapoor"
+        self.shipment.save()
+        self.assertEqual(self.found("kapoor"), [self.shipment.tracking_id])
+
+    @skipUnless(connection.vendor == 'postgresql', "pg_trgm search is PostgreSQL only")
+    def test_postgres_search_uses_ilike(self):
+        from django.test.utils import CaptureQueriesContext
+        from .search import parse_terms, search_ids
+        with CaptureQueriesContext(connection) as queries:
+            search_ids(self.org, parse_terms("kapoor 100%"))
+        sql = queries.captured_queries[-1]['sql']
+        # The trigram index is on the plain columns, so UPPER(...) LIKE would scan the table
+        self.assertIn('ILIKE', sql)
+        self.assertNotIn('UPPER(', sql)
+        self.assertIn('100\\%', sql)
+
+
+class IdempotencyKeyTests(TestCase):
+    """Test Idempotency-Key replay on booking and status updates."""
+
+    def setUp(self):
+        self.org, self.branches = seed_organization("idempotency", branches=2)
+        self.auth = {'HTTP_AUTHORIZATION': f"Bearer {access_token_for(self.branches[0])}"}
+        self.payload = {
+            'sender_name': "Asha",
+            'sender_phone': "9000000001",
+            'receiver_name': "Ravi",
+            'receiver_phone': "9000000002",
+            'price': "150.00",
+            'destination_branch': self.branches[1].slug,
+        }
+
+    def book(self, key, payload=None):
+        return self.client.post(
+            '/api/shipment/create/', data=json.dumps(payload or self.payload), content_type='application/json',
+            HTTP_IDEMPOTENCY_KEY=key, **self.auth,
+        )
+
+    def test_retry_replays_stored_response(self):
+        first = self.book("book-1")
+        retry = self.book("book-1")
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Shipment.objects.count(), 1)
+        self.assertEqual(ShipmentEvent.objects.count(), 1)
+
+        self.assertEqual(self.book("book-2").status_code, 201)
+        self.assertEqual(Shipment.objects.count(), 2)
+
+    def test_key_reused_for_different_request(self):
+        self.book("book-1")
+        resp = self.book("book-1", {**self.payload, 'price': "999.00"})
+        self.assertEqual(resp.status_code, 422)
+        self.assertEqual(Shipment.objects.count(), 1)
+
+    def test_in_progress_duplicate_and_abandoned_claim(self):
+        from core.idempotency import claim
+        record, created = claim(f"branch:{self.branches[0].slug}", "book-1", "in-flight")
+        self.assertTrue(created)
+        self.assertEqual(self.book("book-1").status_code, 422)
+
+        IdempotencyKey.objects.update(request_hash=self.fingerprint())
+        self.assertEqual(self.book("book-1").status_code, 409)
+        self.assertFalse(Shipment.objects.exists())
+
+        # The worker holding the claim died before committing
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(self.book("book-1").status_code, 201)
+        self.assertEqual(Shipment.objects.count(), 1)
+
+    def fingerprint(self):
+        from django.test import RequestFactory
+        from core.idempotency import request_fingerprint
+        request = RequestFactory().post(
+            '/api/shipment/create/', data=json.dumps(self.payload), content_type='application/json'
+        )
+        return request_fingerprint(request)
+
+    def test_status_update_applied_once_and_keys_pruned(self):
+        tracking_id = self.book("book-1").json()['data']['tracking_id']
+        for _ in range(3):
+            resp = self.client.patch(
+                f'/api/shipment/{tracking_id}/update-status/', data=json.dumps({'status': 'IN_TRANSIT'}),
+                content_type='application/json', HTTP_IDEMPOTENCY_KEY="dispatch-1", **self.auth,
+            )
+            self.assertEqual(resp.status_code, 200)
+        self.assertEqual(ShipmentHistory.objects.filter(shipment__tracking_id=tracking_id).count(), 2)
+
+        IdempotencyKey.objects.filter(key="book-1").update(expires_at=timezone.now() - timedelta(seconds=1))
+        call_command('prune_idempotency_keys', stdout=StringIO())
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ["dispatch-1"])
+
+
+@override_settings(SHIPMENT_EVENTS_SETTLE_SECONDS=0)
+class OfflineSyncTests(QueryCountAssertionsMixin, TestCase):
+    """Test offline sync uploads, conflict resolution and change downloads."""
+
+    def setUp(self):
+        self.org, self.branches = seed_organization("sync", branches=2)
+        self.origin, self.destination = self.branches
+
+    def sync(self, branch, cursor=0, shipments=(), events=()):
+        resp = self.client.post(
+            '/api/shipment/sync/',
+            data=json.dumps({'cursor': cursor, 'shipments': list(shipments), 'events': list(events)}),
+            content_type='application/json', HTTP_AUTHORIZATION=f"Bearer {access_token_for(branch)}",
+        )
+        self.assertEqual(resp.status_code, 200, resp.content)
+        return resp.json()['data']
+
+    def booking(self, **extra):
+        return {
+            'client_id': str(uuid.uuid4()),
+            'sender_name': "Asha", 'sender_phone': "+91 90000 00001",
+            'receiver_name': "Ravi", 'receiver_phone': "9000000002",
+            'price': "120.00", 'destination_branch': self.destination.slug, **extra,
+        }
+
+    def change(self, status, **ref):
+        return {'client_id': str(uuid.uuid4()), 'status': status, **ref}
+
+    def test_upload_is_idempotent_and_downloads_changes(self):
+        first, second = self.booking(), self.booking()
+        dispatch = self.change(ShipmentStatus.IN_TRANSIT, shipment_client_id=first['client_id'], clock={'t1': 2})
+        data = self.sync(self.origin, shipments=[first, second, {'client_id': "bad"}], events=[dispatch])
+
+        self.assertEqual([r['result'] for r in data['booking_results']], ['applied', 'applied', 'rejected'])
+        self.assertEqual(data['event_results'][0]['result'], 'applied')
+        shipment = Shipment.objects.get(client_id=first['client_id'])
+        self.assertEqual(shipment.current_status, ShipmentStatus.IN_TRANSIT)
+        self.assertEqual(shipment.sender_phone_normalized, "9000000001")
+        self.assertEqual(list(shipment.history.order_by('id').values_list('status', flat=True)), ['BOOKED', 'IN_TRANSIT'])
+        self.assertEqual(ShipmentEvent.objects.count(), 3)
+        self.assertEqual({s['tracking_id'] for s in data['shipments']}, set(Shipment.objects.values_list('tracking_id', flat=True)))
+        self.assertEqual(data['cursor'], ShipmentEvent.objects.latest('id').id)
+
+        # Re-upload after a lost response: nothing is applied twice
+        again = self.sync(self.origin, cursor=data['cursor'], shipments=[first, second], events=[dispatch])
+        self.assertEqual([r['result'] for r in again['booking_results']], ['duplicate', 'duplicate'])
+        self.assertEqual(again['event_results'][0]['result'], 'duplicate')
+        self.assertEqual((Shipment.objects.count(), ShipmentEvent.objects.count()), (2, 3))
+        self.assertEqual((again['shipments'], again['cursor']), ([], data['cursor']))
+
+        # The destination branch sees its inbound shipments
+        inbound = self.sync(self.destination)
+        self.assertEqual(len(inbound['shipments']), 2)
+
+    def test_conflicts_resolve_by_status_order(self):
+        shipment = seed_shipments(self.org, self.branches, 1, history_per_shipment=0)[0]
+        Shipment.objects.filter(pk=shipment.pk).update(current_status=ShipmentStatus.ARRIVED)
+        late_scan = self.change(ShipmentStatus.IN_TRANSIT, tracking_id=shipment.tracking_id)
+        cancel = self.change(ShipmentStatus.CANCELLED, tracking_id=shipment.tracking_id, occurred_at="2026-01-02T10:00:00Z")
+        deliver = self.change(ShipmentStatus.DELIVERED, tracking_id=shipment.tracking_id, occurred_at="2026-01-02T09:00:00Z")
+        unknown = self.change(ShipmentStatus.DELIVERED, tracking_id="TRK-NOPE")
+        data = self.sync(self.destination, events=[late_scan, cancel, deliver, unknown])
+
+        self.assertEqual([r['result'] for r in data['event_results']], ['stale', 'stale', 'applied', 'rejected'])
+        shipment.refresh_from_db()
+        self.assertEqual(shipment.current_status, ShipmentStatus.DELIVERED)
+        self.assertEqual(ShipmentHistory.objects.filter(shipment=shipment).count(), 1)
+
+    def test_upload_queries_do_not_grow_with_batch_size(self):
+        def scenario(size):
+            bookings = [self.booking() for _ in range(size)]
+            events = [self.change(ShipmentStatus.IN_TRANSIT, shipment_client_id=b['client_id']) for b in bookings]
+            return lambda: self.sync(self.origin, shipments=bookings, events=events)
+        self.sync(self.origin, shipments=[self.booking()])  # warms the branch directory and lane table
+        self.assertConstantQueries(scenario, sizes=(2, 10, 20))
+
+    def test_changes_to_reuploaded_bookings_use_the_current_row(self):
+        from unittest import mock
+        from . import sync
+        booking = self.booking()
+        self.sync(self.origin, shipments=[booking])
+
+        def booked_then_delivered_elsewhere(*args, **kwargs):
+            results = apply_bookings(*args, **kwargs)
+            # Another terminal's update commits between the duplicate check and the status changes
+            Shipment.objects.filter(client_id=booking['client_id']).update(current_status=ShipmentStatus.DELIVERED)
+            return results
+
+        apply_bookings = sync.apply_bookings
+        dispatch = self.change(ShipmentStatus.IN_TRANSIT, shipment_client_id=booking['client_id'])
+        with mock.patch.object(sync, 'apply_bookings', booked_then_delivered_elsewhere):
+            data = self.sync(self.origin, shipments=[booking], events=[dispatch])
+        self.assertEqual(data['booking_results'][0]['result'], 'duplicate')
+        self.assertEqual(data['event_results'][0]['result'], 'stale')
+        self.assertEqual(Shipment.objects.get(client_id=booking['client_id']).current_status, ShipmentStatus.DELIVERED)
+
+    def test_concurrent_upload_of_the_same_booking_is_a_duplicate(self):
+        from unittest import mock
+        from . import sync
+        booking, other = self.booking(), self.booking()
+
+        raced = []
+
+        def booked_elsewhere_meanwhile(count):
+            # The other upload commits after this one's duplicate check
+            if not raced:
+                raced.append(True)
+                sync.apply_bookings(self.org, self.origin, [{**booking, 'destination_branch': self.destination}])
+            return unique_tracking_ids(count)
+
+        unique_tracking_ids = sync.unique_tracking_ids
+        with mock.patch.object(sync, 'unique_tracking_ids', booked_elsewhere_meanwhile):
+            data = self.sync(self.origin, shipments=[booking, other])
+        self.assertEqual([r['result'] for r in data['booking_results']], ['duplicate', 'applied'])
+        self.assertEqual(Shipment.objects.filter(client_id__in=[booking['client_id'], other['client_id']]).count(), 2)
+
+    @override_settings(SHIPMENT_EVENTS_SETTLE_SECONDS=60)
+    def test_download_waits_for_events_to_settle(self):
+        data = self.sync(self.origin, shipments=[self.booking()])
+        self.assertEqual(data['booking_results'][0]['result'], 'applied')
+        # A lower id could still be committing, so the cursor must not pass it yet
+        self.assertEqual((data['shipments'], data['cursor']), ([], 0))
+
+        ShipmentEvent.objects.update(created_at=timezone.now() - timedelta(seconds=61))
+        data = self.sync(self.origin)
+        self.assertEqual(len(data['shipments']), 1)
+        self.assertEqual(data['cursor'], ShipmentEvent.objects.latest('id').id)
+
+
+@override_settings(CHANGES_FEED_SETTLE_SECONDS=0)
+class ShipmentChangesFeedTests(TestCase):
+    """Test the updated_at keyset changes feed with tombstones."""
+
+    def setUp(self):
+        self.org, self.branches = seed_organization("changes", branches=3)
+        self.shipments = seed_shipments(self.org, self.branches[:2], 5, history_per_shipment=1)
+
+    def changes(self, cursor=None, subject=None, expected_status=200):
+        params = {'cursor': cursor} if cursor else {}
+        resp = self.client.get(
+            '/api/shipment/changes/', params, HTTP_AUTHORIZATION=f"Bearer {access_token_for(subject or self.org)}"
+        )
+        self.assertEqual(resp.status_code, expected_status, resp.content)
+        return resp.json()['data']
+
+    def test_incremental_polling(self):
+        data = self.changes()
+        self.assertEqual(len(data['shipments']), 5)
+        self.assertEqual(len(data['history']), 5)
+        self.assertFalse(data['has_more'])
+        cursor = data['cursor']
+
+        quiet = self.changes(cursor)
+        self.assertEqual((quiet['shipments'], quiet['history'], quiet['deleted']), ([], [], []))
+
+        shipment = self.shipments[0]
+        resp = self.client.patch(
+            f'/api/shipment/{shipment.tracking_id}/update-status/', data=json.dumps({'status': 'ARRIVED'}),
+            content_type='application/json', HTTP_AUTHORIZATION=f"Bearer {access_token_for(self.branches[1])}",
+        )
+        self.assertEqual(resp.status_code, 200)
+        Shipment.objects.get(pk=self.shipments[1].pk).delete()
+
+        data = self.changes(quiet['cursor'])
+        self.assertEqual([s['tracking_id'] for s in data['shipments']], [shipment.tracking_id])
+        self.assertEqual({h['tracking_id'] for h in data['history']}, {shipment.tracking_id})
+        self.assertIn('ARRIVED', [h['status'] for h in data['history']])
+        self.assertEqual([d['tracking_id'] for d in data['deleted']], [self.shipments[1].tracking_id])
+
+        self.assertEqual(self.changes(data['cursor'])['deleted'], [])
+
+    @override_settings(CHANGES_FEED_PAGE_SIZE=2)
+    def test_pages_and_branch_scope(self):
+        seen, cursor, has_more = [], None, True
+        while has_more:
+            data = self.changes(cursor)
+            seen += [s['tracking_id'] for s in data['shipments']]
+            cursor, has_more = data['cursor'], data['has_more']
+        self.assertEqual(sorted(seen), sorted(s.tracking_id for s in self.shipments))
+        self.assertEqual(self.changes(subject=self.branches[2])['shipments'], [])
+
+    def test_bad_and_expired_cursors(self):
+        self.changes("not-a-cursor", expected_status=400)
+        from .changes import encode_cursor
+        stale = encode_cursor(None, 0, 0, timezone.now() - timedelta(days=31))
+        self.changes(stale, expected_status=410)
+
+    @override_settings(CHANGES_FEED_SETTLE_SECONDS=60)
+    def test_recent_updates_wait_to_settle(self):
+        self.assertEqual(self.changes()['shipments'], [])
+        Shipment.objects.filter(pk=self.shipments[0].pk).update(updated_at=timezone.now() - timedelta(seconds=61))
+        data = self.changes()
+        self.assertEqual([s['tracking_id'] for s in data['shipments']], [self.shipments[0].tracking_id])
+        # The rest are picked up from the cursor once they settle
+        Shipment.objects.exclude(pk=self.shipments[0].pk).update(updated_at=timezone.now() - timedelta(seconds=61))
+        self.assertEqual(len(self.changes(data['cursor'])['shipments']), 4)
+
+    @skipUnless(connection.vendor == 'sqlite', "EXPLAIN output is backend specific")
+    def test_feed_uses_keyset_index(self):
+        since = timezone.now()
+        query = Shipment.objects.filter(organization=self.org).filter(
+            models.Q(updated_at__gt=since) | models.Q(updated_at=since, id__gt=0)
+        ).order_by('updated_at', 'id')
+        self.assertIn('shipment_org_updated', query.explain())
+
+    def test_tombstones_pruned_after_retention(self):
+        self.shipments[0].delete()
+        ShipmentTombstone.objects.update(deleted_at=timezone.now() - timedelta(days=31))
+        self.shipments[1].delete()
+        call_command('prune_shipment_tombstones', stdout=StringIO())
+        self.assertEqual(list(ShipmentTombstone.objects.values_list('tracking_id', flat=True)), [self.shipments[1].tracking_id])
+
+
+class ResponseEncodingTests(TestCase):
+    """Test the fast JSON renderer and Accept-Encoding negotiation on shipment payloads."""
+
+    def setUp(self):
+        self.org, _ = seed_organization("encoding", branches=3, shipments=20)
+        self.auth = {'HTTP_AUTHORIZATION': f"Bearer {access_token_for(self.org)}"}
+
+    def test_fast_renderer_matches_json_renderer(self):
+        from decimal import Decimal
+        from django.utils.translation import gettext_lazy
+        from rest_framework.renderers import JSONRenderer
+        from core.renderers import FastJSONRenderer
+        from .serializers import ShipmentSerializer
+
+        data = {
+            'shipments': ShipmentSerializer(Shipment.objects.filter(organization=self.org)[:5], many=True).data,
+            'at': timezone.now(),
+            'day': timezone.now().date(),
+            'price': Decimal('150.50'),
+            'uuid': uuid.uuid4(),
+            'lazy': gettext_lazy("Shipments fetched successfully"),
+            'text': "Vyāhan\u2028line\u2029",
+            1: None,
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(
+            FastJSONRenderer().render(data, 'application/json; indent=2'),
+            JSONRenderer().render(data, 'application/json; indent=2'),
+        )
+
+    def list_shipments(self, accept_encoding):
+        return self.client.get('/api/shipment/list/', HTTP_ACCEPT_ENCODING=accept_encoding, **self.auth)
+
+    def test_gzip_negotiated(self):
+        import gzip
+        plain = self.list_shipments('')
+        compressed = self.list_shipments('gzip, deflate')
+
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', compressed['Vary'])
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+        self.assertLess(len(compressed.content), len(plain.content))
+
+    def test_brotli_preferred_when_available(self):
+        from importlib import import_module
+        middleware = import_module('vyahan-be.requestMiddleware')
+        resp = self.list_shipments('gzip, br')
+        if middleware.brotli is None:
+            self.assertEqual(resp['Content-Encoding'], 'gzip')
+        else:
+            self.assertEqual(resp['Content-Encoding'], 'br')
+            self.assertEqual(middleware.brotli.decompress(resp.content), self.list_shipments('').content)
+        self.assertEqual(self.list_shipments('br;q=0, gzip;q=0.5')['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Encoding', self.list_shipments('gzip;q=0'))
+
+    def test_small_responses_not_compressed(self):
+        resp = self.client.get('/api/organization/health/', HTTP_HOST='encoding.vyahan.local', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn('Content-Encoding', resp)
+
+
+class ShipmentRepresentationTests(TestCase):
+    """The .values() fast path must render exactly like ShipmentSerializer."""
+
+    def setUp(self):
+        from analytics.models import LaneTransitStats
+        from analytics.transit import lane_etas
+        lane_etas.clear()
+        self.addCleanup(lane_etas.clear)
+        self.org, self.branches = seed_organization("representation", branches=3, shipments=30, history_per_shipment=3)
+        # Distinct timestamps so both paths see one well-defined history order
+        for offset, history in enumerate(ShipmentHistory.objects.order_by('id')):
+            ShipmentHistory.objects.filter(pk=history.pk).update(created_at=history.created_at + timedelta(seconds=offset))
+        Shipment.objects.filter(pk=Shipment.objects.filter(organization=self.org).first().pk).update(
+            current_status=ShipmentStatus.BOOKED, description="Fragile glass – handle with care", price="12.5",
+        )
+        LaneTransitStats.objects.create(
+            organization=self.org, source_branch=self.branches[0], destination_branch=self.branches[1],
+            samples=10, p50_seconds=3600.5, p90_seconds=7200.25,
+        )
+        Shipment.objects.filter(organization=self.org).update(source_branch=self.branches[0], destination_branch=self.branches[1])
+
+    def render(self, data):
+        from core.renderers import FastJSONRenderer
+        return FastJSONRenderer().render(data)
+
+    def test_list_matches_serializer(self):
+        from .representations import shipment_list_data
+        from .serializers import ShipmentSerializer
+        from .views import shipment_queryset
+        queryset = Shipment.objects.filter(organization=self.org).order_by('id')
+
+        expected = ShipmentSerializer(shipment_queryset().filter(organization=self.org).order_by('id'), many=True).data
+        self.assertTrue(any(item['eta'] for item in expected))
+        self.assertEqual(self.render(shipment_list_data(queryset)), self.render(expected))
+
+    def test_track_matches_serializer(self):
+        from .representations import shipment_detail_data
+        from .serializers import ShipmentSerializer
+        for shipment in Shipment.objects.filter(organization=self.org)[:5]:
+            query = Shipment.objects.filter(tracking_id=shipment.tracking_id)
+            self.assertEqual(self.render(shipment_detail_data(query)), self.render(ShipmentSerializer(shipment).data))
+
+
+class ShipmentFieldsetTests(TestCase):
+    """Test ?fields= / ?expand= pruning of shipment responses and their queries."""
+
+    def setUp(self):
+        self.org, self.branches = seed_organization("fieldsets", branches=3, shipments=10, history_per_shipment=2)
+        self.auth = {'HTTP_AUTHORIZATION': f"Bearer {access_token_for(self.org)}"}
+
+    def get(self, path, expected_status=200, **params):
+        resp = self.client.get(path, params, **self.auth)
+        self.assertEqual(resp.status_code, expected_status, resp.content)
+        return resp.json()['data']
+
+    def test_fields_prune_output_and_query(self):
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as full:
+            self.get('/api/shipment/list/')
+        with CaptureQueriesContext(connection) as sparse:
+            data = self.get('/api/shipment/list/', fields='tracking_id,current_status,source_branch_title')
+
+        self.assertEqual(len(data), 10)
+        self.assertEqual(list(data[0]), ['tracking_id', 'current_status', 'source_branch_title'])
+        self.assertEqual(len(sparse.captured_queries), len(full.captured_queries) - 1)  # no history query
+        sql = sparse.captured_queries[-1]['sql']
+        self.assertNotIn('sender_name', sql)
+        self.assertNotIn('shipmenthistory', sql)
+
+    def test_expand_history(self):
+        data = self.get('/api/shipment/list/', fields='tracking_id', expand='history')
+        self.assertEqual(list(data[0]), ['tracking_id', 'history'])
+        self.assertEqual(len(data[0]['history']), 2)
+
+        data = self.get('/api/shipment/list/', expand='')
+        self.assertNotIn('history', data[0])
+        self.assertIn('sender_name', data[0])
+
+    def test_detail_endpoints(self):
+        shipment = Shipment.objects.filter(organization=self.org).first()
+        tracked = self.client.get(
+            f'/api/shipment/track/{shipment.tracking_id}/', {'fields': 'current_status,eta'}, HTTP_HOST="fieldsets.vyahan.local",
+        ).json()['data']
+        self.assertEqual(tracked, {'current_status': shipment.current_status, 'eta': None})
+
+        retrieved = self.get(f'/api/shipment/{shipment.tracking_id}/', fields='tracking_id')
+        self.assertEqual(retrieved, {'tracking_id': shipment.tracking_id})
+        other = next(b for b in self.branches if b.id not in (shipment.source_branch_id, shipment.destination_branch_id))
+        resp = self.client.get(
+            f'/api/shipment/{shipment.tracking_id}/', {'fields': 'tracking_id'},
+            HTTP_AUTHORIZATION=f"Bearer {access_token_for(other)}",
+        )
+        self.assertEqual(resp.status_code, 403)
+
+    def test_unknown_fields_rejected(self):
+        self.get('/api/shipment/list/', expected_status=400, fields='tracking_id,password')
+        self.get('/api/shipment/list/', expected_status=400, expand='sender_name')
+
+
+class TenantScopingTests(TestCase):
+    """Test tenant-scoped managers and the per-organization lookups built on them."""
+
+    def setUp(self):
+        self.org, self.branches = seed_organization("tenanta", branches=2, shipments=3)
+        self.other, self.other_branches = seed_organization("tenantb", branches=2, shipments=4)
+
+    def test_managers_scoped_to_current_organization(self):
+        from core.tenancy import tenant_scope, unscoped
+        with tenant_scope(self.org):
+            self.assertEqual(Shipment.objects.count(), 3)
+            self.assertEqual(ShipmentHistory.objects.count(), 6)
+            self.assertEqual(set(Branch.objects.all()), set(self.branches))
+            self.assertEqual(Shipment.all_objects.count(), 7)
+            with unscoped():
+                self.assertEqual(Shipment.objects.count(), 7)
+            # Related managers and FK access use the unscoped default manager
+            self.assertEqual(self.other_branches[0].outgoing_shipments.exists(), True)
+        self.assertEqual(Shipment.objects.count(), 7)
+
+    def test_authentication_switches_scope_to_token_organization(self):
+        from django.test import RequestFactory
+        from core.authentication import VyahanJWTAuthentication
+        from core.tenancy import tenant_scope, current_organization
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f"Bearer {access_token_for(self.branches[0])}")
+        with tenant_scope(None):
+            VyahanJWTAuthentication().authenticate(request)
+            self.assertEqual(current_organization(), self.org)
+        self.assertIsNone(current_organization())
+
+    def test_branch_token_rejected_on_other_tenant_subdomain(self):
+        resp = self.client.get(
+            '/api/shipment/list/', HTTP_HOST="tenantb.vyahan.local",
+            HTTP_AUTHORIZATION=f"Bearer {access_token_for(self.branches[0])}",
+        )
+        self.assertEqual(resp.status_code, 403)
+        self.assertIn("Branch not found", json.dumps(resp.json()))
+
+    def test_tracking_requires_organization_subdomain(self):
+        shipment = Shipment.objects.filter(organization=self.org).first()
+        self.assertEqual(self.client.get(f'/api/shipment/track/{shipment.tracking_id}/').status_code, 404)
+        self.assertEqual(
+            self.client.get(f'/api/shipment/track/{shipment.tracking_id}/', HTTP_HOST="tenantb.vyahan.local").status_code, 404
+        )
+        self.assertEqual(
+            self.client.get(f'/api/shipment/track/{shipment.tracking_id}/', HTTP_HOST="tenanta.vyahan.local").status_code, 200
+        )
+
+    @skipUnless(connection.vendor == 'sqlite', "EXPLAIN output is backend specific")
+    def test_tenant_queries_use_organization_indexes(self):
+        self.assertIn('shipment_org_created', Shipment.objects.filter(organization=self.org).order_by('-created_at').explain())
+        self.assertIn('branch_org_slug', Branch.objects.filter(organization=self.org, slug='x').explain())
+
+
+class ShipmentHistoryDenormalizationTests(TestCase):
+    """Test the organization / branch columns copied onto history rows."""
+
+    def setUp(self):
+        self.org, self.branches = seed_organization("denorm", branches=2)
+        self.auth = {'HTTP_AUTHORIZATION': f"Bearer {access_token_for(self.branches[0])}"}
+
+    def test_booking_and_scan_record_organization_and_branch(self):
+        resp = self.client.post('/api/shipment/create/', data=json.dumps({
+            'sender_name': "Asha", 'sender_phone': "9000000001",
+            'receiver_name': "Ravi", 'receiver_phone': "9000000002",
+            'price': "150.00", 'destination_branch': self.branches[1].slug,
+        }), content_type='application/json', **self.auth)
+        tracking_id = resp.json()['data']['tracking_id']
+        self.client.patch(
+            f'/api/shipment/{tracking_id}/update-status/', data=json.dumps({'status': ShipmentStatus.ARRIVED}),
+            content_type='application/json', HTTP_AUTHORIZATION=f"Bearer {access_token_for(self.branches[1])}",
+        )
+        rows = list(ShipmentHistory.objects.order_by('id').values_list('status', 'organization_id', 'branch_id'))
+        self.assertEqual(rows, [
+            (ShipmentStatus.BOOKED, self.org.id, self.branches[0].id),
+            (ShipmentStatus.ARRIVED, self.org.id, self.branches[1].id),
+        ])
+
+    def test_str_and_scoped_queries_skip_the_shipment(self):
+        from core.tenancy import tenant_scope
+        seed_shipments(self.org, self.branches, 1, history_per_shipment=1)
+        history = ShipmentHistory.objects.get()
+        with self.assertNumQueries(0):
+            str(history)
+        with tenant_scope(self.org):
+            self.assertNotIn('JOIN', str(ShipmentHistory.objects.filter(branch=self.branches[0]).query))
+
+    @skipUnless(connection.vendor == 'sqlite', "EXPLAIN output is backend specific")
+    def test_branch_timeline_uses_index(self):
+        since = timezone.now() - timedelta(days=1)
+        query = ShipmentHistory.objects.filter(branch=self.branches[0], created_at__gte=since).order_by('-created_at')
+        self.assertIn('history_branch_activity', query.explain())
+
+
+class BranchActivityFeedTests(TestCase):
+    """Test the branch activity feed: window, keyset pages and index-only scans."""
+
+    def setUp(self):
+        self.org, self.branches = seed_organization("activity", branches=3, shipments=12)
+        self.branch = self.branches[0]
+        self.stale = ShipmentHistory.objects.filter(branch=self.branch).order_by('id').first()
+        ShipmentHistory.objects.filter(id=self.stale.id).update(created_at=timezone.now() - timedelta(days=2))
+
+    def activity(self, subject, **params):
+        resp = self.client.get(
+            '/api/shipment/activity/', params, HTTP_AUTHORIZATION=f"Bearer {access_token_for(subject)}"
+        )
+        return resp.status_code, resp.json()
+
+    def expected_ids(self, since):
+        return list(
+            ShipmentHistory.objects.filter(branch=self.branch, created_at__gte=since)
+            .order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+
+    @override_settings(BRANCH_ACTIVITY_PAGE_SIZE=3)
+    def test_pages_walk_todays_activity_newest_first(self):
+        ids, cursor, has_more = [], None, True
+        while has_more:
+            status_code, body = self.activity(self.branch, **({'cursor': cursor} if cursor else {}))
+            self.assertEqual(status_code, 200)
+            ids += [entry['id'] for entry in body['data']['activity']]
+            cursor, has_more = body['data']['cursor'], body['data']['has_more']
+        self.assertEqual(ids, self.expected_ids(timezone.now() - timedelta(days=1)))
+        self.assertNotIn(self.stale.id, ids)
+
+        entry = body['data']['activity'][-1]
+        history = ShipmentHistory.objects.select_related('shipment').get(id=entry['id'])
+        self.assertEqual(entry, {
+            'id': history.id, 'tracking_id': history.shipment.tracking_id,
+            'status': history.status, 'created_at': entry['created_at'],
+        })
+
+    def test_window_and_admin_branch_selection(self):
+        since = (timezone.now() - timedelta(days=3)).isoformat()
+        status_code, body = self.activity(self.org, branch=self.branch.slug, since=since)
+        self.assertEqual(status_code, 200)
+        self.assertIn(self.stale.id, [entry['id'] for entry in body['data']['activity']])
+
+        until = (timezone.now() - timedelta(days=1)).isoformat()
+        status_code, body = self.activity(self.branch, since=since, until=until)
+        self.assertEqual([entry['id'] for entry in body['data']['activity']], [self.stale.id])
+
+        self.assertEqual(self.activity(self.org)[0], 400)
+        self.assertEqual(self.activity(self.org, branch="missing")[0], 404)
+        self.assertEqual(self.activity(self.branch, since="yesterday")[0], 400)
+        self.assertEqual(self.activity(self.branch, cursor="garbage")[0], 400)
+
+    @override_settings(BRANCH_ACTIVITY_PAGE_SIZE=3)
+    def test_cursor_keeps_the_window_of_the_first_page(self):
+        since = timezone.now() - timedelta(days=3)
+        status_code, body = self.activity(self.branch, since=since.isoformat())
+        ids = [entry['id'] for entry in body['data']['activity']]
+        while body['data']['has_more']:
+            # Later pages send only the cursor, like a walk that runs past midnight
+            status_code, body = self.activity(self.branch, cursor=body['data']['cursor'])
+            self.assertEqual(status_code, 200)
+            ids += [entry['id'] for entry in body['data']['activity']]
+        self.assertEqual(ids, self.expected_ids(since))
+        self.assertEqual(ids[-1], self.stale.id)
+
+    @skipUnless(connection.vendor == 'sqlite', "EXPLAIN output is backend specific")
+    def test_feed_scans_only_the_covering_index(self):
+        from django.test.utils import CaptureQueriesContext
+        from . import activity
+        with CaptureQueriesContext(connection) as queries:
+            activity.branch_activity(self.branch, activity.start_of_day())
+        plan = connection.cursor().execute(f"EXPLAIN QUERY PLAN {queries.captured_queries[-1]['sql']}").fetchall()
+        plan = ' '.join(str(row[-1]) for row in plan)
+        self.assertIn('COVERING INDEX history_branch_activity', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
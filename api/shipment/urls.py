@@ -4,6 +4,12 @@ from . import views
 urlpatterns = [
     path('create/', views.create_shipment, name='create_shipment'),
     path('list/', views.list_shipments, name='list_shipments'),
+    path('changes/', views.shipment_changes, name='shipment_changes'),
+    path('activity/', views.branch_activity, name='branch_activity'),
+    path('sync/', views.sync_shipments, name='sync_shipments'),
+    path('search/', views.search_shipments, name='search_shipments'),
+    path('queue/dispatch/', views.awaiting_dispatch, name='awaiting_dispatch'),
+    path('queue/arrival/', views.awaiting_arrival, name='awaiting_arrival'),
     path('<str:tracking_id>/', views.retrieve_shipment, name='retrieve_shipment'),
     path('<str:tracking_id>/update-status/', views.update_shipment_status, name='update_shipment_status'),
     path('track/<str:tracking_id>/', views.track_shipment, name='track_shipment'),
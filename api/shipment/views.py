@@ -1,18 +1,43 @@
-from django.db import models
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.db import models, transaction
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
 from drf_yasg.utils import swagger_auto_schema
+from drf_yasg import openapi
 from rest_framework.permissions import AllowAny
 from rest_framework import status
 from .models import Shipment, ShipmentHistory, ShipmentStatus
-from .serializers import ShipmentSerializer, ShipmentCreateSerializer, ShipmentHistorySerializer
+from .serializers import (
+    ShipmentSerializer, ShipmentCreateSerializer, ShipmentHistorySerializer,
+    SyncBookingSerializer, SyncStatusChangeSerializer, SyncRequestSerializer, SyncResponseSerializer,
+    ShipmentChangesSerializer, BranchActivitySerializer,
+)
 from core.utils import response
 from organization.permissions import IsOrganizationSet
 from core.authentication import VyahanJWTAuthentication
-from core.sms_service import send_sms
+from core.idempotency import idempotent, HEADER_PARAMETER as IDEMPOTENCY_KEY_HEADER
+from core.fieldsets import FieldsetError, requested_fields, fieldset_parameters
+from .events import record_event
+from . import search, sync, changes, activity, representations
+from organization.directory import resolve_branch, resolve_branches
+
+
+def shipment_queryset():
+    """Shipments with everything ShipmentSerializer reads, fetched in a constant number of queries."""
+    return Shipment.objects.select_related('source_branch', 'destination_branch').prefetch_related('history')
+
+# ?fields= / ?expand= on the shipment read endpoints
+FIELDSET_PARAMETERS = fieldset_parameters(representations.ALL_FIELDS, representations.EXPANDABLE)
+
+
+def shipment_fields(request):
+    return requested_fields(request.query_params, representations.ALL_FIELDS, representations.EXPANDABLE)
 
 @swagger_auto_schema(
     method='post',
     request_body=ShipmentCreateSerializer,
+    manual_parameters=[IDEMPOTENCY_KEY_HEADER],
     responses={201: ShipmentSerializer},
     operation_description="Book a new shipment. Requires Branch authentication.",
     security=[{'Bearer': []}]
@@ -20,6 +45,7 @@ from core.sms_service import send_sms
 @api_view(['POST'])
 @authentication_classes([VyahanJWTAuthentication])
 @permission_classes([IsOrganizationSet])
+@idempotent
 def create_shipment(request):
     org = getattr(request, 'organization', None)
     branch = getattr(request, 'branch', None)
@@ -27,53 +53,32 @@ def create_shipment(request):
     if not org or not branch:
         return response(status.HTTP_401_UNAUTHORIZED, "Organization or Branch context missing")
     
-    serializer = ShipmentCreateSerializer(data=request.data)
+    serializer = ShipmentCreateSerializer(data=request.data, context={'organization': org})
     if serializer.is_valid():
-        shipment = serializer.save(organization=org, source_branch=branch)
-        
-        # Create initial history entry
-        ShipmentHistory.objects.create(
-            shipment=shipment,
-            status=ShipmentStatus.BOOKED,
-            location=branch.title,
-            remarks="Shipment booked successfully."
-        )
-        
-        resp_serializer = ShipmentSerializer(shipment)
-        
-        # --- Send SMS Notifications ---
-        try:
-            tracking_link = f"http://localhost:3000/track/{shipment.tracking_id}"
-            
-            # 1. Notify Sender
-            sender_msg = (
-                f"Shipment Confirmed!\n"
-                f"Tracking ID: {shipment.tracking_id}\n"
-                f"To: {shipment.receiver_name}\n"
-                f"Route: {shipment.source_branch.title} -> {shipment.destination_branch.title}\n"                
-                f"- Vyhan Logistics"
-            )
-            send_sms(shipment.sender_phone, sender_msg)
+        with transaction.atomic():
+            shipment = serializer.save(organization=org, source_branch=branch)
             
-            # 2. Notify Receiver
-            receiver_msg = (
-                f"Incoming Shipment!\n"
-                f"From: {shipment.sender_name}\n"
-                f"Tracking ID: {shipment.tracking_id}\n"
-                f"Route: {shipment.source_branch.title} -> {shipment.destination_branch.title}\n"                
-                f"- Vyhan Logistics"
+            # Create initial history entry
+            ShipmentHistory.objects.create(
+                shipment=shipment,
+                organization=org,
+                branch=branch,
+                status=ShipmentStatus.BOOKED,
+                location=branch.title,
+                remarks="Shipment booked successfully."
             )
-            send_sms(shipment.receiver_phone, receiver_msg)
             
-        except Exception as e:
-            # We don't want to fail the request if SMS fails, just log it
-            print(f"SMS Sending failed: {e}")
+            # Notifications and other side-effects are driven from the outbox
+            record_event(shipment, ShipmentStatus.BOOKED, location=branch.title)
+        
+        resp_serializer = ShipmentSerializer(shipment)
         
         return response(status.HTTP_201_CREATED, "Shipment booked successfully", data=resp_serializer.data)
     return response(status.HTTP_400_BAD_REQUEST, "Invalid data", error=serializer.errors)
 
 @swagger_auto_schema(
     method='get',
+    manual_parameters=FIELDSET_PARAMETERS,
     responses={200: ShipmentSerializer(many=True)},
     operation_description="List shipments. Admins see all, Branch managers see related shipments.",
     security=[{'Bearer': []}]
@@ -85,6 +90,10 @@ def list_shipments(request):
     org = getattr(request, 'organization', None)
     if not org:
         return response(status.HTTP_404_NOT_FOUND, "Organization not found")
+    try:
+        fields = shipment_fields(request)
+    except FieldsetError as e:
+        return response(status.HTTP_400_BAD_REQUEST, str(e))
     
     # Check if admin or branch
     is_org_admin = request.branch is None
@@ -101,11 +110,202 @@ def list_shipments(request):
     else:
         return response(status.HTTP_401_UNAUTHORIZED, "Valid authentication required")
 
-    serializer = ShipmentSerializer(shipments, many=True)
-    return response(status.HTTP_200_OK, "Shipments fetched successfully", data=serializer.data)
+    # Same output as ShipmentSerializer(shipments, many=True), built from .values() rows
+    data = representations.shipment_list_data(shipments, fields)
+    return response(status.HTTP_200_OK, "Shipments fetched successfully", data=data)
+
+@swagger_auto_schema(
+    method='get',
+    manual_parameters=[
+        openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          description="Cursor from the previous response; omit for a full sync"),
+    ],
+    responses={200: ShipmentChangesSerializer, 410: "Cursor expired, resync without a cursor"},
+    operation_description=(
+        "Shipments and history rows changed, and shipments deleted, since the cursor. "
+        "Poll with the returned cursor; fetch again immediately while has_more is true. "
+        "Branch managers only see their related shipments."
+    ),
+    security=[{'Bearer': []}]
+)
+@api_view(['GET'])
+@authentication_classes([VyahanJWTAuthentication])
+@permission_classes([IsOrganizationSet])
+def shipment_changes(request):
+    org = getattr(request, 'organization', None)
+    branch = getattr(request, 'branch', None)
+    try:
+        feed = changes.changes_since(org, request.query_params.get('cursor'), branch=branch)
+    except changes.CursorExpired as e:
+        return response(status.HTTP_410_GONE, str(e))
+    except changes.CursorError as e:
+        return response(status.HTTP_400_BAD_REQUEST, str(e))
+
+    serializer = ShipmentChangesSerializer(feed)
+    return response(status.HTTP_200_OK, "Changes fetched successfully", data=serializer.data)
+
+def activity_window_bound(request, name):
+    """Aware datetime from an ISO 8601 query parameter, None if absent. Raises ValueError."""
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f"Invalid '{name}' datetime")
+    return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
 
 @swagger_auto_schema(
     method='get',
+    manual_parameters=[
+        openapi.Parameter('branch', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          description="Branch slug; required for organization admins"),
+        openapi.Parameter('since', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          description="ISO 8601 start of the window (default: start of today)"),
+        openapi.Parameter('until', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          description="ISO 8601 end of the window, exclusive (default: open)"),
+        openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          description="Cursor from the previous page; keeps that page's window"),
+    ],
+    responses={200: BranchActivitySerializer},
+    operation_description=(
+        "Bookings, dispatches, arrivals and deliveries scanned at the branch, newest first. "
+        "Fetch the next (older) page with the returned cursor while has_more is true. "
+        "Organization admins pass ?branch=<slug>."
+    ),
+    security=[{'Bearer': []}]
+)
+@api_view(['GET'])
+@authentication_classes([VyahanJWTAuthentication])
+@permission_classes([IsOrganizationSet])
+def branch_activity(request):
+    org = getattr(request, 'organization', None)
+    branch = getattr(request, 'branch', None)
+    if branch is None:
+        slug = request.query_params.get('branch')
+        if not slug:
+            return response(status.HTTP_400_BAD_REQUEST, "Query parameter 'branch' is required")
+        branch = resolve_branch(org, slug)
+        if branch is None:
+            return response(status.HTTP_404_NOT_FOUND, "Branch not found")
+    try:
+        since = activity_window_bound(request, 'since') or activity.start_of_day()
+        until = activity_window_bound(request, 'until')
+    except ValueError as e:
+        return response(status.HTTP_400_BAD_REQUEST, str(e))
+
+    try:
+        data = activity.branch_activity(branch, since, until, cursor=request.query_params.get('cursor'))
+    except activity.CursorError as e:
+        return response(status.HTTP_400_BAD_REQUEST, str(e))
+    return response(status.HTTP_200_OK, "Branch activity fetched successfully", data=data)
+
+# Work queues of a branch, each served by a partial index on Shipment (see Meta.indexes)
+QUEUES = {
+    'dispatch': ('source_branch', ShipmentStatus.BOOKED),
+    'arrival': ('destination_branch', ShipmentStatus.IN_TRANSIT),
+}
+
+
+def queue_queryset(queue, branch):
+    field, current_status = QUEUES[queue]
+    return Shipment.objects.filter(
+        **{field: branch, 'current_status': current_status}
+    ).order_by('created_at', 'id')
+
+
+def branch_queue(request, queue):
+    org = getattr(request, 'organization', None)
+    branch = getattr(request, 'branch', None)
+    try:
+        fields = shipment_fields(request)
+    except FieldsetError as e:
+        return response(status.HTTP_400_BAD_REQUEST, str(e))
+    if branch is None:
+        # Organization admins pick the branch whose queue they want to see
+        slug = request.query_params.get('branch')
+        if not slug:
+            return response(status.HTTP_400_BAD_REQUEST, "Query parameter 'branch' is required")
+        branch = resolve_branch(org, slug)
+        if branch is None:
+            return response(status.HTTP_404_NOT_FOUND, "Branch not found")
+
+    data = representations.shipment_list_data(queue_queryset(queue, branch), fields)
+    return response(status.HTTP_200_OK, "Queue fetched successfully", data=data)
+
+@swagger_auto_schema(
+    method='get',
+    manual_parameters=FIELDSET_PARAMETERS,
+    responses={200: ShipmentSerializer(many=True)},
+    operation_description=(
+        "Shipments booked at the branch and waiting to be dispatched, oldest first. "
+        "Organization admins pass ?branch=<slug>."
+    ),
+    security=[{'Bearer': []}]
+)
+@api_view(['GET'])
+@authentication_classes([VyahanJWTAuthentication])
+@permission_classes([IsOrganizationSet])
+def awaiting_dispatch(request):
+    return branch_queue(request, 'dispatch')
+
+@swagger_auto_schema(
+    method='get',
+    manual_parameters=FIELDSET_PARAMETERS,
+    responses={200: ShipmentSerializer(many=True)},
+    operation_description=(
+        "Shipments in transit to the branch, oldest first. "
+        "Organization admins pass ?branch=<slug>."
+    ),
+    security=[{'Bearer': []}]
+)
+@api_view(['GET'])
+@authentication_classes([VyahanJWTAuthentication])
+@permission_classes([IsOrganizationSet])
+def awaiting_arrival(request):
+    return branch_queue(request, 'arrival')
+
+@swagger_auto_schema(
+    method='get',
+    manual_parameters=[
+        openapi.Parameter('q', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True,
+                          description="Tracking ID, name, phone number or description text (3+ characters)"),
+        openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                          description=f"Maximum results (default {search.DEFAULT_LIMIT}, max {search.MAX_LIMIT})"),
+        *FIELDSET_PARAMETERS,
+    ],
+    responses={200: ShipmentSerializer(many=True)},
+    operation_description="Search shipments, best match first. Branch managers only see their related shipments.",
+    security=[{'Bearer': []}]
+)
+@api_view(['GET'])
+@authentication_classes([VyahanJWTAuthentication])
+@permission_classes([IsOrganizationSet])
+def search_shipments(request):
+    org = getattr(request, 'organization', None)
+    branch = getattr(request, 'branch', None)
+
+    terms = search.parse_terms(request.query_params.get('q', ''))
+    if not terms:
+        return response(
+            status.HTTP_400_BAD_REQUEST, f"Search query must contain a term of at least {search.MIN_TERM_LENGTH} characters"
+        )
+    try:
+        limit = min(int(request.query_params.get('limit', search.DEFAULT_LIMIT)), search.MAX_LIMIT)
+    except ValueError:
+        return response(status.HTTP_400_BAD_REQUEST, "Invalid limit")
+    try:
+        fields = shipment_fields(request)
+    except FieldsetError as e:
+        return response(status.HTTP_400_BAD_REQUEST, str(e))
+
+    ids = search.search_ids(org, terms, branch=branch, limit=max(limit, 1))
+    rows = {row['id']: row for row in representations.shipment_rows(Shipment.objects.filter(id__in=ids), fields)}
+    data = representations.rows_data([rows[pk] for pk in ids if pk in rows], fields)
+    return response(status.HTTP_200_OK, "Search results fetched successfully", data=data)
+
+@swagger_auto_schema(
+    method='get',
+    manual_parameters=FIELDSET_PARAMETERS,
     responses={200: ShipmentSerializer},
     operation_description="Retrieve a specific shipment for admin/internal view.",
     security=[{'Bearer': []}]
@@ -115,25 +315,30 @@ def list_shipments(request):
 @permission_classes([IsOrganizationSet])
 def retrieve_shipment(request, tracking_id):
     org = getattr(request, 'organization', None)
-    
     try:
-        shipment = Shipment.objects.get(tracking_id=tracking_id, organization=org)
-    except Shipment.DoesNotExist:
+        fields = shipment_fields(request)
+    except FieldsetError as e:
+        return response(status.HTTP_400_BAD_REQUEST, str(e))
+    
+    rows = representations.shipment_rows(Shipment.objects.filter(tracking_id=tracking_id, organization=org), fields)
+    if not rows:
         return response(status.HTTP_404_NOT_FOUND, "Shipment not found")
+    shipment = rows[0]
     
     # Optional: Check branch permissions if we want to restrict branch managers to only their shipments
     # For now, assuming org-wide visibility for internal authenticated users is acceptable or handled by frontend filtering
     # But strictly, we should probably check:
     branch = getattr(request, 'branch', None)
     if branch:
-        if shipment.source_branch != branch and shipment.destination_branch != branch:
+        if shipment['source_branch_id'] != branch.id and shipment['destination_branch_id'] != branch.id:
              return response(status.HTTP_403_FORBIDDEN, "You do not have access to this shipment")
 
-    serializer = ShipmentSerializer(shipment)
-    return response(status.HTTP_200_OK, "Shipment fetched successfully", data=serializer.data)
+    data = representations.rows_data(rows, fields)[0]
+    return response(status.HTTP_200_OK, "Shipment fetched successfully", data=data)
 
 @swagger_auto_schema(
     method='patch',
+    manual_parameters=[IDEMPOTENCY_KEY_HEADER],
     responses={200: ShipmentSerializer},
     operation_description="Update shipment status. Requires Branch authentication.",
     security=[{'Bearer': []}]
@@ -141,12 +346,15 @@ def retrieve_shipment(request, tracking_id):
 @api_view(['PATCH'])
 @authentication_classes([VyahanJWTAuthentication])
 @permission_classes([IsOrganizationSet])
+@idempotent
 def update_shipment_status(request, tracking_id):
     org = getattr(request, 'organization', None)
     branch = getattr(request, 'branch', None)
     
     try:
-        shipment = Shipment.objects.get(tracking_id=tracking_id, organization=org)
+        shipment = Shipment.objects.select_related(
+            'organization', 'source_branch', 'destination_branch'
+        ).get(tracking_id=tracking_id, organization=org)
     except Shipment.DoesNotExist:
         return response(status.HTTP_404_NOT_FOUND, "Shipment not found")
     
@@ -156,41 +364,123 @@ def update_shipment_status(request, tracking_id):
     if new_status not in ShipmentStatus.values:
         return response(status.HTTP_400_BAD_REQUEST, "Invalid status")
     
-    # Update status
-    shipment.current_status = new_status
-    shipment.save()
-    
-    # Create history entry
-    ShipmentHistory.objects.create(
-        shipment=shipment,
-        status=new_status,
-        location=branch.title,
-        remarks=remarks
-    )
+    with transaction.atomic():
+        # Update status
+        shipment.current_status = new_status
+        shipment.save()
+        
+        # Create history entry
+        ShipmentHistory.objects.create(
+            shipment=shipment,
+            organization_id=shipment.organization_id,
+            branch=branch,
+            status=new_status,
+            location=branch.title,
+            remarks=remarks
+        )
+        
+        record_event(shipment, new_status, location=branch.title, payload={'remarks': remarks})
     
     serializer = ShipmentSerializer(shipment)
     return response(status.HTTP_200_OK, f"Status updated to {new_status}", data=serializer.data)
 
 @swagger_auto_schema(
     method='get',
+    manual_parameters=FIELDSET_PARAMETERS,
     responses={200: ShipmentSerializer},
-    operation_description="Track a shipment publicly."
+    operation_description="Track a shipment publicly, on the organization's subdomain."
 )
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def track_shipment(request, tracking_id):
-    org = getattr(request, 'organization', None) # Still want to scope it to the org if possible
+    org = getattr(request, 'organization', None)
+    if not org:
+        # Tracking is public but always per organization (subdomain), never a global lookup
+        return response(status.HTTP_404_NOT_FOUND, "Shipment not found")
+    try:
+        fields = shipment_fields(request)
+    except FieldsetError as e:
+        return response(status.HTTP_400_BAD_REQUEST, str(e))
     
     try:
-        # We allow public tracking even if org isn't set via subdomain if we want, 
-        # but better to scope it.
-        query = Shipment.objects.filter(tracking_id=tracking_id)
-        if org:
-            query = query.filter(organization=org)
-            
-        shipment = query.get()
+        query = Shipment.objects.filter(tracking_id=tracking_id, organization=org)
+        data = representations.shipment_detail_data(query, fields)
     except Shipment.DoesNotExist:
         return response(status.HTTP_404_NOT_FOUND, "Shipment not found")
         
-    serializer = ShipmentSerializer(shipment)
-    return response(status.HTTP_200_OK, "Tracking info fetched", data=serializer.data)
+    return response(status.HTTP_200_OK, "Tracking info fetched", data=data)
+
+def sync_result(client_id, result, shipment=None, errors=None):
+    item = {
+        'client_id': str(client_id) if client_id is not None else None,
+        'result': result,
+        'tracking_id': shipment.tracking_id if shipment is not None else None,
+    }
+    if errors:
+        item['errors'] = errors
+    return item
+
+@swagger_auto_schema(
+    method='post',
+    request_body=SyncRequestSerializer,
+    responses={200: SyncResponseSerializer},
+    operation_description=(
+        "Offline sync for branch terminals. Uploads bookings and status scans made offline "
+        "(identified by client-generated UUIDs, so re-uploads are harmless) and returns the "
+        "branch's shipments changed since `cursor`. Status conflicts resolve to the furthest "
+        "status in the lifecycle. Requires Branch authentication."
+    ),
+    security=[{'Bearer': []}]
+)
+@api_view(['POST'])
+@authentication_classes([VyahanJWTAuthentication])
+@permission_classes([IsOrganizationSet])
+def sync_shipments(request):
+    org = getattr(request, 'organization', None)
+    branch = getattr(request, 'branch', None)
+    if not org or not branch:
+        return response(status.HTTP_401_UNAUTHORIZED, "Organization or Branch context missing")
+
+    serializer = SyncRequestSerializer(data=request.data)
+    if not serializer.is_valid():
+        return response(status.HTTP_400_BAD_REQUEST, "Invalid data", error=serializer.errors)
+    payload = serializer.validated_data
+    if len(payload['shipments']) + len(payload['events']) > settings.SYNC_MAX_UPLOAD:
+        return response(status.HTTP_400_BAD_REQUEST, f"At most {settings.SYNC_MAX_UPLOAD} items per sync")
+
+    # Validate items one by one so a bad item doesn't hold back the rest of the batch
+    destinations = resolve_branches(org, [
+        raw['destination_branch'] for raw in payload['shipments']
+        if isinstance(raw.get('destination_branch'), str)
+    ])
+    context = {'organization': org, 'branches': destinations}
+    bookings = [SyncBookingSerializer(data=raw, context=context) for raw in payload['shipments']]
+    changes = [SyncStatusChangeSerializer(data=raw) for raw in payload['events']]
+    valid_bookings = [item.validated_data for item in bookings if item.is_valid()]
+    valid_changes = [item.validated_data for item in changes if item.is_valid()]
+
+    booked, changed = sync.apply_upload(org, branch, valid_bookings, valid_changes)
+
+    booking_results = [
+        sync_result(item.validated_data['client_id'], *booked[item.validated_data['client_id']])
+        if not item.errors else
+        sync_result(item.initial_data.get('client_id'), sync.REJECTED, errors=item.errors)
+        for item in bookings
+    ]
+    event_results = [
+        sync_result(item.validated_data['client_id'], *changed[item.validated_data['client_id']])
+        if not item.errors else
+        sync_result(item.initial_data.get('client_id'), sync.REJECTED, errors=item.errors)
+        for item in changes
+    ]
+
+    shipment_ids, cursor, has_more = sync.changes_since(org, branch, payload['cursor'])
+    shipments = shipment_queryset().in_bulk(shipment_ids)
+    data = {
+        'cursor': cursor,
+        'has_more': has_more,
+        'shipments': ShipmentSerializer([shipments[pk] for pk in shipment_ids if pk in shipments], many=True).data,
+        'booking_results': booking_results,
+        'event_results': event_results,
+    }
+    return response(status.HTTP_200_OK, "Sync completed", data=data)
@@ -1,7 +1,21 @@
+import heapq
+import logging
+import re
+import time
+from django.conf import settings
+from django.db import connection
+from django.utils.cache import patch_vary_headers
 from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_string
 from django.contrib.sessions.middleware import SessionMiddleware
 from django.contrib.auth.middleware import AuthenticationMiddleware
 from django.contrib.messages.middleware import MessageMiddleware
+from core import metrics
+
+try:
+    import brotli  # optional, `pip install brotli`
+except ImportError:
+    brotli = None
 
 class AdminOnlyMiddleware(MiddlewareMixin):
     ADMIN_PATH = "/vyahan-be@admin.private/"
@@ -30,4 +44,144 @@ class AdminOnlyMiddleware(MiddlewareMixin):
             response = self.session_middleware.process_response(request, response)
             response = self.message_middleware.process_response(request, response)  # AuthenticationMiddleware has no process_response
         
-        return response
\ No newline at end of file
+        return response
+
+
+slow_request_logger = logging.getLogger('vyahan.slow_requests')
+
+
+class QueryRecorder:
+    """connection.execute_wrapper that counts and times queries, keeping the slowest few."""
+
+    def __init__(self, keep):
+        self.keep = keep
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.duration += elapsed
+            if self.keep:
+                entry = (elapsed, self.count, sql)
+                if len(self.slowest) < self.keep:
+                    heapq.heappush(self.slowest, entry)
+                else:
+                    heapq.heappushpop(self.slowest, entry)
+
+
+class RequestMetricsMiddleware:
+    """
+    Records per-view latency, query count/time, response size and auth time
+    into core.metrics, and logs requests slower than METRICS_SLOW_REQUEST_MS
+    together with their slowest SQL statements.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder(keep=settings.METRICS_SLOW_REQUEST_QUERIES)
+        start = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name or match.url_name) if match else '<unmatched>'
+        metrics.REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+        metrics.REQUEST_LATENCY.observe(elapsed, view=view, method=request.method)
+        metrics.DB_QUERIES.observe(recorder.count, view=view)
+        metrics.DB_TIME.observe(recorder.duration, view=view)
+        if not response.streaming:
+            metrics.RESPONSE_SIZE.observe(len(response.content), view=view)
+        auth_duration = getattr(request, 'auth_duration', None)
+        if auth_duration is not None:
+            metrics.AUTH_TIME.observe(auth_duration, view=view)
+
+        if elapsed * 1000 >= settings.METRICS_SLOW_REQUEST_MS:
+            worst = sorted(recorder.slowest, reverse=True)
+            slow_request_logger.warning(
+                "Slow request %s %s (%s): %.1fms, %d queries in %.1fms\n%s",
+                request.method, request.path, view, elapsed * 1000, recorder.count, recorder.duration * 1000,
+                '\n'.join(f"  {duration * 1000:.1f}ms: {sql}" for duration, _, sql in worst),
+            )
+        return response
+
+
+QVALUE_RE = re.compile(r'\bq\s*=\s*([0-9.]+)')
+
+
+def accepted_encodings(header):
+    """{coding: q} from an Accept-Encoding header; codings with q=0 are left out."""
+    accepted = {}
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        match = QVALUE_RE.search(params)
+        if match:
+            try:
+                q = float(match.group(1))
+            except ValueError:
+                continue
+        if q > 0:
+            accepted[coding] = q
+    return accepted
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses of at least RESPONSE_COMPRESSION_MIN_BYTES with
+    brotli (when installed) or gzip, whichever the client prefers. Small
+    bodies are sent as-is since the encoding overhead outweighs the saving.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def choose_encoding(self, request):
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        wildcard = accepted.get('*', 0)
+        candidates = ['br', 'gzip'] if brotli is not None else ['gzip']
+        best, best_q = None, 0
+        for coding in candidates:
+            q = accepted.get(coding, wildcard)
+            if q > best_q:
+                best, best_q = coding, q
+        return best
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if len(response.content) < settings.RESPONSE_COMPRESSION_MIN_BYTES:
+            return response
+        # Cacheable responses vary on Accept-Encoding whatever this client sent
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        encoding = self.choose_encoding(request)
+        if encoding == 'br':
+            compressed = brotli.compress(response.content, quality=settings.RESPONSE_COMPRESSION_BROTLI_QUALITY)
+        elif encoding == 'gzip':
+            compressed = compress_string(response.content)
+        else:
+            return response
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        # The representation changed, so a strong ETag no longer matches it byte for byte
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
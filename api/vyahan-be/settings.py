@@ -11,6 +11,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -50,10 +51,14 @@ INSTALLED_APPS = [
     'rest_framework_simplejwt.token_blacklist',
     'drf_yasg',
     'organization',
-    'shipment'
+    'shipment',
+    'webhook',
+    'analytics',
 ]
 
 MIDDLEWARE = [
+    "vyahan-be.requestMiddleware.RequestMetricsMiddleware",
+    "vyahan-be.requestMiddleware.CompressionMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -103,6 +108,29 @@ DATABASES = {
 }
 
 
+# Cache
+# Holds the organization directory served by the health check. Set REDIS_URL
+# (e.g. redis://localhost:6379/0) in production so directory invalidations reach
+# every worker process. Without it each process has its own in-memory cache.
+REDIS_URL = os.environ.get('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+# Seconds a directory version is trusted. A per-process cache never hears about
+# changes made by other workers, so it rechecks every few seconds.
+DIRECTORY_VERSION_TIMEOUT = None if REDIS_URL else 5
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -122,6 +150,24 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing for organization/branch logins.
+# Stored hashes using another hasher or other parameters are upgraded on the next login.
+# Listed unconditionally (argon2-cffi is pinned in requirements.txt) so every host
+# can verify every stored hash.
+PASSWORD_HASHERS = [
+    'core.hashers.TunedArgon2PasswordHasher',
+    'core.hashers.TunedScryptPasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+
+PASSWORD_HASHER_ARGON2 = {'time_cost': 2, 'memory_cost': 19456, 'parallelism': 1}
+PASSWORD_HASHER_SCRYPT = {'work_factor': 2 ** 14, 'block_size': 8, 'parallelism': 1}
+# Successful verifications are remembered (as keyed digests) for this long. 0 disables.
+PASSWORD_VERIFY_CACHE_SECONDS = 300
+PASSWORD_VERIFY_CACHE_SIZE = 10000
+
+
 SWAGGER_SETTINGS = {
     'USE_SESSION_AUTH': True,
     'SECURITY_DEFINITIONS': {
@@ -147,6 +193,11 @@ REST_FRAMEWORK = {
         # This prevents SessionAuthentication from enforcing CSRF checks
     ),
     'EXCEPTION_HANDLER': 'core.utils.custom_exception_handler',
+    # orjson-backed (pinned in requirements.txt); falls back to json with the same output
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
 SIMPLE_JWT = {
@@ -157,6 +208,103 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
 }
 
+# Branch device sessions (branch login with a device_id)
+# Absolute lifetime of a device session token.
+DEVICE_SESSION_MAX_LIFETIME = timedelta(days=30)
+# Sliding expiry: a device idle for longer than this must log in again.
+DEVICE_SESSION_IDLE_TIMEOUT = timedelta(hours=24)
+# How often last-seen is written back while a device is active.
+DEVICE_SESSION_TOUCH_INTERVAL = timedelta(minutes=5)
+# How often each process reloads revoked sessions and re-reads active ones.
+DEVICE_REVOCATION_REFRESH_SECONDS = 60
+
+
+# SMS notifications
+# Public tracking page linked from notification messages.
+NOTIFICATION_TRACKING_URL = 'http://localhost:3000/track/{tracking_id}'
+# Locale used when an organization doesn't set metadata['locale'].
+NOTIFICATION_DEFAULT_LOCALE = 'en'
+
+
+# Shipment event outbox
+# Events per consumer batch when draining the outbox.
+SHIPMENT_EVENTS_BATCH_SIZE = 100
+# Drain the outbox right after each commit, inside the request. Development only:
+# consumers run while holding their offset row lock, so this is ignored unless
+# DEBUG is on. In production run `manage.py dispatch_shipment_events --loop`.
+SHIPMENT_EVENTS_INLINE_DISPATCH = DEBUG
+# Only deliver events older than this. Ids are assigned at insert, not commit, so
+# without a settle window a consumer can move its offset past an id whose
+# transaction commits later and skip it for good. Inline dispatch doesn't wait.
+SHIPMENT_EVENTS_SETTLE_SECONDS = 2
+
+
+# Outbound webhooks
+# Events batched into a single POST to a subscriber.
+WEBHOOK_MAX_EVENTS_PER_DELIVERY = 50
+WEBHOOK_TIMEOUT_SECONDS = 10
+# Retry schedule: base * 2^(attempt - 1) seconds, capped, then dead-lettered.
+WEBHOOK_MAX_ATTEMPTS = 8
+WEBHOOK_BACKOFF_BASE_SECONDS = 30
+WEBHOOK_BACKOFF_MAX_SECONDS = 6 * 60 * 60
+# Subscriber URLs must use https, except in development.
+WEBHOOK_REQUIRE_HTTPS = not DEBUG
+# Deliveries to loopback, private, link-local (cloud metadata) and other
+# non-public addresses are refused unless this is on.
+WEBHOOK_ALLOW_PRIVATE_ADDRESSES = False
+
+
+# Idempotency-Key header on booking and status updates
+# How long a stored response is replayed for retries with the same key.
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+# A claimed key whose request never completed is released after this.
+IDEMPOTENCY_KEY_LOCK_TIMEOUT = timedelta(seconds=60)
+
+# Offline sync for branch terminals
+# Bookings plus status changes accepted in one upload.
+SYNC_MAX_UPLOAD = 500
+# Outbox events scanned per download page (see has_more in the response).
+SYNC_PAGE_SIZE = 500
+
+# Changes feed (/api/shipment/changes/)
+# Shipments (and deletions) returned per page.
+CHANGES_FEED_PAGE_SIZE = 200
+# Deleted shipment tombstones are kept this long; older cursors must resync.
+CHANGES_TOMBSTONE_RETENTION = timedelta(days=30)
+# Only return shipments updated at least this long ago: updated_at is stamped
+# before commit, so a row committing out of order could land behind a cursor
+# already handed out. Keep it above the longest write transaction.
+CHANGES_FEED_SETTLE_SECONDS = 2
+
+# Branch activity feed (/api/shipment/activity/)
+# Status changes returned per page.
+BRANCH_ACTIVITY_PAGE_SIZE = 100
+
+# Deleted (deactivated) branches
+# purge_inactive_branches removes branches deactivated longer ago than this,
+# together with their shipments.
+BRANCH_PURGE_AFTER = timedelta(days=90)
+
+# Lane transit times
+# How often each process reloads lane percentiles used for ETAs.
+LANE_ETA_REFRESH_SECONDS = 300
+# Lanes with fewer arrivals than this get no ETA and are never flagged late.
+LANE_ETA_MIN_SAMPLES = 5
+
+# Request metrics (exposed at /api/metrics/ in Prometheus text format)
+# Requests slower than this are logged to 'vyahan.slow_requests' with their worst SQL.
+METRICS_SLOW_REQUEST_MS = 500
+METRICS_SLOW_REQUEST_QUERIES = 3
+# Bearer token required to scrape /api/metrics/. While it is empty the endpoint
+# answers 401, unless DEBUG is on.
+METRICS_AUTH_TOKEN = ''
+
+# Response compression: brotli (pinned in requirements.txt) when accepted, else gzip.
+# Smaller bodies are sent uncompressed.
+RESPONSE_COMPRESSION_MIN_BYTES = 1024
+# 0-11; low qualities are much faster and still beat gzip on repetitive JSON.
+RESPONSE_COMPRESSION_BROTLI_QUALITY = 4
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
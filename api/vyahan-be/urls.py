@@ -21,6 +21,7 @@ from django.urls import path, include
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
+from core.views import metrics
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
@@ -43,8 +44,11 @@ urlpatterns = [
     path('api/auth/', include('core.urls')),
     path('api/organization/', include('organization.urls')),
     path('api/shipment/', include('shipment.urls')),
+    path('api/webhook/', include('webhook.urls')),
+    path('api/analytics/', include('analytics.urls')),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('api/metrics/', metrics, name='metrics'),
     path('api/swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path('api/redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
 ]
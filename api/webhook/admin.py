@@ -0,0 +1,11 @@
+from django.contrib import admin
+from .models import WebhookSubscription, WebhookDelivery, WebhookDeadLetter
+# Register your models here.
+
+
+class WebhookSubscriptionAdmin(admin.ModelAdmin):
+    readonly_fields = ('secret', 'slug')
+
+admin.site.register(WebhookSubscription, WebhookSubscriptionAdmin)
+admin.site.register(WebhookDelivery)
+admin.site.register(WebhookDeadLetter)
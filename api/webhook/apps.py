@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class WebhookConfig(AppConfig):
+    name = 'webhook'
+
+    def ready(self):
+        from . import consumers  # noqa: F401 - registers the outbox consumer
@@ -0,0 +1,7 @@
+from shipment.events import register_consumer
+from .delivery import enqueue_events
+
+
+@register_consumer('webhooks')
+def enqueue_webhook_deliveries(events):
+    enqueue_events(events)
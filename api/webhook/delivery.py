@@ -0,0 +1,214 @@
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import socket
+import time
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from .models import WebhookSubscription, WebhookDelivery, WebhookDeadLetter, DeliveryStatus
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = 'X-Vyahan-Signature'
+TIMESTAMP_HEADER = 'X-Vyahan-Timestamp'
+
+_session = None
+
+
+def get_session():
+    """Shared HTTP session so deliveries to the same host reuse connections."""
+    global _session
+    if _session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update({'Content-Type': 'application/json', 'User-Agent': 'Vyahan-Webhooks/1.0'})
+        _session = session
+    return _session
+
+
+class UnsafeTarget(ValueError):
+    pass
+
+
+def check_target(url):
+    """
+    Raises UnsafeTarget unless `url` may receive deliveries: https (outside
+    development) and resolving only to public addresses, so subscriptions
+    can't make the worker call internal services.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise UnsafeTarget("Webhook URL must be an http(s) URL")
+    if settings.WEBHOOK_REQUIRE_HTTPS and parts.scheme != 'https':
+        raise UnsafeTarget("Webhook URL must use https")
+    if settings.WEBHOOK_ALLOW_PRIVATE_ADDRESSES:
+        return
+    try:
+        infos = socket.getaddrinfo(parts.hostname, parts.port or 443, proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, UnicodeError) as e:
+        raise UnsafeTarget(f"Cannot resolve webhook host '{parts.hostname}'") from e
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split('%')[0])
+        if isinstance(address, ipaddress.IPv6Address) and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            raise UnsafeTarget(f"Webhook host '{parts.hostname}' resolves to a non-public address")
+
+
+def sign(secret, timestamp, body):
+    """HMAC-SHA256 over '<timestamp>.<body>', hex encoded."""
+    message = f"{timestamp}.".encode() + body
+    return hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+def serialize_event(event):
+    return {
+        'id': event.id,
+        'type': event.event_type,
+        'tracking_id': event.payload.get('tracking_id'),
+        'status': event.payload.get('status'),
+        'location': event.location,
+        'remarks': event.payload.get('remarks'),
+        'created_at': event.created_at,
+    }
+
+
+def enqueue_events(events):
+    """
+    Fans a batch of outbox events out into WebhookDelivery rows, one per
+    subscription and at most WEBHOOK_MAX_EVENTS_PER_DELIVERY events each.
+    """
+    org_ids = {event.organization_id for event in events}
+    subscriptions = WebhookSubscription.objects.filter(organization_id__in=org_ids, is_active=True)
+    now = timezone.now()
+    chunk = settings.WEBHOOK_MAX_EVENTS_PER_DELIVERY
+
+    deliveries = []
+    for subscription in subscriptions:
+        matching = [
+            serialize_event(event) for event in events
+            if event.organization_id == subscription.organization_id and subscription.accepts(event.event_type)
+        ]
+        for start in range(0, len(matching), chunk):
+            payload = json.loads(json.dumps({'events': matching[start:start + chunk]}, cls=DjangoJSONEncoder))
+            deliveries.append(WebhookDelivery(subscription=subscription, payload=payload, next_attempt_at=now))
+    WebhookDelivery.objects.bulk_create(deliveries)
+    return len(deliveries)
+
+
+def backoff(attempts):
+    """Seconds to wait before the next attempt: base * 2^(attempts - 1), capped."""
+    delay = settings.WEBHOOK_BACKOFF_BASE_SECONDS * (2 ** max(attempts - 1, 0))
+    return min(delay, settings.WEBHOOK_BACKOFF_MAX_SECONDS)
+
+
+def send(delivery):
+    """
+    POSTs one delivery. Returns None on success or an error message.
+    """
+    body = json.dumps(delivery.payload, separators=(',', ':')).encode()
+    timestamp = str(int(time.time()))
+    headers = {
+        TIMESTAMP_HEADER: timestamp,
+        SIGNATURE_HEADER: f"sha256={sign(delivery.subscription.secret, timestamp, body)}",
+    }
+    try:
+        # Checked on every attempt: DNS may have changed since the subscription was created
+        check_target(delivery.subscription.url)
+    except UnsafeTarget as e:
+        return str(e)
+    try:
+        # No redirects: a public endpoint could otherwise bounce the request inward
+        resp = get_session().post(
+            delivery.subscription.url, data=body, headers=headers, timeout=settings.WEBHOOK_TIMEOUT_SECONDS,
+            allow_redirects=False,
+        )
+    except requests.RequestException as e:
+        return str(e)
+    if 200 <= resp.status_code < 300:
+        return None
+    return f"HTTP {resp.status_code}: {resp.text[:500]}"
+
+
+def record_result(delivery, error):
+    now = timezone.now()
+    delivery.attempts += 1
+    if error is None:
+        delivery.status = DeliveryStatus.DELIVERED
+        delivery.delivered_at = now
+        delivery.last_error = None
+        delivery.save(update_fields=['status', 'attempts', 'delivered_at', 'last_error'])
+        return
+
+    logger.warning(f"Webhook delivery #{delivery.id} to {delivery.subscription.url} failed: {error}")
+    if delivery.attempts >= settings.WEBHOOK_MAX_ATTEMPTS:
+        with transaction.atomic():
+            WebhookDeadLetter.objects.create(
+                subscription=delivery.subscription,
+                payload=delivery.payload,
+                attempts=delivery.attempts,
+                last_error=error,
+                created_at=delivery.created_at,
+            )
+            delivery.delete()
+        return
+
+    delivery.last_error = error
+    delivery.next_attempt_at = now + timedelta(seconds=backoff(delivery.attempts))
+    delivery.save(update_fields=['attempts', 'last_error', 'next_attempt_at'])
+
+
+def lease_seconds(count):
+    """
+    How long a claim of `count` deliveries is held: they are sent one after
+    another, each taking up to a connect and a read timeout, plus one more
+    send as a margin.
+    """
+    return (count + 1) * settings.WEBHOOK_TIMEOUT_SECONDS * 2
+
+
+def claim_due(limit):
+    """
+    Leases up to `limit` due deliveries by pushing their next_attempt_at past
+    the time it takes to send all of them, so concurrent workers don't send
+    any of the batch again. Deliveries of a worker that dies are retried once
+    the lease runs out.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            WebhookDelivery.objects.select_for_update(skip_locked=True)
+            .filter(status=DeliveryStatus.PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at')
+            .values_list('id', flat=True)[:limit]
+        )
+        lease_until = now + timedelta(seconds=lease_seconds(len(ids)))
+        WebhookDelivery.objects.filter(id__in=ids).update(next_attempt_at=lease_until)
+    return list(WebhookDelivery.objects.filter(id__in=ids).select_related('subscription').order_by('id'))
+
+
+def deliver_due(limit=100):
+    """
+    Sends every due delivery once. Returns (delivered, failed) counts.
+    """
+    delivered = failed = 0
+    for delivery in claim_due(limit):
+        error = send(delivery)
+        record_result(delivery, error)
+        if error is None:
+            delivered += 1
+        else:
+            failed += 1
+    return delivered, failed
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from webhook.delivery import deliver_due
+
+
+class Command(BaseCommand):
+    help = "Send due webhook deliveries, retrying failures with exponential backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=100, help="Deliveries to send per pass.")
+        parser.add_argument('--loop', action='store_true', help="Keep polling instead of exiting when drained.")
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds between polls with --loop.")
+
+    def handle(self, *args, **options):
+        while True:
+            delivered, failed = deliver_due(limit=options['limit'])
+            if delivered or failed:
+                self.stdout.write(f"delivered {delivered}, failed {failed}")
+            if not options['loop']:
+                break
+            if not (delivered or failed):
+                time.sleep(options['interval'])
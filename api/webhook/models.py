@@ -0,0 +1,64 @@
+import secrets
+
+from django.db import models
+from core.models import BaseModel
+from organization.models import Organization
+
+
+def generate_webhook_secret():
+    return secrets.token_hex(32)
+
+
+class WebhookSubscription(BaseModel):
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='webhook_subscriptions')
+    url = models.URLField(max_length=500)
+    secret = models.CharField(max_length=64, default=generate_webhook_secret)
+    # Shipment statuses to deliver. Empty means every event.
+    event_types = models.JSONField(default=list, blank=True)
+    description = models.TextField(null=True, blank=True)
+    is_active = models.BooleanField(default=True)
+
+    def accepts(self, event_type):
+        return not self.event_types or event_type in self.event_types
+
+    def __str__(self):
+        return f"{self.url} - {self.organization.title}"
+
+
+class DeliveryStatus(models.TextChoices):
+    PENDING = 'PENDING', 'Pending'
+    DELIVERED = 'DELIVERED', 'Delivered'
+
+
+class WebhookDelivery(models.Model):
+    """A batch of events waiting to be POSTed to one subscription."""
+    subscription = models.ForeignKey(WebhookSubscription, on_delete=models.CASCADE, related_name='deliveries')
+    payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=DeliveryStatus.choices, default=DeliveryStatus.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField()
+    last_error = models.TextField(null=True, blank=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = "Webhook Deliveries"
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='webhook_delivery_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"Delivery #{self.id} to {self.subscription.url} ({self.status})"
+
+
+class WebhookDeadLetter(models.Model):
+    """A delivery that exhausted its retries, kept for inspection and replay."""
+    subscription = models.ForeignKey(WebhookSubscription, on_delete=models.CASCADE, related_name='dead_letters')
+    payload = models.JSONField()
+    attempts = models.PositiveIntegerField()
+    last_error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    failed_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Dead letter #{self.id} for {self.subscription.url}"
@@ -0,0 +1,41 @@
+from rest_framework import serializers
+from shipment.models import ShipmentStatus
+from .delivery import UnsafeTarget, check_target
+from .models import WebhookSubscription, WebhookDeadLetter
+
+
+class WebhookSubscriptionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = WebhookSubscription
+        fields = ['slug', 'url', 'event_types', 'description', 'is_active', 'created_at']
+
+
+class WebhookSubscriptionCreateSerializer(serializers.ModelSerializer):
+    event_types = serializers.ListField(
+        child=serializers.ChoiceField(choices=ShipmentStatus.choices), required=False, default=list
+    )
+
+    class Meta:
+        model = WebhookSubscription
+        fields = ['url', 'event_types', 'description']
+
+    def validate_url(self, value):
+        try:
+            check_target(value)
+        except UnsafeTarget as e:
+            raise serializers.ValidationError(str(e))
+        return value
+
+
+class WebhookSubscriptionSecretSerializer(WebhookSubscriptionSerializer):
+    """Returned once on creation so the integrator can verify signatures."""
+    class Meta(WebhookSubscriptionSerializer.Meta):
+        fields = WebhookSubscriptionSerializer.Meta.fields + ['secret']
+
+
+class WebhookDeadLetterSerializer(serializers.ModelSerializer):
+    subscription = serializers.SlugRelatedField(slug_field='slug', read_only=True)
+
+    class Meta:
+        model = WebhookDeadLetter
+        fields = ['id', 'subscription', 'payload', 'attempts', 'last_error', 'created_at', 'failed_at']
@@ -0,0 +1,149 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from organization.models import Organization, Branch
+from shipment.models import Shipment, ShipmentStatus
+from shipment.events import record_event
+from .delivery import enqueue_events, deliver_due, claim_due, sign, check_target, UnsafeTarget, SIGNATURE_HEADER, TIMESTAMP_HEADER
+from .models import WebhookSubscription, WebhookDelivery, WebhookDeadLetter, DeliveryStatus
+
+
+class StubReceiver(BaseHTTPRequestHandler):
+    """Local HTTP endpoint that records requests and replies with a configurable status."""
+    received = []
+    status_code = 200
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        StubReceiver.received.append((dict(self.headers), body))
+        self.send_response(StubReceiver.status_code)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(
+    WEBHOOK_MAX_EVENTS_PER_DELIVERY=2, WEBHOOK_MAX_ATTEMPTS=2, WEBHOOK_TIMEOUT_SECONDS=2,
+    WEBHOOK_ALLOW_PRIVATE_ADDRESSES=True, WEBHOOK_REQUIRE_HTTPS=False,
+)
+class WebhookDeliveryTests(TestCase):
+    """Test batching, signing, retries and dead-lettering against a local stub."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = HTTPServer(('127.0.0.1', 0), StubReceiver)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        StubReceiver.received = []
+        StubReceiver.status_code = 200
+        self.org = Organization.objects.create(title="Test Organization", subdomain="test", password="TestPassword123")
+        self.branch = Branch.objects.create(organization=self.org, title="Surat", password="BranchPassword123")
+        self.subscription = WebhookSubscription.objects.create(
+            organization=self.org,
+            url=f"http://127.0.0.1:{self.server.server_port}/hook",
+            event_types=[ShipmentStatus.BOOKED, ShipmentStatus.DELIVERED],
+        )
+        self.shipment = Shipment.objects.create(
+            organization=self.org,
+            source_branch=self.branch,
+            destination_branch=self.branch,
+            sender_name="Asha",
+            sender_phone="9000000001",
+            receiver_name="Ravi",
+            receiver_phone="9000000002",
+            price="150.00",
+        )
+
+    def test_events_batched_and_signed(self):
+        events = [
+            record_event(self.shipment, ShipmentStatus.BOOKED),
+            record_event(self.shipment, ShipmentStatus.IN_TRANSIT),
+            record_event(self.shipment, ShipmentStatus.DELIVERED),
+        ]
+        # IN_TRANSIT is filtered out, the remaining two fit into one delivery
+        self.assertEqual(enqueue_events(events), 1)
+        self.assertEqual(deliver_due(), (1, 0))
+
+        headers, body = StubReceiver.received[0]
+        payload = json.loads(body)
+        self.assertEqual([e['type'] for e in payload['events']], ['BOOKED', 'DELIVERED'])
+        expected = sign(self.subscription.secret, headers[TIMESTAMP_HEADER], body)
+        self.assertEqual(headers[SIGNATURE_HEADER], f"sha256={expected}")
+        self.assertEqual(WebhookDelivery.objects.get().status, DeliveryStatus.DELIVERED)
+
+    def test_failures_back_off_then_dead_letter(self):
+        StubReceiver.status_code = 500
+        enqueue_events([record_event(self.shipment, ShipmentStatus.BOOKED)])
+
+        self.assertEqual(deliver_due(), (0, 1))
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual(delivery.attempts, 1)
+        self.assertGreater(delivery.next_attempt_at, timezone.now())
+        # Not due yet
+        self.assertEqual(deliver_due(), (0, 0))
+
+        WebhookDelivery.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(deliver_due(), (0, 1))
+        self.assertFalse(WebhookDelivery.objects.exists())
+        letter = WebhookDeadLetter.objects.get()
+        self.assertEqual(letter.attempts, 2)
+        self.assertIn("HTTP 500", letter.last_error)
+
+    def test_claim_leases_the_whole_batch(self):
+        from datetime import timedelta
+        # Two events per delivery: five deliveries
+        self.assertEqual(enqueue_events([record_event(self.shipment, ShipmentStatus.BOOKED) for _ in range(10)]), 5)
+        claimed = claim_due(limit=3)
+        # Sent one after another, so the lease outlasts three sends at their full timeout
+        lease_floor = timezone.now() + timedelta(seconds=3 * 2 * 2)
+        for delivery in claimed:
+            self.assertGreater(delivery.next_attempt_at, lease_floor)
+        # Another worker only gets the deliveries that weren't claimed
+        others = claim_due(limit=10)
+        self.assertEqual(len(others), 2)
+        self.assertFalse({d.id for d in claimed} & {d.id for d in others})
+
+
+@override_settings(WEBHOOK_ALLOW_PRIVATE_ADDRESSES=False, WEBHOOK_REQUIRE_HTTPS=True)
+class WebhookTargetTests(TestCase):
+    """Test that subscriptions can't point deliveries at internal addresses."""
+
+    def test_internal_and_plain_http_targets_rejected(self):
+        for url in (
+            "https://127.0.0.1/hook", "https://10.1.2.3/hook", "https://169.254.169.254/latest/meta-data/",
+            "https://[::1]/hook", "https://[::ffff:192.168.0.1]/hook", "https://0.0.0.0/hook",
+            "http://93.184.216.34/hook", "ftp://93.184.216.34/hook",
+        ):
+            with self.subTest(url=url), self.assertRaises(UnsafeTarget):
+                check_target(url)
+        check_target("https://93.184.216.34/hook")
+
+    def test_delivery_to_internal_target_fails_without_sending(self):
+        org = Organization.objects.create(title="Test Organization", subdomain="test", password="TestPassword123")
+        subscription = WebhookSubscription.objects.create(organization=org, url="https://127.0.0.1:9/hook")
+        WebhookDelivery.objects.create(subscription=subscription, payload={'events': []}, next_attempt_at=timezone.now())
+        self.assertEqual(deliver_due(), (0, 1))
+        self.assertIn("non-public address", WebhookDelivery.objects.get().last_error)
+
+    def test_subscription_create_rejects_internal_url(self):
+        from core.testing import access_token_for
+        org = Organization.objects.create(title="Test Organization", subdomain="test", password="TestPassword123")
+        resp = self.client.post(
+            '/api/webhook/subscriptions/', data=json.dumps({'url': "https://169.254.169.254/latest"}),
+            content_type='application/json', HTTP_AUTHORIZATION=f"Bearer {access_token_for(org)}",
+        )
+        self.assertEqual(resp.status_code, 400)
+        self.assertFalse(WebhookSubscription.objects.exists())
@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('subscriptions/', views.subscriptions, name='webhook_subscriptions'),
+    path('subscriptions/<slug:subscription_slug>/delete/', views.delete_subscription, name='delete_webhook_subscription'),
+    path('dead-letters/', views.dead_letters, name='webhook_dead_letters'),
+]
@@ -0,0 +1,78 @@
+from rest_framework.decorators import api_view, permission_classes, authentication_classes
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import status
+from core.utils import response
+from core.authentication import OrganizationJWTAuthentication
+from organization.permissions import IsOrganizationSet
+from .models import WebhookSubscription, WebhookDeadLetter
+from .serializers import (
+    WebhookSubscriptionSerializer, WebhookSubscriptionCreateSerializer,
+    WebhookSubscriptionSecretSerializer, WebhookDeadLetterSerializer
+)
+
+
+@swagger_auto_schema(
+    method='get',
+    responses={200: WebhookSubscriptionSerializer(many=True)},
+    operation_description="List webhook subscriptions. Requires Organization JWT authentication.",
+    security=[{'Bearer': []}]
+)
+@swagger_auto_schema(
+    method='post',
+    request_body=WebhookSubscriptionCreateSerializer,
+    responses={201: WebhookSubscriptionSecretSerializer},
+    operation_description="Subscribe a URL to shipment events. The signing secret is only returned here.",
+    security=[{'Bearer': []}]
+)
+@api_view(['GET', 'POST'])
+@authentication_classes([OrganizationJWTAuthentication])
+@permission_classes([IsOrganizationSet])
+def subscriptions(request):
+    org = request.organization
+
+    if request.method == 'GET':
+        subs = WebhookSubscription.objects.filter(organization=org)
+        serializer = WebhookSubscriptionSerializer(subs, many=True)
+        return response(status.HTTP_200_OK, "Webhook subscriptions fetched successfully", data=serializer.data)
+
+    serializer = WebhookSubscriptionCreateSerializer(data=request.data)
+    if serializer.is_valid():
+        subscription = serializer.save(organization=org)
+        resp_serializer = WebhookSubscriptionSecretSerializer(subscription)
+        return response(status.HTTP_201_CREATED, "Webhook subscription created successfully", data=resp_serializer.data)
+    return response(status.HTTP_400_BAD_REQUEST, "Invalid data", error=serializer.errors)
+
+
+@swagger_auto_schema(
+    method='delete',
+    responses={200: "Webhook subscription deleted successfully", 404: "Webhook subscription not found"},
+    operation_description="Delete a webhook subscription. Requires Organization JWT authentication.",
+    security=[{'Bearer': []}]
+)
+@api_view(['DELETE'])
+@authentication_classes([OrganizationJWTAuthentication])
+@permission_classes([IsOrganizationSet])
+def delete_subscription(request, subscription_slug):
+    try:
+        subscription = WebhookSubscription.objects.get(organization=request.organization, slug=subscription_slug)
+    except WebhookSubscription.DoesNotExist:
+        return response(status.HTTP_404_NOT_FOUND, "Webhook subscription not found")
+    subscription.delete()
+    return response(status.HTTP_200_OK, "Webhook subscription deleted successfully")
+
+
+@swagger_auto_schema(
+    method='get',
+    responses={200: WebhookDeadLetterSerializer(many=True)},
+    operation_description="List deliveries that exhausted their retries. Requires Organization JWT authentication.",
+    security=[{'Bearer': []}]
+)
+@api_view(['GET'])
+@authentication_classes([OrganizationJWTAuthentication])
+@permission_classes([IsOrganizationSet])
+def dead_letters(request):
+    letters = WebhookDeadLetter.objects.filter(
+        subscription__organization=request.organization
+    ).select_related('subscription').order_by('-failed_at')
+    serializer = WebhookDeadLetterSerializer(letters, many=True)
+    return response(status.HTTP_200_OK, "Dead letters fetched successfully", data=serializer.data)